@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Préparation des ressources statiques de la version web (CSS, JavaScript).
+
+Chaque ressource est minifiée, nommée d'après l'empreinte de son contenu
+(style.3f2a9c1d04.css) et précompressée en gzip et, si le module brotli est
+installé, en brotli. Le nom changeant avec le contenu, le navigateur peut la
+garder indéfiniment (Cache-Control: immutable) : un rechargement de page ne
+la redemande pas.
+
+La construction peut être faite à l'avance, au déploiement :
+    python assets.py
+qui écrit static/dist/ et son manifeste. Au démarrage, l'application reprend
+ces fichiers s'ils correspondent aux sources ; sinon elle construit les
+ressources en mémoire (quelques millisecondes).
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+try:
+    import brotli
+except ImportError:
+    # Sans brotli, seules les variantes gzip et brute sont servies
+    brotli = None
+
+RACINE = os.path.dirname(os.path.abspath(__file__))
+DOSSIER_SOURCE = os.path.join(RACINE, 'static')
+DOSSIER_SORTIE = os.path.join(DOSSIER_SOURCE, 'dist')
+MANIFESTE = 'manifest.json'
+RESSOURCES = ('style.css', 'script.js')
+
+TYPES = {'.css': 'text/css', '.js': 'text/javascript'}
+EXTENSIONS_ENCODAGE = {'gzip': '.gz', 'br': '.br'}
+# Ordre de préférence quand le client accepte plusieurs encodages
+PREFERENCE_ENCODAGES = ('br', 'gzip', 'identity')
+
+
+@dataclass(frozen=True)
+class Ressource:
+    """Une ressource préparée : nom publié, type et variantes par encodage."""
+    nom: str
+    nom_publie: str
+    mimetype: str
+    empreinte_source: str
+    variantes: Dict[str, bytes]
+
+    def etag(self, encodage: str) -> str:
+        # Un ETag par variante : les corps diffèrent d'un encodage à l'autre
+        return f'"{self.nom_publie}-{encodage}"'
+
+
+# ============ MINIFICATION ============
+
+def minifier_css(texte: str) -> str:
+    """Retire commentaires et espaces superflus (les chaînes sont conservées)."""
+    morceaux = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', texte)
+    for i in range(0, len(morceaux), 2):
+        code = re.sub(r'/\*.*?\*/', '', morceaux[i], flags=re.S)
+        code = re.sub(r'\s+', ' ', code)
+        code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+        code = re.sub(r':\s+', ':', code)
+        morceaux[i] = code.replace(';}', '}')
+    return ''.join(morceaux).strip() + '\n'
+
+
+# Après ces caractères, une barre oblique commence une expression régulière
+_AVANT_REGEX = set('(,=:[!&|?{};+-*%<>~^') | {''}
+
+
+def minifier_js(texte: str) -> str:
+    """
+    Minification prudente : commentaires retirés, indentation et lignes
+    vides supprimées. Les sauts de ligne sont gardés (insertion automatique
+    des points-virgules) ; chaînes, gabarits `...${}...` et expressions
+    régulières sont recopiés tels quels.
+    """
+    sortie = []
+    i = 0
+    n = len(texte)
+    # Pile des contextes : 'code' ou 'gabarit' ; profondeur d'accolades par expression ${}
+    pile = ['code']
+    accolades = [0]
+    precedent = ''  # dernier caractère significatif du code
+
+    def recopier_chaine(debut: int, delimiteur: str) -> int:
+        j = debut + 1
+        while j < n and texte[j] != delimiteur:
+            j += 2 if texte[j] == '\\' else 1
+        sortie.append(texte[debut:j + 1])
+        return j + 1
+
+    while i < n:
+        c = texte[i]
+        if pile[-1] == 'gabarit':
+            if c == '\\':
+                sortie.append(texte[i:i + 2])
+                i += 2
+            elif c == '`':
+                sortie.append(c)
+                pile.pop()
+                precedent = '`'
+                i += 1
+            elif texte.startswith('${', i):
+                sortie.append('${')
+                pile.append('code')
+                accolades.append(0)
+                precedent = '{'
+                i += 2
+            else:
+                sortie.append(c)
+                i += 1
+            continue
+
+        if c in '"\'':
+            i = recopier_chaine(i, c)
+            precedent = c
+        elif c == '`':
+            sortie.append(c)
+            pile.append('gabarit')
+            i += 1
+        elif texte.startswith('//', i):
+            fin = texte.find('\n', i)
+            i = n if fin < 0 else fin
+        elif texte.startswith('/*', i):
+            fin = texte.find('*/', i + 2)
+            i = n if fin < 0 else fin + 2
+        elif c == '/' and precedent in _AVANT_REGEX:
+            # Expression régulière : jusqu'à la barre non échappée hors classe
+            j = i + 1
+            dans_classe = False
+            while j < n and texte[j] != '\n' and (texte[j] != '/' or dans_classe):
+                if texte[j] == '\\':
+                    j += 1
+                elif texte[j] == '[':
+                    dans_classe = True
+                elif texte[j] == ']':
+                    dans_classe = False
+                j += 1
+            j += 1
+            while j < n and texte[j].isalpha():
+                j += 1
+            sortie.append(texte[i:j])
+            precedent = '/'
+            i = j
+        elif c == '{':
+            accolades[-1] += 1
+            sortie.append(c)
+            precedent = c
+            i += 1
+        elif c == '}' and len(pile) > 1 and accolades[-1] == 0:
+            # Fin d'une expression ${} : retour dans le gabarit
+            sortie.append(c)
+            pile.pop()
+            accolades.pop()
+            i += 1
+        elif c.isspace():
+            j = i
+            while j < n and texte[j].isspace():
+                j += 1
+            espace = '\n' if '\n' in texte[i:j] else ' '
+            # Fusion avec l'espace laissé par un commentaire retiré
+            if sortie and sortie[-1] in (' ', '\n'):
+                if espace == '\n':
+                    sortie[-1] = '\n'
+            elif sortie:
+                sortie.append(espace)
+            i = j
+        else:
+            if c == '}':
+                accolades[-1] -= 1
+            sortie.append(c)
+            precedent = c
+            i += 1
+
+    return ''.join(sortie).strip() + '\n'
+
+
+MINIFICATEURS = {'.css': minifier_css, '.js': minifier_js}
+
+
+# ============ CONSTRUCTION ============
+
+def _empreinte(donnees: bytes) -> str:
+    return hashlib.blake2b(donnees, digest_size=5).hexdigest()
+
+
+def preparer(nom: str, source: bytes) -> Ressource:
+    """Minifie, nomme d'après le contenu et compresse une ressource."""
+    base, extension = os.path.splitext(nom)
+    minifie = MINIFICATEURS[extension](source.decode('utf-8')).encode('utf-8')
+    variantes = {
+        'identity': minifie,
+        # mtime=0 : même entrée, mêmes octets (constructions reproductibles)
+        'gzip': gzip.compress(minifie, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        variantes['br'] = brotli.compress(minifie, quality=11)
+    return Ressource(
+        nom=nom,
+        nom_publie=f"{base}.{_empreinte(minifie)}{extension}",
+        mimetype=TYPES[extension],
+        empreinte_source=_empreinte(source),
+        variantes=variantes,
+    )
+
+
+def _lire_manifeste(dossier_sortie: str) -> dict:
+    try:
+        with open(os.path.join(dossier_sortie, MANIFESTE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _depuis_disque(nom: str, entree: dict, dossier_sortie: str) -> Optional[Ressource]:
+    variantes = {}
+    try:
+        for encodage in entree['encodages']:
+            chemin = os.path.join(dossier_sortie, entree['fichier'] + EXTENSIONS_ENCODAGE.get(encodage, ''))
+            with open(chemin, 'rb') as f:
+                variantes[encodage] = f.read()
+    except (OSError, KeyError, TypeError):
+        return None
+    extension = os.path.splitext(nom)[1]
+    return Ressource(nom, entree['fichier'], TYPES[extension], entree['source'], variantes)
+
+
+def charger(dossier_source: str = DOSSIER_SOURCE, dossier_sortie: str = DOSSIER_SORTIE,
+            noms: Iterable[str] = RESSOURCES) -> Dict[str, Ressource]:
+    """
+    Retourne les ressources prêtes à servir, par nom source.
+
+    Les fichiers de static/dist sont repris quand leur manifeste correspond
+    à l'empreinte des sources ; une ressource modifiée depuis la dernière
+    construction est reconstruite en mémoire.
+    """
+    manifeste = _lire_manifeste(dossier_sortie)
+    ressources = {}
+    for nom in noms:
+        with open(os.path.join(dossier_source, nom), 'rb') as f:
+            source = f.read()
+        entree = manifeste.get(nom)
+        ressource = None
+        if entree and entree.get('source') == _empreinte(source):
+            ressource = _depuis_disque(nom, entree, dossier_sortie)
+        ressources[nom] = ressource or preparer(nom, source)
+    return ressources
+
+
+def construire(dossier_source: str = DOSSIER_SOURCE, dossier_sortie: str = DOSSIER_SORTIE,
+               noms: Iterable[str] = RESSOURCES) -> Dict[str, Ressource]:
+    """Construit les ressources et les écrit, avec le manifeste, dans dossier_sortie."""
+    os.makedirs(dossier_sortie, exist_ok=True)
+    ressources = {}
+    manifeste = {}
+    for nom in noms:
+        with open(os.path.join(dossier_source, nom), 'rb') as f:
+            ressource = preparer(nom, f.read())
+        for encodage, donnees in ressource.variantes.items():
+            chemin = os.path.join(dossier_sortie, ressource.nom_publie + EXTENSIONS_ENCODAGE.get(encodage, ''))
+            with open(chemin, 'wb') as f:
+                f.write(donnees)
+        ressources[nom] = ressource
+        manifeste[nom] = {
+            "fichier": ressource.nom_publie,
+            "source": ressource.empreinte_source,
+            "encodages": sorted(ressource.variantes),
+        }
+    with open(os.path.join(dossier_sortie, MANIFESTE), 'w', encoding='utf-8') as f:
+        json.dump(manifeste, f, indent=2, sort_keys=True)
+    # Les constructions précédentes ne sont plus référencées
+    publies = {r.nom_publie for r in ressources.values()}
+    for fichier in os.listdir(dossier_sortie):
+        base = fichier
+        for extension in EXTENSIONS_ENCODAGE.values():
+            if base.endswith(extension):
+                base = base[:-len(extension)]
+        if fichier != MANIFESTE and base not in publies:
+            os.remove(os.path.join(dossier_sortie, fichier))
+    return ressources
+
+
+def choisir_encodage(accept_encoding: Optional[str], disponibles: Iterable[str]) -> str:
+    """
+    Choisit la variante à servir d'après l'en-tête Accept-Encoding.
+
+    Returns:
+        "br", "gzip" ou "identity"
+    """
+    acceptes = {}
+    for element in (accept_encoding or '').split(','):
+        nom, _, parametres = element.strip().partition(';')
+        nom = nom.strip().lower()
+        if not nom:
+            continue
+        q = 1.0
+        parametres = parametres.strip()
+        if parametres.startswith('q='):
+            try:
+                q = float(parametres[2:])
+            except ValueError:
+                q = 0.0
+        acceptes[nom] = q
+    disponibles = set(disponibles)
+    for encodage in PREFERENCE_ENCODAGES[:-1]:
+        q = acceptes.get(encodage, acceptes.get('*', 0.0))
+        if encodage in disponibles and q > 0:
+            return encodage
+    return 'identity'
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prépare les ressources statiques (minification, compression).")
+    parser.add_argument('--sortie', default=DOSSIER_SORTIE, help="Dossier de sortie")
+    args = parser.parse_args(argv)
+
+    ressources = construire(dossier_sortie=args.sortie)
+    for ressource in ressources.values():
+        tailles = '  '.join(f"{encodage} {len(donnees):>6,d} o" for encodage, donnees in sorted(ressource.variantes.items()))
+        print(f"{ressource.nom:12s} -> {ressource.nom_publie:24s} {tailles}", file=sys.stderr)
+    if brotli is None:
+        print("brotli non installé : variantes .br non produites", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
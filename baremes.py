@@ -0,0 +1,188 @@
+"""
+Registre des barèmes d'appréciation (mentions, lettres ECTS, échelles propres
+à un établissement).
+
+Chaque barème est compilé une seule fois en un tableau trié de seuils : une
+moyenne est classée par recherche dichotomique, et un tableau entier de
+moyennes en une seule passe vectorisée.
+"""
+
+import functools
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+
+@functools.lru_cache(maxsize=None)
+def charger_numpy():
+    """
+    Importe NumPy au premier calcul par lot plutôt qu'au chargement du
+    module : l'import coûte des dizaines de millisecondes à chaque démarrage
+    à froid, pour des routes qui n'en ont pas besoin.
+
+    Returns:
+        Le module numpy, ou None s'il n'est pas installé
+    """
+    try:
+        import numpy
+    except ImportError:
+        # NumPy n'est nécessaire que pour les calculs par lot
+        return None
+    return numpy
+
+
+@dataclass(frozen=True)
+class Mention:
+    """Une appréciation : son texte et sa couleur d'affichage."""
+    texte: str
+    couleur: str
+
+    def vers_dict(self) -> dict:
+        return {"texte": self.texte, "couleur": self.couleur}
+
+
+class Bareme:
+    """
+    Barème compilé : des seuils croissants et la mention associée à chacun.
+
+    Une moyenne reçoit la mention du plus grand seuil qu'elle atteint
+    (moyenne >= seuil), ou la mention par défaut si elle n'en atteint aucun.
+    """
+
+    def __init__(self, nom: str, paliers: Iterable[Tuple[float, str, str]],
+                 defaut: Tuple[str, str]):
+        """
+        Initialise et compile le barème.
+
+        Args:
+            nom: Nom du barème dans le registre
+            paliers: Triplets (seuil, texte, couleur), dans n'importe quel ordre
+            defaut: (texte, couleur) en dessous du plus petit seuil
+
+        Raises:
+            ValueError: Si deux paliers ont le même seuil
+        """
+        paliers = sorted(paliers, key=lambda p: p[0])
+        seuils = [float(p[0]) for p in paliers]
+        if len(set(seuils)) != len(seuils):
+            raise ValueError(f"Seuils en double dans le barème {nom!r}")
+
+        self.nom = nom
+        self.seuils: Tuple[float, ...] = tuple(seuils)
+        self.mentions: Tuple[Mention, ...] = (Mention(*defaut),) + tuple(
+            Mention(texte, couleur) for _, texte, couleur in paliers
+        )
+        self._seuils_np = None
+
+    @classmethod
+    def depuis_dict(cls, nom: str, donnees: dict) -> "Bareme":
+        """
+        Construit un barème depuis une configuration, par exemple :
+        {"paliers": [{"seuil": 10, "texte": "Admis", "couleur": "#27ae60"}],
+         "defaut": {"texte": "Ajourné", "couleur": "#e74c3c"}}
+        """
+        paliers = [(p["seuil"], p["texte"], p["couleur"]) for p in donnees["paliers"]]
+        defaut = donnees["defaut"]
+        return cls(nom, paliers, (defaut["texte"], defaut["couleur"]))
+
+    def indice(self, moyenne: float) -> int:
+        """Retourne l'indice de la mention (0 = mention par défaut)."""
+        return bisect_right(self.seuils, moyenne)
+
+    def classer(self, moyenne: float) -> Mention:
+        """Retourne la mention correspondant à une moyenne."""
+        return self.mentions[bisect_right(self.seuils, moyenne)]
+
+    def indices_lot(self, moyennes: Sequence[float]):
+        """
+        Classe un tableau de moyennes en une seule passe.
+
+        Returns:
+            Les indices des mentions (tableau NumPy si disponible, sinon liste)
+        """
+        np = charger_numpy()
+        if np is None:
+            return [bisect_right(self.seuils, m) for m in moyennes]
+        if self._seuils_np is None:
+            self._seuils_np = np.array(self.seuils, dtype=np.float64)
+        return np.searchsorted(self._seuils_np, np.asarray(moyennes, dtype=np.float64), side='right')
+
+    def textes_lot(self, moyennes: Sequence[float]) -> List[str]:
+        """Retourne le texte de la mention de chaque moyenne."""
+        textes = [m.texte for m in self.mentions]
+        return [textes[i] for i in self.indices_lot(moyennes)]
+
+    def __repr__(self):
+        return f"Bareme({self.nom!r}, seuils={list(self.seuils)})"
+
+
+_REGISTRE: Dict[str, Bareme] = {}
+
+BAREME_PAR_DEFAUT = "appreciation"
+
+
+def enregistrer_bareme(bareme: Bareme, remplacer: bool = False) -> Bareme:
+    """
+    Ajoute un barème au registre.
+
+    Raises:
+        ValueError: Si un barème du même nom existe déjà et remplacer est False
+    """
+    if bareme.nom in _REGISTRE and not remplacer:
+        raise ValueError(f"Le barème {bareme.nom!r} existe déjà")
+    _REGISTRE[bareme.nom] = bareme
+    return bareme
+
+
+def obtenir_bareme(nom: str = BAREME_PAR_DEFAUT) -> Bareme:
+    """
+    Retourne un barème du registre.
+
+    Raises:
+        KeyError: Si le barème n'existe pas
+    """
+    try:
+        return _REGISTRE[nom]
+    except KeyError:
+        raise KeyError(f"Barème inconnu: {nom!r}") from None
+
+
+def baremes_disponibles() -> List[str]:
+    """Retourne les noms des barèmes enregistrés."""
+    return sorted(_REGISTRE)
+
+
+enregistrer_bareme(Bareme(
+    BAREME_PAR_DEFAUT,
+    [
+        (16, "Excellent travail!", "#27ae60"),
+        (14, "Très bien!", "#2ecc71"),
+        (12, "Bien!", "#3498db"),
+        (10, "Passable", "#f39c12"),
+    ],
+    ("Doit faire des efforts", "#e74c3c"),
+))
+
+enregistrer_bareme(Bareme(
+    "mentions_bac",
+    [
+        (16, "Mention Très bien", "#27ae60"),
+        (14, "Mention Bien", "#2ecc71"),
+        (12, "Mention Assez bien", "#3498db"),
+        (10, "Admis", "#f39c12"),
+        (8, "Second groupe", "#e67e22"),
+    ],
+    ("Ajourné", "#e74c3c"),
+))
+
+enregistrer_bareme(Bareme(
+    "ects",
+    [
+        (16, "A", "#27ae60"),
+        (14, "B", "#2ecc71"),
+        (12, "C", "#3498db"),
+        (11, "D", "#f1c40f"),
+        (10, "E", "#f39c12"),
+    ],
+    ("F", "#e74c3c"),
+))
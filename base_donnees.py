@@ -0,0 +1,639 @@
+"""
+Accès SQLite de la version web : pool de connexions réutilisables, schéma
+versionné (PRAGMA user_version) et stockage des matières des profils.
+
+Les connexions sont ouvertes en mode WAL avec un busy_timeout, gardent un
+cache de requêtes préparées et sont toujours rendues au pool, même si le
+traitement de la requête échoue. Un thread qui emprunte une connexion alors
+qu'il en détient déjà une récupère la même (emprunts imbriqués).
+"""
+
+import base64
+import binascii
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterable
+
+
+class StatistiquesPool:
+    """Compteurs du pool, pour le dimensionner."""
+
+    def __init__(self):
+        self.emprunts = 0
+        self.reutilisations = 0     # connexion inactive disponible (hit)
+        self.creations = 0
+        self.attentes = 0           # pool plein : il a fallu attendre
+        self.temps_emprunt_total = 0.0
+        self.temps_emprunt_max = 0.0
+
+    def vers_dict(self) -> dict:
+        return {
+            "emprunts": self.emprunts,
+            "reutilisations": self.reutilisations,
+            "creations": self.creations,
+            "attentes": self.attentes,
+            "temps_emprunt_moyen_ms": round(
+                1000 * self.temps_emprunt_total / self.emprunts, 3) if self.emprunts else 0.0,
+            "temps_emprunt_max_ms": round(1000 * self.temps_emprunt_max, 3),
+        }
+
+
+class PoolSQLite:
+    """Pool borné de connexions SQLite partagées entre les threads."""
+
+    def __init__(self, chemin: str, taille: int = 8, attente_max: float = 30.0,
+                 busy_timeout_ms: int = 5000, requetes_en_cache: int = 128):
+        """
+        Initialise le pool (les connexions sont créées à la demande).
+
+        Args:
+            chemin: Chemin du fichier de base de données
+            taille: Nombre maximal de connexions ouvertes
+            attente_max: Durée maximale d'attente d'une connexion libre (s)
+            busy_timeout_ms: Attente de SQLite sur un verrou avant « database is locked »
+            requetes_en_cache: Taille du cache de requêtes préparées par connexion
+        """
+        self.chemin = chemin
+        self.taille = taille
+        self.attente_max = attente_max
+        self.busy_timeout_ms = busy_timeout_ms
+        self.requetes_en_cache = requetes_en_cache
+        self.stats = StatistiquesPool()
+        self._inactives = deque()
+        self._ouvertes = 0
+        self._condition = threading.Condition()
+        self._locale = threading.local()
+        self._ferme = False
+
+    def _creer_connexion(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.chemin,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.requetes_en_cache
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _emprunter(self) -> sqlite3.Connection:
+        debut = time.perf_counter()
+        a_attendu = False
+        nouvelle = False
+        with self._condition:
+            while True:
+                if self._ferme:
+                    raise RuntimeError("Le pool de connexions est fermé")
+                if self._inactives:
+                    conn = self._inactives.pop()
+                    self.stats.reutilisations += 1
+                    break
+                if self._ouvertes < self.taille:
+                    self._ouvertes += 1
+                    conn = None
+                    nouvelle = True
+                    break
+                a_attendu = True
+                restant = self.attente_max - (time.perf_counter() - debut)
+                if restant <= 0 or not self._condition.wait(restant):
+                    if not self._inactives and self._ouvertes >= self.taille:
+                        raise TimeoutError("Aucune connexion SQLite disponible")
+
+        if nouvelle:
+            try:
+                conn = self._creer_connexion()
+            except Exception:
+                with self._condition:
+                    self._ouvertes -= 1
+                    self._condition.notify()
+                raise
+
+        duree = time.perf_counter() - debut
+        with self._condition:
+            self.stats.emprunts += 1
+            self.stats.creations += nouvelle
+            if a_attendu:
+                self.stats.attentes += 1
+            self.stats.temps_emprunt_total += duree
+            self.stats.temps_emprunt_max = max(self.stats.temps_emprunt_max, duree)
+        return conn
+
+    def _rendre(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Connexion inutilisable : on la ferme et on libère sa place
+            conn.close()
+            with self._condition:
+                self._ouvertes -= 1
+                self._condition.notify()
+            return
+
+        with self._condition:
+            if self._ferme:
+                conn.close()
+                self._ouvertes -= 1
+            else:
+                self._inactives.append(conn)
+            self._condition.notify()
+
+    @contextmanager
+    def connexion(self):
+        """
+        Emprunte une connexion le temps d'un bloc `with`.
+
+        Une transaction laissée ouverte (erreur, retour anticipé) est annulée
+        avant que la connexion ne retourne au pool.
+        """
+        detenue = getattr(self._locale, 'conn', None)
+        if detenue is not None:
+            yield detenue
+            return
+
+        conn = self._emprunter()
+        self._locale.conn = conn
+        try:
+            yield conn
+        finally:
+            self._locale.conn = None
+            self._rendre(conn)
+
+    def statistiques(self) -> dict:
+        """Retourne les compteurs du pool et son occupation."""
+        with self._condition:
+            stats = self.stats.vers_dict()
+            stats.update({
+                "taille": self.taille,
+                "ouvertes": self._ouvertes,
+                "inactives": len(self._inactives),
+                "empruntees": self._ouvertes - len(self._inactives),
+            })
+        return stats
+
+    def fermer(self):
+        """Ferme les connexions inactives ; les autres le seront à leur retour."""
+        with self._condition:
+            self._ferme = True
+            while self._inactives:
+                self._inactives.pop().close()
+                self._ouvertes -= 1
+            self._condition.notify_all()
+
+
+# ============ SCHÉMA ET MIGRATIONS ============
+
+SCHEMA_INITIAL = [
+    '''
+    CREATE TABLE IF NOT EXISTS profils (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom TEXT UNIQUE NOT NULL,
+        donnees TEXT NOT NULL,
+        date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        date_modification TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS historique (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        profil_id INTEGER,
+        moyenne REAL,
+        date_calcul TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(profil_id) REFERENCES profils(id)
+    )
+    ''',
+]
+
+
+def _migration_matieres_normalisees(conn: sqlite3.Connection):
+    """Déplace le JSON profils.donnees vers la table indexée profil_matieres."""
+    # Colonnes sans type déclaré : les valeurs JSON (nombre ou texte) sont
+    # conservées telles quelles
+    conn.execute('''
+        CREATE TABLE profil_matieres (
+            profil_id INTEGER NOT NULL REFERENCES profils(id),
+            position INTEGER NOT NULL,
+            nom,
+            coefficient,
+            note,
+            selectionnee INTEGER,
+            autres TEXT,
+            PRIMARY KEY (profil_id, position)
+        ) WITHOUT ROWID
+    ''')
+
+    lignes = []
+    for profil_id, donnees in conn.execute('SELECT id, donnees FROM profils'):
+        try:
+            matieres = json.loads(donnees)
+        except (TypeError, ValueError):
+            matieres = []
+        if not isinstance(matieres, list):
+            matieres = []
+        lignes.extend(
+            (profil_id, position) + matiere_vers_ligne(m) for position, m in enumerate(matieres)
+        )
+    conn.executemany('INSERT INTO profil_matieres VALUES (?, ?, ?, ?, ?, ?, ?)', lignes)
+
+    # Reconstruction de la table profils sans la colonne donnees
+    conn.execute('''
+        CREATE TABLE profils_nouvelle (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nom TEXT UNIQUE NOT NULL,
+            date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            date_modification TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO profils_nouvelle (id, nom, date_creation, date_modification)
+        SELECT id, nom, date_creation, date_modification FROM profils
+    ''')
+    conn.execute('DROP TABLE profils')
+    conn.execute('ALTER TABLE profils_nouvelle RENAME TO profils')
+
+
+def _migration_index_historique(conn: sqlite3.Connection):
+    """Index composite pour lire l'historique d'un profil par date décroissante."""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_historique_profil_date
+        ON historique (profil_id, date_calcul, id)
+    ''')
+
+
+def _migration_catalogue_matieres(conn: sqlite3.Connection):
+    """Catalogue des matières par établissement, versionné (voir catalogue_matieres)."""
+    # coefficient sans type déclaré : un entier reste un entier
+    conn.execute('''
+        CREATE TABLE catalogue_matieres (
+            etablissement TEXT NOT NULL,
+            nom_cle TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            nom TEXT NOT NULL,
+            coefficient NOT NULL,
+            PRIMARY KEY (etablissement, nom_cle)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE catalogue_versions (
+            etablissement TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+def _migration_classements(conn: sqlite3.Connection):
+    """Classements des classes, versionnés (voir registre_classements)."""
+    conn.execute('''
+        CREATE TABLE classement_moyennes (
+            classe TEXT NOT NULL,
+            eleve TEXT NOT NULL,
+            moyenne REAL NOT NULL,
+            PRIMARY KEY (classe, eleve)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE classement_versions (
+            classe TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+def _migration_versions_cache(conn: sqlite3.Connection):
+    """Versions des étiquettes du cache des réponses (voir cache_reponses)."""
+    conn.execute('''
+        CREATE TABLE cache_versions (
+            etiquette TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+# Chaque migration fait passer PRAGMA user_version de n à n + 1
+MIGRATIONS = [
+    _migration_matieres_normalisees,
+    _migration_index_historique,
+    _migration_catalogue_matieres,
+    _migration_classements,
+    _migration_versions_cache,
+]
+
+
+def initialiser_schema(chemin: str) -> bool:
+    """
+    Crée les tables si besoin puis applique les migrations manquantes.
+
+    Idempotent : une base déjà à jour n'est que lue (PRAGMA user_version),
+    sans prendre le verrou d'écriture, ce qui garde le démarrage à froid
+    rapide quand plusieurs instances partagent le même fichier.
+
+    Returns:
+        True si le schéma a été créé ou migré, False s'il était à jour
+    """
+    conn = sqlite3.connect(chemin, timeout=30)
+    try:
+        conn.isolation_level = None
+        if conn.execute('PRAGMA user_version').fetchone()[0] == len(MIGRATIONS):
+            return False
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for instruction in SCHEMA_INITIAL:
+                conn.execute(instruction)
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for numero in range(version, len(MIGRATIONS)):
+                MIGRATIONS[numero](conn)
+            conn.execute(f'PRAGMA user_version = {len(MIGRATIONS)}')
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return True
+    finally:
+        conn.close()
+
+
+# ============ MATIÈRES DES PROFILS ============
+
+COLONNES_MATIERE = ('nom', 'coefficient', 'note', 'selectionnee')
+
+
+def matiere_vers_ligne(matiere) -> tuple:
+    """
+    Convertit une matière JSON en (nom, coefficient, note, selectionnee, autres).
+
+    Les clés non prévues (ou de type inattendu) sont conservées en JSON dans
+    la colonne autres, pour restituer la matière à l'identique.
+    """
+    if not isinstance(matiere, dict):
+        return (None, None, None, None, json.dumps({"valeur": matiere}))
+    autres = {}
+    valeurs = {}
+    for cle, valeur in matiere.items():
+        if cle == 'selectionnee' and isinstance(valeur, bool):
+            valeurs[cle] = int(valeur)
+        elif cle in ('nom', 'coefficient', 'note') and isinstance(valeur, (str, int, float)) \
+                and not isinstance(valeur, bool):
+            valeurs[cle] = valeur
+        else:
+            autres[cle] = valeur
+    return tuple(valeurs.get(c) for c in COLONNES_MATIERE) + (
+        json.dumps(autres, ensure_ascii=False) if autres else None,
+    )
+
+
+def ligne_vers_matiere(ligne) -> dict:
+    """Opération inverse de matiere_vers_ligne (colonnes absentes ignorées)."""
+    cles = ligne.keys()
+    matiere = {}
+    for colonne in COLONNES_MATIERE:
+        if colonne in cles and ligne[colonne] is not None:
+            valeur = ligne[colonne]
+            matiere[colonne] = bool(valeur) if colonne == 'selectionnee' else valeur
+    if 'autres' in cles and ligne['autres']:
+        autres = json.loads(ligne['autres'])
+        if set(autres) == {"valeur"} and not matiere:
+            return autres["valeur"]
+        matiere.update(autres)
+    return matiere
+
+
+def lire_matieres_profil(conn: sqlite3.Connection, profil_id: int, champs=None) -> list:
+    """
+    Lit les matières d'un profil, dans l'ordre.
+
+    Args:
+        champs: Colonnes à charger parmi COLONNES_MATIERE (toutes si None)
+    """
+    if champs is None:
+        colonnes = list(COLONNES_MATIERE) + ['autres']
+    else:
+        inconnues = [c for c in champs if c not in COLONNES_MATIERE]
+        if inconnues:
+            raise ValueError(f"Champs inconnus: {', '.join(inconnues)}")
+        colonnes = list(champs)
+    lignes = conn.execute(
+        f'SELECT {", ".join(colonnes)} FROM profil_matieres WHERE profil_id = ? ORDER BY position',
+        (profil_id,)
+    )
+    return [ligne_vers_matiere(ligne) for ligne in lignes]
+
+
+def ecrire_matieres_profil(conn: sqlite3.Connection, profil_id: int, matieres: list) -> int:
+    """
+    Enregistre les matières d'un profil en ne touchant que les lignes modifiées.
+
+    Returns:
+        Le nombre de lignes insérées, modifiées ou supprimées
+    """
+    existantes = {
+        ligne[0]: tuple(ligne[1:])
+        for ligne in conn.execute(
+            'SELECT position, nom, coefficient, note, selectionnee, autres '
+            'FROM profil_matieres WHERE profil_id = ?',
+            (profil_id,)
+        )
+    }
+    nouvelles = [matiere_vers_ligne(m) for m in matieres]
+
+    a_ecrire = [
+        (profil_id, position) + ligne
+        for position, ligne in enumerate(nouvelles)
+        if existantes.get(position) != ligne
+    ]
+    a_supprimer = [(profil_id, position) for position in existantes if position >= len(nouvelles)]
+
+    conn.executemany('INSERT OR REPLACE INTO profil_matieres VALUES (?, ?, ?, ?, ?, ?, ?)', a_ecrire)
+    conn.executemany('DELETE FROM profil_matieres WHERE profil_id = ? AND position = ?', a_supprimer)
+    return len(a_ecrire) + len(a_supprimer)
+
+
+# ============ VERSIONS DU CACHE DES RÉPONSES ============
+
+def incrementer_versions(conn: sqlite3.Connection, etiquettes: Iterable[str]):
+    """
+    Incrémente, dans la transaction en cours, la version des étiquettes de
+    cache touchées par une écriture ('profils', 'profil:3', 'historique:3') :
+    les autres processus verront que leurs réponses en cache sont périmées.
+    """
+    conn.executemany(
+        'INSERT INTO cache_versions (etiquette, version) VALUES (?, 1) '
+        'ON CONFLICT (etiquette) DO UPDATE SET version = version + 1',
+        [(etiquette,) for etiquette in sorted(set(etiquettes))]
+    )
+
+
+def lire_versions(conn: sqlite3.Connection, etiquettes: Iterable[str]) -> tuple:
+    """
+    Returns:
+        Les paires (étiquette, version) triées par étiquette ; 0 pour une
+        étiquette jamais écrite
+    """
+    etiquettes = sorted(set(etiquettes))
+    lues = dict(conn.execute(
+        f'SELECT etiquette, version FROM cache_versions '
+        f'WHERE etiquette IN ({", ".join("?" * len(etiquettes))})',
+        etiquettes
+    )) if etiquettes else {}
+    return tuple((etiquette, lues.get(etiquette, 0)) for etiquette in etiquettes)
+
+
+# ============ HISTORIQUE ============
+
+def encoder_curseur(date_calcul: str, identifiant: int) -> str:
+    """Encode la position (date_calcul, id) d'une entrée en curseur opaque."""
+    brut = json.dumps([date_calcul, identifiant], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(brut).decode('ascii').rstrip('=')
+
+
+def decoder_curseur(curseur: str) -> tuple:
+    """
+    Décode un curseur produit par encoder_curseur.
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        date_calcul, identifiant = json.loads(brut)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Curseur invalide") from None
+    # Les deux valeurs sont liées telles quelles à la requête SQL
+    if not isinstance(date_calcul, str) or not isinstance(identifiant, int) or isinstance(identifiant, bool):
+        raise ValueError("Curseur invalide")
+    return date_calcul, identifiant
+
+
+def lire_page_historique(conn: sqlite3.Connection, profil_id: int, limite: int,
+                         curseur: str = None) -> tuple:
+    """
+    Lit une page de l'historique, du plus récent au plus ancien.
+
+    La pagination par clé (date_calcul, id) parcourt l'index composite : le
+    coût d'une page ne dépend pas de sa position dans l'historique.
+
+    Returns:
+        (entrées, curseur de la page suivante ou None)
+    """
+    if curseur:
+        date_calcul, identifiant = decoder_curseur(curseur)
+        lignes = conn.execute('''
+            SELECT id, moyenne, date_calcul
+            FROM historique
+            WHERE profil_id = ? AND (date_calcul, id) < (?, ?)
+            ORDER BY date_calcul DESC, id DESC
+            LIMIT ?
+        ''', (profil_id, date_calcul, identifiant, limite + 1)).fetchall()
+    else:
+        lignes = conn.execute('''
+            SELECT id, moyenne, date_calcul
+            FROM historique
+            WHERE profil_id = ?
+            ORDER BY date_calcul DESC, id DESC
+            LIMIT ?
+        ''', (profil_id, limite + 1)).fetchall()
+
+    entrees = [dict(ligne) for ligne in lignes[:limite]]
+    suivant = None
+    if len(lignes) > limite:
+        derniere = entrees[-1]
+        suivant = encoder_curseur(derniere['date_calcul'], derniere['id'])
+    return entrees, suivant
+
+
+def analyser_historique(conn: sqlite3.Connection, profil_id: int, seuils,
+                        fenetre: int = 5, points: int = 100) -> dict:
+    """
+    Calcule les tendances de l'historique d'un profil en une requête SQL.
+
+    Les fonctions de fenêtrage de SQLite calculent la moyenne mobile de chaque
+    entrée, les agrégats (min, max, moyenne, pente de la droite des moindres
+    carrés) et les changements de bande d'appréciation : seules les `points`
+    dernières entrées de la série sortent de la base.
+
+    Args:
+        conn: Connexion SQLite (lignes sqlite3.Row)
+        profil_id: Identifiant du profil
+        seuils: Seuils croissants du barème ; la bande d'une moyenne est le
+            nombre de seuils atteints, comme Bareme.indice
+        fenetre: Nombre d'entrées de la moyenne mobile
+        points: Nombre d'entrées récentes renvoyées dans la série
+
+    Returns:
+        Un dictionnaire d'agrégats et la série chronologique
+    """
+    fenetre = int(fenetre)
+    if fenetre < 1:
+        raise ValueError(f"La fenêtre doit être >= 1, reçu: {fenetre}")
+    seuils = [float(s) for s in seuils]
+    # (moyenne >= s1) + (moyenne >= s2) + ... vaut 0 ou 1 par seuil atteint
+    bande = ' + '.join(['(moyenne >= ?)'] * len(seuils)) or '0'
+
+    lignes = conn.execute(f'''
+        WITH serie AS (
+            SELECT date_calcul, moyenne,
+                   ROW_NUMBER() OVER chrono AS x,
+                   AVG(moyenne) OVER (chrono ROWS BETWEEN {fenetre - 1} PRECEDING AND CURRENT ROW)
+                       AS moyenne_mobile,
+                   {bande} AS bande
+            FROM historique
+            WHERE profil_id = ?
+            WINDOW chrono AS (ORDER BY date_calcul, id)
+        ), transitions AS (
+            SELECT *, bande - LAG(bande) OVER (ORDER BY x) AS saut
+            FROM serie
+        ), agregats AS (
+            SELECT *,
+                   COUNT(*) OVER tout AS n,
+                   MIN(moyenne) OVER tout AS minimum,
+                   MAX(moyenne) OVER tout AS maximum,
+                   AVG(moyenne) OVER tout AS moyenne_globale,
+                   FIRST_VALUE(moyenne) OVER (ORDER BY x) AS premiere,
+                   SUM(saut > 0) OVER tout AS hausses,
+                   SUM(saut < 0) OVER tout AS baisses,
+                   SUM(x) OVER tout AS sx,
+                   SUM(moyenne) OVER tout AS sy,
+                   SUM(1.0 * x * x) OVER tout AS sxx,
+                   SUM(x * moyenne) OVER tout AS sxy
+            FROM transitions
+            WINDOW tout AS ()
+        )
+        SELECT date_calcul, moyenne, moyenne_mobile, bande, n, minimum, maximum,
+               moyenne_globale, premiere, hausses, baisses,
+               (n * sxy - sx * sy) / NULLIF(n * sxx - 1.0 * sx * sx, 0) AS pente
+        FROM agregats
+        ORDER BY x DESC
+        LIMIT ?
+    ''', (*seuils, profil_id, max(1, int(points)))).fetchall()
+
+    if not lignes:
+        return {"nombre": 0, "serie": []}
+    derniere = lignes[0]
+    return {
+        "nombre": derniere['n'],
+        "minimum": derniere['minimum'],
+        "maximum": derniere['maximum'],
+        "moyenne": derniere['moyenne_globale'],
+        "premiere": derniere['premiere'],
+        "derniere": derniere['moyenne'],
+        # Variation moyenne de la moyenne d'un calcul au suivant
+        "pente": derniere['pente'] or 0.0,
+        "franchissements": (derniere['hausses'] or 0) + (derniere['baisses'] or 0),
+        "hausses": derniere['hausses'] or 0,
+        "baisses": derniere['baisses'] or 0,
+        "bande_actuelle": derniere['bande'],
+        "serie": [
+            {
+                "date_calcul": ligne['date_calcul'],
+                "moyenne": ligne['moyenne'],
+                "moyenne_mobile": ligne['moyenne_mobile'],
+                "bande": ligne['bande'],
+            }
+            for ligne in reversed(lignes)
+        ],
+    }
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Banc d'essai des différentes implémentations du calcul de moyenne.
+
+Chaque implémentation est exécutée sur des cohortes synthétiques (graine fixe)
+de 10 à 10^6 élèves. On mesure le débit (élèves/s, sur le temps médian des
+passes), le pic mémoire (tracemalloc) et la variation nette du nombre de
+blocs alloués par l'interpréteur. Les résultats peuvent être enregistrés
+comme référence JSON, puis comparés : le script échoue si un débit baisse
+au-delà du seuil.
+
+Exemples :
+    python benchmarks/bench_moyennes.py --enregistrer benchmarks/reference.json
+    python benchmarks/bench_moyennes.py --comparer benchmarks/reference.json --seuil 0.2
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+import numpy as np  # noqa: E402
+
+import calculs  # noqa: E402
+
+TAILLES_PAR_DEFAUT = [10, 100, 1000, 10_000, 100_000, 1_000_000]
+COEFFICIENTS = [2, 2, 2, 4, 2, 4, 5]
+NOMS = ["Anglais", "Français", "Histoire-Géo", "Maths", "Philo", "Physique-Chimie", "SVT"]
+GRAINE = 20240901
+# Durée minimale d'une passe chronométrée : les petites cohortes sont
+# calculées plusieurs fois par passe
+DUREE_MIN_PASSE = 0.02
+# En deçà de ce temps par calcul, une baisse de débit n'échoue pas la
+# comparaison : le bruit de l'ordonnanceur dépasse souvent le seuil
+TEMPS_MIN_COMPARAISON = 0.001
+
+
+class _Selection:
+    """Remplace le BooleanVar de Tkinter : seule la méthode get() est utilisée."""
+    __slots__ = ("valeur",)
+
+    def __init__(self, valeur: bool):
+        self.valeur = valeur
+
+    def get(self) -> bool:
+        return self.valeur
+
+
+class _MatiereTk:
+    """Objet ayant l'interface de models.matiere.Matiere lue par utils.calculs."""
+    __slots__ = ("nom", "coefficient", "note", "var")
+
+    def __init__(self, nom, coefficient, note, selectionnee):
+        self.nom = nom
+        self.coefficient = coefficient
+        self.note = note
+        self.var = _Selection(selectionnee)
+
+
+def generer_cohorte(taille: int) -> dict:
+    """Génère une cohorte reproductible : notes, coefficients et sélection."""
+    rng = np.random.default_rng(GRAINE + taille)
+    notes = np.round(rng.uniform(0, 20, size=(taille, len(COEFFICIENTS))) * 4) / 4
+    selection = rng.random((taille, len(COEFFICIENTS))) < 0.8
+    selection[:, 3] = True  # au moins une matière par élève
+    return {"notes": notes, "coefficients": np.array(COEFFICIENTS, dtype=float), "selection": selection}
+
+
+def _lignes(cohorte):
+    notes = cohorte["notes"].tolist()
+    selection = cohorte["selection"].tolist()
+    return zip(notes, selection)
+
+
+# Chaque implémentation : (préparer(cohorte) -> entrées, exécuter(entrées))
+
+def _preparer_dataclasses(cohorte):
+    return [
+        [calculs.Matiere(NOMS[j], COEFFICIENTS[j], n) for j, n in enumerate(notes) if sel[j]]
+        for notes, sel in _lignes(cohorte)
+    ]
+
+
+def _executer_scalaire(entrees):
+    f = calculs.calculer_moyenne
+    for matieres in entrees:
+        f(matieres)
+
+
+def _preparer_tables(cohorte):
+    return [
+        calculs.MatiereTable(
+            [NOMS[j] for j in range(len(notes)) if sel[j]],
+            [COEFFICIENTS[j] for j in range(len(notes)) if sel[j]],
+            [n for j, n in enumerate(notes) if sel[j]],
+        )
+        for notes, sel in _lignes(cohorte)
+    ]
+
+
+def _executer_tables(entrees):
+    calculs.calculer_moyennes_tables(entrees)
+
+
+def _executer_batch(cohorte):
+    calculs.calculer_moyennes_batch(cohorte["notes"], cohorte["coefficients"], cohorte["selection"])
+
+
+def _preparer_tk(cohorte):
+    return [
+        [_MatiereTk(NOMS[j], COEFFICIENTS[j], n, sel[j]) for j, n in enumerate(notes)]
+        for notes, sel in _lignes(cohorte)
+    ]
+
+
+def _executer_utils(entrees):
+    from utils.calculs import calculer_moyenne
+    for matieres in entrees:
+        calculer_moyenne(matieres)
+
+
+def _executer_utils_generale(entrees):
+    from utils.calculs import calculer_moyenne_generale
+    for matieres in entrees:
+        calculer_moyenne_generale(matieres)
+
+
+def _preparer_main(cohorte):
+    # Matières cochées, comme la sélection de main.App.calculer_moyenne
+    return [[m for m in matieres if m.var.get()] for matieres in _preparer_tk(cohorte)]
+
+
+def _executer_main(entrees):
+    # Sommes de main.App.calculer_moyenne (l'import de main charge tkinter)
+    from main import moyenne_ponderee
+    for matieres in entrees:
+        moyenne_ponderee(matieres)
+
+
+IMPLEMENTATIONS = {
+    "calculs.calculer_moyenne": (_preparer_dataclasses, _executer_scalaire, True),
+    "calculs.calculer_moyenne[MatiereTable]": (_preparer_tables, _executer_scalaire, True),
+    "calculs.calculer_moyennes_tables": (_preparer_tables, _executer_tables, True),
+    "calculs.calculer_moyennes_batch": (lambda c: c, _executer_batch, False),
+    "utils.calculs.calculer_moyenne": (_preparer_tk, _executer_utils, True),
+    "utils.calculs.calculer_moyenne_generale": (_preparer_tk, _executer_utils_generale, True),
+    "main.moyenne_ponderee": (_preparer_main, _executer_main, True),
+}
+
+
+def _chronometrer(executer, entrees, appels: int) -> float:
+    debut = time.perf_counter()
+    for _ in range(appels):
+        executer(entrees)
+    return time.perf_counter() - debut
+
+
+def mesurer(executer, entrees, repetitions: int) -> dict:
+    """
+    Mesure le temps d'un calcul sur `repetitions` passes, puis la mémoire.
+    
+    Une passe enchaîne assez de calculs pour durer au moins DUREE_MIN_PASSE :
+    à 10 élèves, un calcul seul dure quelques microsecondes et varie trop
+    d'une passe à l'autre pour être comparé à une référence. Le temps retenu
+    est la médiane des passes, moins sensible qu'un minimum à une passe
+    exceptionnellement rapide.
+    """
+    appels = 1
+    while _chronometrer(executer, entrees, appels) < DUREE_MIN_PASSE:
+        appels *= 2
+    temps = []
+    for _ in range(repetitions):
+        gc.collect()
+        temps.append(_chronometrer(executer, entrees, appels) / appels)
+
+    gc.collect()
+    blocs_avant = sys.getallocatedblocks()
+    tracemalloc.start()
+    executer(entrees)
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Variation nette : blocs encore alloués après le calcul (résultats gardés,
+    # caches), pas le nombre d'allocations faites pendant le calcul
+    blocs_nets = sys.getallocatedblocks() - blocs_avant
+    return {
+        "temps_median": statistics.median(temps),
+        "meilleur_temps": min(temps),
+        "appels_par_passe": appels,
+        "pic_memoire": pic,
+        "blocs_nets": blocs_nets,
+    }
+
+
+def executer_banc(tailles, implementations, repetitions: int, max_scalaire: int) -> dict:
+    """Exécute toutes les implémentations demandées sur toutes les tailles."""
+    resultats = {}
+    for taille in tailles:
+        cohorte = generer_cohorte(taille)
+        for nom in implementations:
+            preparer, executer, scalaire = IMPLEMENTATIONS[nom]
+            if scalaire and taille > max_scalaire:
+                continue
+            entrees = preparer(cohorte)
+            mesure = mesurer(executer, entrees, repetitions)
+            mesure["ops_par_seconde"] = taille / mesure["temps_median"] if mesure["temps_median"] else float('inf')
+            resultats.setdefault(nom, {})[str(taille)] = mesure
+            print(
+                f"{nom:42s} {taille:>9d} élèves  {mesure['ops_par_seconde']:>14,.0f} élèves/s  "
+                f"pic {mesure['pic_memoire'] / 1024:>10,.1f} Kio  blocs nets {mesure['blocs_nets']:>+8d}",
+                file=sys.stderr
+            )
+            del entrees
+    return resultats
+
+
+def comparer(resultats: dict, reference: dict, seuil: float,
+             temps_min: float = TEMPS_MIN_COMPARAISON) -> list:
+    """
+    Retourne les régressions de débit supérieures au seuil (fraction), pour
+    les mesures dont un calcul dure au moins `temps_min` secondes.
+    """
+    regressions = []
+    for nom, par_taille in resultats.items():
+        for taille, mesure in par_taille.items():
+            ancien = reference.get("resultats", {}).get(nom, {}).get(taille)
+            if not ancien or mesure["temps_median"] < temps_min:
+                continue
+            rapport = mesure["ops_par_seconde"] / ancien["ops_par_seconde"]
+            if rapport < 1 - seuil:
+                regressions.append((nom, taille, ancien["ops_par_seconde"], mesure["ops_par_seconde"]))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai des calculs de moyenne.")
+    parser.add_argument('--tailles', default=','.join(map(str, TAILLES_PAR_DEFAUT)),
+                        help="Tailles de cohorte, séparées par des virgules")
+    parser.add_argument('--implementations', default=','.join(IMPLEMENTATIONS),
+                        help="Implémentations à mesurer, séparées par des virgules")
+    parser.add_argument('--repetitions', type=int, default=9,
+                        help="Passes chronométrées par mesure (temps médian)")
+    parser.add_argument('--max-scalaire', type=int, default=100_000,
+                        help="Taille maximale pour les implémentations élève par élève")
+    parser.add_argument('--enregistrer', metavar='FICHIER', help="Enregistrer les résultats comme référence")
+    parser.add_argument('--comparer', metavar='FICHIER', help="Comparer à une référence")
+    parser.add_argument('--seuil', type=float, default=0.2,
+                        help="Baisse de débit tolérée avant échec (0.2 = 20 %%)")
+    parser.add_argument('--temps-min', type=float, default=TEMPS_MIN_COMPARAISON,
+                        help="Temps par calcul (s) en deçà duquel une baisse n'est pas une régression")
+    args = parser.parse_args(argv)
+
+    tailles = [int(t) for t in args.tailles.split(',')]
+    implementations = [i for i in args.implementations.split(',') if i]
+    inconnues = [i for i in implementations if i not in IMPLEMENTATIONS]
+    if inconnues:
+        parser.error(f"Implémentations inconnues: {', '.join(inconnues)}")
+
+    resultats = executer_banc(tailles, implementations, args.repetitions, args.max_scalaire)
+    rapport = {
+        "version": 2,
+        "python": platform.python_version(),
+        "plateforme": platform.platform(),
+        "numpy": np.__version__,
+        "repetitions": args.repetitions,
+        "resultats": resultats,
+    }
+
+    if args.enregistrer:
+        with open(args.enregistrer, 'w', encoding='utf-8') as f:
+            json.dump(rapport, f, indent=2, ensure_ascii=False)
+
+    if args.comparer:
+        with open(args.comparer, encoding='utf-8') as f:
+            reference = json.load(f)
+        regressions = comparer(resultats, reference, args.seuil, args.temps_min)
+        for nom, taille, ancien, nouveau in regressions:
+            print(
+                f"RÉGRESSION {nom} ({taille} élèves): {ancien:,.0f} -> {nouveau:,.0f} élèves/s",
+                file=sys.stderr
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Comparaison de débit entre le serveur Flask (threadé) et serveur_async.
+
+Chaque serveur est lancé dans un processus séparé, sur une base temporaire
+contenant un profil avec un long historique. Des clients keep-alive envoient
+un mélange de POST /api/calculer et de GET /api/historique (pages de 500
+lignes) ; on mesure le débit total et la latence de chaque route, pour voir
+si les lectures d'historique retardent les calculs.
+
+Exemple :
+    python benchmarks/bench_serveurs.py --clients 64 --duree 10 --part-historique 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from base_donnees import initialiser_schema  # noqa: E402
+
+CORPS_CALCUL = json.dumps({"matieres": [
+    {"nom": "Anglais", "coefficient": 2, "note": "13.5", "selectionnee": True},
+    {"nom": "Maths", "coefficient": 4, "note": "15", "selectionnee": True},
+    {"nom": "Physique-Chimie", "coefficient": 4, "note": "11", "selectionnee": True},
+    {"nom": "SVT", "coefficient": 5, "note": "9.25", "selectionnee": True},
+]}).encode('utf-8')
+
+LANCEURS = {
+    "flask": (
+        "import web_app; web_app.init_db(); "
+        "web_app.app.run(host='127.0.0.1', port={port}, threaded=True)"
+    ),
+    "async": (
+        "import serveur_async; "
+        "serveur_async.main(['--port', '{port}', '--threads', '{threads}'])"
+    ),
+}
+
+
+def port_libre() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def preparer_base(dossier: str, lignes_historique: int):
+    """Crée la base du banc : un profil et son historique."""
+    chemin = os.path.join(dossier, 'profils.db')
+    initialiser_schema(chemin)
+    conn = sqlite3.connect(chemin)
+    conn.execute("INSERT INTO profils (id, nom) VALUES (1, 'banc')")
+    conn.executemany(
+        'INSERT INTO historique (profil_id, moyenne) VALUES (1, ?)',
+        (((i % 2000) / 100,) for i in range(lignes_historique))
+    )
+    conn.commit()
+    conn.close()
+
+
+def lancer_serveur(mode: str, dossier: str, threads: int):
+    port = port_libre()
+    code = LANCEURS[mode].format(port=port, threads=threads)
+    env = dict(os.environ, PYTHONPATH=RACINE, DB_POOL_TAILLE=str(threads))
+    processus = subprocess.Popen(
+        [sys.executable, '-c', code], cwd=dossier, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    limite = time.monotonic() + 15
+    while time.monotonic() < limite:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return processus, port
+        except OSError:
+            time.sleep(0.1)
+    processus.kill()
+    raise RuntimeError(f"Le serveur {mode} n'a pas démarré")
+
+
+class ReponseInvalide(Exception):
+    """Réponse HTTP que le client ne sait pas lire."""
+
+
+async def _lire_decoupe(lecteur) -> bytes:
+    morceaux = []
+    while True:
+        ligne = await lecteur.readuntil(b'\r\n')
+        try:
+            taille = int(ligne.split(b';', 1)[0], 16)
+        except ValueError:
+            raise ReponseInvalide(f"Taille de morceau invalide: {ligne[:20]!r}") from None
+        if not taille:
+            # Fin du corps, puis d'éventuels en-têtes de fin jusqu'à la ligne vide
+            while await lecteur.readuntil(b'\r\n') != b'\r\n':
+                pass
+            return b''.join(morceaux)
+        morceaux.append(await lecteur.readexactly(taille))
+        await lecteur.readexactly(2)
+
+
+async def echanger(lecteur, ecrivain, methode: str, cible: str, corps: bytes = b'',
+                   hote: str = 'localhost') -> tuple:
+    """
+    Envoie une requête sur une connexion keep-alive et lit toute la réponse.
+
+    Returns:
+        (statut, corps de la réponse, True si le serveur ferme la connexion)
+
+    Raises:
+        ReponseInvalide: Si la longueur du corps ne peut pas être déterminée
+    """
+    entetes = f"{methode} {cible} HTTP/1.1\r\nHost: {hote}\r\n"
+    if corps:
+        entetes += f"Content-Type: application/json\r\nContent-Length: {len(corps)}\r\n"
+    ecrivain.write(entetes.encode('latin-1') + b'\r\n' + corps)
+    await ecrivain.drain()
+    brut = await lecteur.readuntil(b'\r\n\r\n')
+    lignes = brut.decode('latin-1').split('\r\n')
+    statut = int(lignes[0].split(' ')[1])
+    longueur = None
+    decoupe = fermer = False
+    for ligne in lignes[1:]:
+        nom, _, valeur = ligne.partition(':')
+        nom = nom.strip().lower()
+        if nom == 'content-length':
+            longueur = int(valeur)
+        elif nom == 'transfer-encoding':
+            decoupe = valeur.strip().lower() == 'chunked'
+            if not decoupe:
+                raise ReponseInvalide(f"Transfer-Encoding non pris en charge: {valeur.strip()}")
+        elif nom == 'connection' and valeur.strip().lower() == 'close':
+            fermer = True
+    if methode == 'HEAD' or statut in (204, 304) or 100 <= statut < 200:
+        reponse = b''
+    elif decoupe:
+        reponse = await _lire_decoupe(lecteur)
+    elif longueur is not None:
+        reponse = await lecteur.readexactly(longueur)
+    elif fermer:
+        reponse = await lecteur.read()
+    else:
+        raise ReponseInvalide("Réponse sans Content-Length sur une connexion gardée ouverte")
+    return statut, reponse, fermer
+
+
+async def envoyer(lecteur, ecrivain, methode: str, cible: str, corps: bytes = b'') -> int:
+    """Comme echanger ; retourne le statut, ou -1 si le serveur ferme la connexion."""
+    statut, _, fermer = await echanger(lecteur, ecrivain, methode, cible, corps)
+    return -1 if fermer else statut
+
+
+async def client(port: int, fin: float, part_historique: float, graine: int, mesures: dict):
+    rng = random.Random(graine)
+    lecteur = ecrivain = None
+    while time.monotonic() < fin:
+        if ecrivain is None:
+            lecteur, ecrivain = await asyncio.open_connection('127.0.0.1', port)
+        historique = rng.random() < part_historique
+        debut = time.perf_counter()
+        try:
+            if historique:
+                statut = await envoyer(lecteur, ecrivain, 'GET', '/api/historique/1?limite=500')
+            else:
+                statut = await envoyer(lecteur, ecrivain, 'POST', '/api/calculer', CORPS_CALCUL)
+        except (ConnectionError, asyncio.IncompleteReadError, ReponseInvalide):
+            mesures["erreurs"] += 1
+            ecrivain.close()
+            ecrivain = None
+            continue
+        duree = time.perf_counter() - debut
+        if statut == -1:
+            ecrivain.close()
+            ecrivain = None
+            statut = 200
+        if statut != 200:
+            mesures["erreurs"] += 1
+        mesures["historique" if historique else "calculer"].append(duree)
+    if ecrivain is not None:
+        ecrivain.close()
+
+
+async def charger(port: int, clients: int, duree: float, part_historique: float, inactives: int) -> dict:
+    # Connexions ouvertes mais muettes : elles coûtent un thread à un
+    # serveur threadé, presque rien à une boucle asyncio
+    dormantes = [await asyncio.open_connection('127.0.0.1', port) for _ in range(inactives)]
+    mesures = {"calculer": [], "historique": [], "erreurs": 0}
+    fin = time.monotonic() + duree
+    await asyncio.gather(*(client(port, fin, part_historique, i, mesures) for i in range(clients)))
+    for _, ecrivain in dormantes:
+        ecrivain.close()
+    return mesures
+
+
+def percentile(valeurs, p: float) -> float:
+    if not valeurs:
+        return float('nan')
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(p * len(valeurs)))]
+
+
+def resumer(mode: str, mesures: dict, duree: float) -> dict:
+    total = len(mesures["calculer"]) + len(mesures["historique"])
+    resume = {"mode": mode, "requetes_par_seconde": total / duree, "erreurs": mesures["erreurs"]}
+    for route in ("calculer", "historique"):
+        latences = mesures[route]
+        resume[route] = {
+            "requetes": len(latences),
+            "p50_ms": 1000 * statistics.median(latences) if latences else float('nan'),
+            "p99_ms": 1000 * percentile(latences, 0.99),
+        }
+    return resume
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare le débit des serveurs Flask et asyncio.")
+    parser.add_argument('--modes', default='flask,async', help="Serveurs à mesurer (flask, async)")
+    parser.add_argument('--clients', type=int, default=32, help="Connexions actives simultanées")
+    parser.add_argument('--inactives', type=int, default=0, help="Connexions ouvertes sans requête")
+    parser.add_argument('--duree', type=float, default=10.0, help="Durée de chaque mesure (s)")
+    parser.add_argument('--part-historique', type=float, default=0.1,
+                        help="Fraction des requêtes qui lisent l'historique")
+    parser.add_argument('--lignes-historique', type=int, default=20_000,
+                        help="Lignes d'historique du profil de test")
+    parser.add_argument('--threads', type=int, default=8, help="Threads de base du serveur asyncio")
+    parser.add_argument('--json', metavar='FICHIER', help="Enregistrer les résultats")
+    args = parser.parse_args(argv)
+
+    resultats = []
+    for mode in [m for m in args.modes.split(',') if m]:
+        if mode not in LANCEURS:
+            parser.error(f"Mode inconnu: {mode}")
+        with tempfile.TemporaryDirectory() as dossier:
+            preparer_base(dossier, args.lignes_historique)
+            processus, port = lancer_serveur(mode, dossier, args.threads)
+            try:
+                mesures = asyncio.run(charger(
+                    port, args.clients, args.duree, args.part_historique, args.inactives
+                ))
+            finally:
+                processus.terminate()
+                processus.wait()
+        resume = resumer(mode, mesures, args.duree)
+        resultats.append(resume)
+        print(
+            f"{mode:6s} {resume['requetes_par_seconde']:>9,.0f} req/s  "
+            f"calculer p50 {resume['calculer']['p50_ms']:7.2f} ms p99 {resume['calculer']['p99_ms']:7.2f} ms  "
+            f"historique p50 {resume['historique']['p50_ms']:7.2f} ms p99 {resume['historique']['p99_ms']:7.2f} ms  "
+            f"erreurs {resume['erreurs']}",
+            file=sys.stderr
+        )
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultats, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test de charge de l'API web sur un serveur local.
+
+Un serveur (Flask ou serveur_async) est lancé sur une base temporaire, ou un
+serveur déjà démarré est visé avec --cible. Des clients keep-alive envoient
+un mélange pondéré de requêtes : calculs de moyenne, lecture et écriture de
+profils, historique. On mesure le débit et les latences p50/p95/p99 de chaque
+opération ; les résultats JSON peuvent être comparés d'une version à l'autre,
+comme pour bench_moyennes.py.
+
+Exemples :
+    python benchmarks/charge.py --clients 32 --duree 20 --enregistrer charge.json
+    python benchmarks/charge.py --serveur async --comparer charge.json --seuil 0.15
+    python benchmarks/charge.py --cible 127.0.0.1:8000 --mix calculer=90,historique_lire=10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Lancé depuis n'importe quel dossier : bench_serveurs est à côté
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_serveurs import LANCEURS, RACINE, ReponseInvalide, echanger, lancer_serveur, percentile  # noqa: E402
+
+NOMS_MATIERES = ["Anglais", "Français", "Histoire-Géo", "Maths", "Philo", "Physique-Chimie", "SVT",
+                 "Espagnol", "EPS"]
+
+# Répartition par défaut : surtout des calculs, des lectures de profils et
+# d'historique, peu d'écritures
+MIX_PAR_DEFAUT = {
+    "calculer": 60,
+    "profil_lire": 10,
+    "profils_lister": 5,
+    "profil_creer": 4,
+    "profil_modifier": 5,
+    "profil_supprimer": 2,
+    "historique_ajouter": 8,
+    "historique_lire": 6,
+}
+
+
+class Client:
+    """Connexion keep-alive et état d'un client virtuel."""
+
+    def __init__(self, hote: str, port: int, rng: random.Random, profils_partages: list):
+        self.hote = hote
+        self.port = port
+        self.rng = rng
+        # Profils créés à la préparation : lus et modifiés, jamais supprimés
+        self.profils_partages = profils_partages
+        # Profils créés par ce client : les seuls qu'il supprime
+        self.profils_crees = []
+        self.numero = 0
+        self.lecteur = self.ecrivain = None
+
+    async def requete(self, methode: str, cible: str, donnees=None) -> tuple:
+        """Envoie une requête ; retourne (statut, corps JSON décodé ou None)."""
+        if self.ecrivain is None:
+            self.lecteur, self.ecrivain = await asyncio.open_connection(self.hote, self.port)
+        corps = json.dumps(donnees).encode('utf-8') if donnees is not None else b''
+        try:
+            statut, reponse, fermer = await echanger(self.lecteur, self.ecrivain, methode, cible,
+                                                     corps, self.hote)
+        except BaseException:
+            self.fermer()
+            raise
+        if fermer:
+            self.fermer()
+        try:
+            return statut, json.loads(reponse) if reponse else None
+        except ValueError:
+            return statut, None
+
+    def fermer(self):
+        if self.ecrivain is not None:
+            self.ecrivain.close()
+        self.lecteur = self.ecrivain = None
+
+    def matieres(self) -> list:
+        noms = self.rng.sample(NOMS_MATIERES, self.rng.randint(5, len(NOMS_MATIERES)))
+        return [{
+            "nom": nom,
+            "coefficient": self.rng.choice([1, 2, 2, 3, 4, 5]),
+            # Comme l'interface : des notes en texte, parfois avec une virgule
+            "note": self.rng.choice([str, lambda n: str(n).replace('.', ',')])(
+                round(self.rng.uniform(0, 20) * 4) / 4
+            ),
+            "selectionnee": self.rng.random() < 0.9,
+        } for nom in noms]
+
+    def profil(self) -> int:
+        return self.rng.choice(self.profils_partages)
+
+
+# ---- Opérations du mélange : chacune retourne le statut HTTP ----
+
+async def op_calculer(client: Client) -> int:
+    return (await client.requete('POST', '/api/calculer', {"matieres": client.matieres()}))[0]
+
+
+async def op_profil_lire(client: Client) -> int:
+    return (await client.requete('GET', f'/api/profils/{client.profil()}'))[0]
+
+
+async def op_profils_lister(client: Client) -> int:
+    return (await client.requete('GET', '/api/profils'))[0]
+
+
+async def op_profil_creer(client: Client) -> int:
+    client.numero += 1
+    nom = f"charge-{id(client):x}-{client.numero}-{client.rng.getrandbits(32):08x}"
+    statut, corps = await client.requete('POST', '/api/profils', {"nom": nom, "matieres": client.matieres()})
+    if statut == 200 and corps and "id" in corps:
+        client.profils_crees.append(corps["id"])
+    return statut
+
+
+async def op_profil_modifier(client: Client) -> int:
+    cible = client.profil()
+    return (await client.requete('PUT', f'/api/profils/{cible}', {"matieres": client.matieres()}))[0]
+
+
+async def op_profil_supprimer(client: Client) -> int:
+    cible = client.profils_crees.pop(client.rng.randrange(len(client.profils_crees)))
+    return (await client.requete('DELETE', f'/api/profils/{cible}'))[0]
+
+
+async def op_historique_ajouter(client: Client) -> int:
+    donnees = {"profil_id": client.profil(), "moyenne": round(client.rng.uniform(5, 18), 2)}
+    return (await client.requete('POST', '/api/historique', donnees))[0]
+
+
+async def op_historique_lire(client: Client) -> int:
+    return (await client.requete('GET', f'/api/historique/{client.profil()}?limite=50'))[0]
+
+
+OPERATIONS = {
+    "calculer": op_calculer,
+    "profil_lire": op_profil_lire,
+    "profils_lister": op_profils_lister,
+    "profil_creer": op_profil_creer,
+    "profil_modifier": op_profil_modifier,
+    "profil_supprimer": op_profil_supprimer,
+    "historique_ajouter": op_historique_ajouter,
+    "historique_lire": op_historique_lire,
+}
+
+
+def lire_mix(texte: str) -> dict:
+    """
+    Lit un mélange « calculer=60,profil_lire=10 » (poids relatifs).
+
+    Raises:
+        ValueError: Si une opération est inconnue ou un poids invalide
+    """
+    mix = {}
+    for element in filter(None, (e.strip() for e in texte.split(','))):
+        nom, _, poids = element.partition('=')
+        if nom not in OPERATIONS:
+            raise ValueError(f"Opération inconnue: {nom} (disponibles: {', '.join(OPERATIONS)})")
+        mix[nom] = float(poids)
+        if mix[nom] < 0:
+            raise ValueError(f"Poids négatif pour {nom}")
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Mélange vide")
+    return mix
+
+
+async def preparer_profils(hote: str, port: int, nombre: int, graine: int) -> list:
+    """Crée les profils partagés par tous les clients ; retourne leurs identifiants."""
+    client = Client(hote, port, random.Random(graine), [])
+    identifiants = []
+    for i in range(nombre):
+        statut, corps = await client.requete(
+            'POST', '/api/profils', {"nom": f"charge-base-{graine}-{i}", "matieres": client.matieres()}
+        )
+        if statut != 200:
+            raise RuntimeError(f"Préparation impossible (POST /api/profils : {statut} {corps})")
+        identifiants.append(corps["id"])
+        await client.requete('POST', '/api/historique', {"profil_id": corps["id"], "moyenne": 12.0})
+    client.fermer()
+    return identifiants
+
+
+async def boucle_client(client: Client, noms: list, poids: list, fin_echauffement: float, fin: float,
+                        mesures: dict):
+    while True:
+        maintenant = time.monotonic()
+        if maintenant >= fin:
+            break
+        nom = client.rng.choices(noms, poids)[0]
+        if nom == "profil_supprimer" and not client.profils_crees:
+            # Rien à supprimer : le client crée un profil, compté comme création
+            nom = "profil_creer"
+        debut = time.perf_counter()
+        try:
+            statut = await OPERATIONS[nom](client)
+        except (ConnectionError, asyncio.IncompleteReadError, ReponseInvalide):
+            statut = None
+        duree = time.perf_counter() - debut
+        if maintenant < fin_echauffement:
+            continue
+        mesure = mesures.setdefault(nom, {"latences": [], "erreurs": 0})
+        mesure["latences"].append(duree)
+        if statut is None or statut >= 400:
+            mesure["erreurs"] += 1
+    client.fermer()
+
+
+async def charger(hote: str, port: int, clients: int, duree: float, echauffement: float,
+                  mix: dict, profils: int, graine: int) -> dict:
+    partages = await preparer_profils(hote, port, profils, graine)
+    noms = list(mix)
+    poids = [mix[n] for n in noms]
+    mesures = {}
+    debut = time.monotonic()
+    fin_echauffement = debut + echauffement
+    await asyncio.gather(*(
+        boucle_client(Client(hote, port, random.Random(graine + 1 + i), partages),
+                      noms, poids, fin_echauffement, fin_echauffement + duree, mesures)
+        for i in range(clients)
+    ))
+    return mesures
+
+
+def resumer(mesures: dict, duree: float) -> dict:
+    """Débit et percentiles de latence, par opération et au total."""
+    def stats(latences, erreurs):
+        return {
+            "requetes": len(latences),
+            "erreurs": erreurs,
+            "requetes_par_seconde": round(len(latences) / duree, 1),
+            "p50_ms": round(1000 * statistics.median(latences), 3) if latences else None,
+            "p95_ms": round(1000 * percentile(latences, 0.95), 3) if latences else None,
+            "p99_ms": round(1000 * percentile(latences, 0.99), 3) if latences else None,
+        }
+
+    operations = {nom: stats(m["latences"], m["erreurs"]) for nom, m in sorted(mesures.items())}
+    toutes = [l for m in mesures.values() for l in m["latences"]]
+    return {"total": stats(toutes, sum(m["erreurs"] for m in mesures.values())), "operations": operations}
+
+
+def version_code() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RACINE, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or "inconnue"
+    except (OSError, subprocess.SubprocessError):
+        return "inconnue"
+
+
+def comparer(resultats: dict, reference: dict, seuil: float) -> list:
+    """Retourne les régressions (débit en baisse ou p99 en hausse au-delà du seuil)."""
+    regressions = []
+    anciens = reference.get("resultats", {})
+    for nom, mesure in [("total", resultats["total"])] + list(resultats["operations"].items()):
+        ancien = anciens.get("total") if nom == "total" else anciens.get("operations", {}).get(nom)
+        if not ancien or not ancien.get("requetes_par_seconde") or not mesure["requetes"]:
+            continue
+        rapport = mesure["requetes_par_seconde"] / ancien["requetes_par_seconde"]
+        if rapport < 1 - seuil:
+            regressions.append((nom, "req/s", ancien["requetes_par_seconde"], mesure["requetes_par_seconde"]))
+        if ancien.get("p99_ms") and mesure["p99_ms"] > ancien["p99_ms"] * (1 + seuil):
+            regressions.append((nom, "p99 ms", ancien["p99_ms"], mesure["p99_ms"]))
+    return regressions
+
+
+def afficher(resultats: dict):
+    print(f"{'opération':20s} {'requêtes':>9s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} "
+          f"{'p99 ms':>9s} {'erreurs':>8s}", file=sys.stderr)
+    for nom, m in list(resultats["operations"].items()) + [("TOTAL", resultats["total"])]:
+        print(f"{nom:20s} {m['requetes']:>9d} {m['requetes_par_seconde']:>9,.1f} "
+              f"{m['p50_ms'] or 0:>9.2f} {m['p95_ms'] or 0:>9.2f} {m['p99_ms'] or 0:>9.2f} "
+              f"{m['erreurs']:>8d}", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge de l'API web.")
+    parser.add_argument('--serveur', default='flask', choices=sorted(LANCEURS),
+                        help="Serveur lancé pour le test")
+    parser.add_argument('--cible', metavar='HOTE:PORT', help="Viser un serveur déjà démarré")
+    parser.add_argument('--clients', type=int, default=16, help="Clients simultanés (connexions keep-alive)")
+    parser.add_argument('--duree', type=float, default=15.0, help="Durée mesurée (s)")
+    parser.add_argument('--echauffement', type=float, default=2.0, help="Durée non mesurée au début (s)")
+    parser.add_argument('--mix', default=','.join(f"{n}={p}" for n, p in MIX_PAR_DEFAUT.items()),
+                        help="Poids des opérations (nom=poids, séparés par des virgules)")
+    parser.add_argument('--profils', type=int, default=50, help="Profils créés avant la mesure")
+    parser.add_argument('--threads', type=int, default=8, help="Threads de base du serveur lancé")
+    parser.add_argument('--graine', type=int, default=20241018, help="Graine des tirages aléatoires")
+    parser.add_argument('--enregistrer', metavar='FICHIER', help="Enregistrer les résultats (JSON)")
+    parser.add_argument('--comparer', metavar='FICHIER', help="Comparer à des résultats enregistrés")
+    parser.add_argument('--seuil', type=float, default=0.2,
+                        help="Dégradation tolérée avant échec (0.2 = 20 %%)")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = lire_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def mesurer(hote, port):
+        return asyncio.run(charger(
+            hote, port, args.clients, args.duree, args.echauffement, mix, args.profils, args.graine
+        ))
+
+    if args.cible:
+        hote, _, port = args.cible.rpartition(':')
+        mesures = mesurer(hote or '127.0.0.1', int(port))
+    else:
+        with tempfile.TemporaryDirectory() as dossier:
+            processus, port = lancer_serveur(args.serveur, dossier, args.threads)
+            try:
+                mesures = mesurer('127.0.0.1', port)
+            finally:
+                processus.terminate()
+                processus.wait()
+
+    resultats = resumer(mesures, args.duree)
+    afficher(resultats)
+    rapport = {
+        "version": 1,
+        "code": version_code(),
+        "date": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "python": platform.python_version(),
+        "plateforme": platform.platform(),
+        "serveur": args.cible or args.serveur,
+        "parametres": {
+            "clients": args.clients, "duree": args.duree, "echauffement": args.echauffement,
+            "mix": mix, "profils": args.profils, "threads": args.threads, "graine": args.graine,
+        },
+        "resultats": resultats,
+    }
+
+    if args.enregistrer:
+        with open(args.enregistrer, 'w', encoding='utf-8') as f:
+            json.dump(rapport, f, indent=2, ensure_ascii=False)
+
+    if args.comparer:
+        with open(args.comparer, encoding='utf-8') as f:
+            reference = json.load(f)
+        regressions = comparer(resultats, reference, args.seuil)
+        for nom, mesure, ancien, nouveau in regressions:
+            print(f"RÉGRESSION {nom} {mesure} : {ancien:,.2f} -> {nouveau:,.2f}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Cache des réponses JSON des routes de lecture, avec ETag fort.
+
+Une réponse est mémorisée sérialisée, avec l'empreinte de son corps : une
+lecture répétée renvoie les octets déjà prêts, et un client qui présente
+l'ETag reçu reçoit un 304 sans corps. Chaque entrée porte des étiquettes
+(« profils », « profil:3 »...) : une écriture n'invalide que les entrées qui
+portent son étiquette. Au-delà de la capacité, l'entrée la moins récemment
+lue est évincée (LRU).
+
+L'invalidation par étiquettes ne voit que les écritures du processus. Pour
+celles des autres workers (ou d'un import en ligne de commande), chaque
+étiquette a aussi un numéro de version en base, incrémenté dans la
+transaction de l'écriture : une entrée garde les versions lues avant sa
+construction, et elles sont comparées à la base au plus une fois par
+intervalle, comme pour le catalogue des matières.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, FrozenSet, Hashable, Iterable, Optional, Set, Tuple
+
+
+@dataclass(frozen=True)
+class EntreeCache:
+    """
+    Une réponse mémorisée : corps sérialisé, type et ETag, avec les versions
+    en base de ses étiquettes et l'instant où elles ont été vérifiées.
+    """
+    corps: bytes
+    mimetype: str
+    etag: str
+    etiquettes: FrozenSet[str]
+    versions: Tuple[Tuple[str, int], ...] = ()
+    verifiee: float = 0.0
+
+
+def calculer_etag(corps: bytes) -> str:
+    """Retourne un ETag fort (entre guillemets) dérivé du contenu."""
+    return '"' + hashlib.blake2b(corps, digest_size=16).hexdigest() + '"'
+
+
+def etag_correspond(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Indique si l'en-tête If-None-Match désigne l'ETag donné.
+
+    Args:
+        if_none_match: Valeur brute de l'en-tête (liste séparée par des virgules, ou *)
+        etag: ETag courant, entre guillemets
+    """
+    if not if_none_match:
+        return False
+    for candidat in if_none_match.split(','):
+        candidat = candidat.strip()
+        # Comparaison faible (RFC 9110 § 13.1.2) : le préfixe W/ est ignoré
+        if candidat.startswith('W/'):
+            candidat = candidat[2:]
+        if candidat == '*' or candidat == etag:
+            return True
+    return False
+
+
+class CacheReponses:
+    """Cache LRU de réponses, invalidé par étiquettes."""
+
+    def __init__(self, capacite: int = 256,
+                 lire_versions: Optional[Callable[[Iterable[str]], tuple]] = None,
+                 intervalle: float = 1.0):
+        """
+        Args:
+            capacite: Nombre maximal d'entrées conservées
+            lire_versions: Lit en base les versions d'étiquettes (triées par
+                étiquette) ; None pour un cache limité au processus
+            intervalle: Délai (s) pendant lequel une entrée est servie sans
+                comparer ses versions à la base
+
+        Raises:
+            ValueError: Si la capacité n'est pas strictement positive
+        """
+        if capacite <= 0:
+            raise ValueError(f"La capacité doit être > 0, reçu: {capacite}")
+        self.capacite = capacite
+        self._lire_versions = lire_versions
+        self.intervalle = intervalle
+        self._entrees: "OrderedDict[Hashable, EntreeCache]" = OrderedDict()
+        self._par_etiquette: Dict[str, Set[Hashable]] = {}
+        self._verrou = threading.Lock()
+        # Incrémenté à chaque invalidation : une réponse construite pendant
+        # une écriture n'est pas mémorisée (elle peut déjà être périmée)
+        self._generation = 0
+
+        self.succes = 0
+        self.echecs = 0
+        self.reponses_304 = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.verifications = 0
+        self.perimees = 0
+
+    def _versions(self, etiquettes: Iterable[str]) -> tuple:
+        if self._lire_versions is None or not etiquettes:
+            return ()
+        return tuple(self._lire_versions(etiquettes))
+
+    def generation(self, etiquettes: Iterable[str] = ()) -> tuple:
+        """
+        Jeton à prendre avant de construire une réponse, puis à passer à
+        stocker() : numéro d'invalidation du processus et versions en base
+        des étiquettes de la réponse.
+        """
+        with self._verrou:
+            generation = self._generation
+        return generation, self._versions(etiquettes)
+
+    def lire(self, cle: Hashable) -> Optional[EntreeCache]:
+        """
+        Retourne l'entrée de la clé (et la marque récente), ou None. Une
+        entrée dont une étiquette a changé de version en base est retirée.
+        """
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                self.echecs += 1
+                return None
+            self._entrees.move_to_end(cle)
+            if not entree.versions or time.monotonic() - entree.verifiee < self.intervalle:
+                self.succes += 1
+                return entree
+
+        # Lecture en base hors du verrou
+        versions = self._versions(entree.etiquettes)
+        with self._verrou:
+            self.verifications += 1
+            if versions != entree.versions:
+                # Écriture d'un autre processus : la réponse est reconstruite
+                if self._entrees.get(cle) is entree:
+                    self._retirer(cle)
+                self.perimees += 1
+                self.echecs += 1
+                return None
+            entree = replace(entree, verifiee=time.monotonic())
+            if cle in self._entrees:
+                self._entrees[cle] = entree
+            self.succes += 1
+            return entree
+
+    def stocker(self, cle: Hashable, corps: bytes, mimetype: str,
+                etiquettes: Iterable[str], generation: tuple) -> EntreeCache:
+        """
+        Mémorise une réponse, sauf si une invalidation a eu lieu depuis
+        `generation`. Retourne l'entrée (mémorisée ou non) pour la servir.
+        """
+        numero, versions = generation
+        entree = EntreeCache(corps, mimetype, calculer_etag(corps), frozenset(etiquettes),
+                             versions, time.monotonic())
+        with self._verrou:
+            if numero != self._generation:
+                return entree
+            self._retirer(cle)
+            self._entrees[cle] = entree
+            for etiquette in entree.etiquettes:
+                self._par_etiquette.setdefault(etiquette, set()).add(cle)
+            while len(self._entrees) > self.capacite:
+                ancienne = next(iter(self._entrees))
+                self._retirer(ancienne)
+                self.evictions += 1
+        return entree
+
+    def _retirer(self, cle: Hashable):
+        entree = self._entrees.pop(cle, None)
+        if entree is None:
+            return
+        for etiquette in entree.etiquettes:
+            cles = self._par_etiquette.get(etiquette)
+            if cles is not None:
+                cles.discard(cle)
+                if not cles:
+                    del self._par_etiquette[etiquette]
+
+    def invalider(self, *etiquettes: str) -> int:
+        """
+        Retire toutes les entrées portant l'une des étiquettes.
+
+        Returns:
+            Le nombre d'entrées retirées
+        """
+        with self._verrou:
+            self._generation += 1
+            cles = set()
+            for etiquette in etiquettes:
+                cles |= self._par_etiquette.get(etiquette, set())
+            for cle in cles:
+                self._retirer(cle)
+            self.invalidations += len(cles)
+            return len(cles)
+
+    def compter_304(self):
+        with self._verrou:
+            self.reponses_304 += 1
+
+    def vider(self):
+        """Retire toutes les entrées (les compteurs sont conservés)."""
+        with self._verrou:
+            self._generation += 1
+            self._entrees.clear()
+            self._par_etiquette.clear()
+
+    def __len__(self) -> int:
+        return len(self._entrees)
+
+    def statistiques(self) -> dict:
+        """Compteurs du cache, dont le taux de succès."""
+        with self._verrou:
+            lectures = self.succes + self.echecs
+            return {
+                "entrees": len(self._entrees),
+                "capacite": self.capacite,
+                "succes": self.succes,
+                "echecs": self.echecs,
+                "taux_succes": round(self.succes / lectures, 4) if lectures else 0.0,
+                "reponses_304": self.reponses_304,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "verifications": self.verifications,
+                "perimees": self.perimees,
+            }
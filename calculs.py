@@ -2,8 +2,20 @@
 Module de calcul partagé entre les différentes versions (Tkinter, Flask, Kivy)
 """
 
+import math
+from array import array
 from dataclasses import dataclass
-from typing import List
+from operator import mul
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Iterable, List, Optional, Sequence, Union
+
+from baremes import BAREME_PAR_DEFAUT, charger_numpy, obtenir_bareme
+from classement import Classement
+
+if TYPE_CHECKING:
+    from numpy import ndarray as TableauNumpy
+else:
+    # NumPy n'est importé qu'au premier calcul par lot (charger_numpy)
+    TableauNumpy = Any
 
 
 @dataclass
@@ -21,16 +33,187 @@ class Matiere:
             raise ValueError(f"La note doit être entre 0 et 20, reçu: {self.note}")
 
 
-def calculer_moyenne(matieres: List[Matiere]) -> float:
+class VueMatiere:
+    """Vue légère sur une ligne d'une MatiereTable (aucune copie des données)."""
+    __slots__ = ("_table", "_index")
+    
+    def __init__(self, table: "MatiereTable", index: int):
+        self._table = table
+        self._index = index
+    
+    @property
+    def nom(self) -> str:
+        return self._table.noms[self._index]
+    
+    @property
+    def coefficient(self) -> float:
+        return self._table.coefficients[self._index]
+    
+    @property
+    def note(self) -> float:
+        return self._table.notes[self._index]
+    
+    def __repr__(self):
+        return f"VueMatiere(nom={self.nom!r}, coefficient={self.coefficient}, note={self.note})"
+
+
+class MatiereTable:
+    """
+    Table de matières stockée en colonnes : noms, coefficients et notes sont
+    conservés dans des tableaux parallèles typés plutôt qu'un objet par matière.
+    
+    La validation est faite en bloc à la construction et à chaque ajout.
+    """
+    __slots__ = ("noms", "coefficients", "notes")
+    
+    def __init__(self, noms: Iterable[str] = (), coefficients: Iterable[float] = (),
+                 notes: Iterable[float] = ()):
+        """
+        Initialise la table.
+        
+        Args:
+            noms: Noms des matières
+            coefficients: Coefficients des matières
+            notes: Notes sur 20 (0.0 par défaut si la colonne est vide)
+            
+        Raises:
+            ValueError: Si les colonnes n'ont pas la même longueur
+            ValueError: Si un coefficient est négatif ou nul
+            ValueError: Si une note est en dehors de [0, 20]
+        """
+        self.noms = list(noms)
+        self.coefficients = array("d", coefficients)
+        self.notes = array("d", notes)
+        if not self.notes and self.noms:
+            self.notes = array("d", [0.0]) * len(self.noms)
+        self._valider(0)
+    
+    @classmethod
+    def depuis_matieres(cls, matieres: Iterable) -> "MatiereTable":
+        """Construit une table à partir d'objets exposant nom, coefficient et note."""
+        matieres = list(matieres)
+        return cls(
+            (m.nom for m in matieres),
+            (m.coefficient for m in matieres),
+            (m.note for m in matieres),
+        )
+    
+    @classmethod
+    def depuis_dicts(cls, matieres: Iterable[dict]) -> "MatiereTable":
+        """Construit une table à partir de dictionnaires {nom, coefficient, note}."""
+        matieres = list(matieres)
+        return cls(
+            (m["nom"] for m in matieres),
+            (m["coefficient"] for m in matieres),
+            (m.get("note", 0.0) for m in matieres),
+        )
+
+    @classmethod
+    def depuis_colonnes_validees(cls, noms: List[str], coefficients: Iterable[float],
+                                 notes: Iterable[float]) -> "MatiereTable":
+        """
+        Construit une table sans repasser la validation, pour des colonnes
+        déjà contrôlées une à une (voir validation.valider_matieres).
+        """
+        table = cls.__new__(cls)
+        table.noms = noms
+        table.coefficients = array("d", coefficients)
+        table.notes = array("d", notes)
+        return table
+
+    def _valider(self, debut: int):
+        """Valide en bloc les lignes à partir de l'index debut."""
+        n = len(self.noms)
+        if len(self.coefficients) != n or len(self.notes) != n:
+            raise ValueError(
+                f"Colonnes de longueurs différentes: {n} noms, "
+                f"{len(self.coefficients)} coefficients, {len(self.notes)} notes"
+            )
+        if debut >= n:
+            return
+        
+        coeffs = self.coefficients[debut:]
+        notes = self.notes[debut:]
+        # min/max s'exécutent en C ; la somme détecte les NaN et les infinis.
+        # Elle ne lève jamais (contrairement à math.fsum, qui lève OverflowError
+        # pour [1e308, 1e308]) : un dépassement renvoie au contrôle ligne à ligne.
+        if min(coeffs) > 0 and 0 <= min(notes) and max(notes) <= 20 \
+                and math.isfinite(sum(notes)) and math.isfinite(sum(coeffs)):
+            return
+        
+        for i in range(debut, n):
+            if not self.coefficients[i] > 0:
+                raise ValueError(
+                    f"Le coefficient doit être positif pour {self.noms[i]}, "
+                    f"reçu: {self.coefficients[i]}"
+                )
+            if not math.isfinite(self.coefficients[i]):
+                raise ValueError(
+                    f"Le coefficient doit être fini pour {self.noms[i]}, reçu: {self.coefficients[i]}"
+                )
+            if not (0 <= self.notes[i] <= 20):
+                raise ValueError(
+                    f"La note doit être entre 0 et 20 pour {self.noms[i]}, reçu: {self.notes[i]}"
+                )
+        # Chaque valeur est valide mais la moyenne pondérée déborderait
+        if not math.isfinite(sum(self.coefficients)):
+            raise ValueError("La somme des coefficients est trop grande")
+    
+    def ajouter(self, nom: str, coefficient: float, note: float = 0.0):
+        """Ajoute une matière à la fin de la table."""
+        self.noms.append(nom)
+        self.coefficients.append(coefficient)
+        self.notes.append(note)
+        try:
+            self._valider(len(self.noms) - 1)
+        except ValueError:
+            self.noms.pop()
+            self.coefficients.pop()
+            self.notes.pop()
+            raise
+    
+    def __len__(self) -> int:
+        return len(self.noms)
+    
+    def __getitem__(self, index: int) -> VueMatiere:
+        if index < 0:
+            index += len(self.noms)
+        if not 0 <= index < len(self.noms):
+            raise IndexError("index de matière hors limites")
+        return VueMatiere(self, index)
+    
+    def __iter__(self):
+        for i in range(len(self.noms)):
+            yield VueMatiere(self, i)
+    
+    def vers_dicts(self) -> List[dict]:
+        """Retourne les matières sous forme de dictionnaires (sérialisation JSON)."""
+        return [
+            {"nom": nom, "note": note, "coefficient": coefficient}
+            for nom, coefficient, note in zip(self.noms, self.coefficients, self.notes)
+        ]
+
+
+def calculer_moyenne(matieres: Union[List[Matiere], MatiereTable]) -> float:
     """
     Calcule la moyenne pondérée des matières.
     
     Args:
-        matieres: Liste des matières sélectionnées
+        matieres: Liste des matières sélectionnées, ou une MatiereTable
         
     Returns:
         La moyenne pondérée
     """
+    if isinstance(matieres, MatiereTable):
+        # Produits et sommes en C (map + operator.mul), sans générateur ni
+        # appel à MatiereTable.__len__ ; l'ordre des additions est celui du
+        # calcul sur une liste, le résultat est identique au bit près
+        coefficients = matieres.coefficients
+        somme_coeffs = sum(coefficients)
+        if not somme_coeffs > 0:
+            return 0.0
+        return sum(map(mul, matieres.notes, coefficients)) / somme_coeffs
+    
     if not matieres:
         return 0.0
     
@@ -40,26 +223,308 @@ def calculer_moyenne(matieres: List[Matiere]) -> float:
     return somme_notes / somme_coeffs if somme_coeffs > 0 else 0.0
 
 
-def obtenir_appreciation(moyenne: float) -> dict:
+def calculer_moyennes_batch(notes_matrix, coefficients, selection_mask=None):
+    """
+    Calcule en une passe vectorisée la moyenne pondérée de chaque élève.
+    
+    Les sommes sont accumulées matière par matière, dans le même ordre que
+    calculer_moyenne, afin d'obtenir des résultats identiques au calcul
+    élève par élève.
+    
+    Args:
+        notes_matrix: Tableau (élèves x matières) des notes sur 20
+        coefficients: Coefficients par matière (1D) ou par élève (2D)
+        selection_mask: Tableau booléen (élèves x matières) des matières
+            retenues ; toutes les matières si None
+        
+    Returns:
+        Un tableau NumPy des moyennes (0.0 si aucune matière retenue)
+    """
+    np = charger_numpy()
+    if np is None:
+        raise ImportError("NumPy est requis pour calculer_moyennes_batch")
+    
+    notes = np.asarray(notes_matrix, dtype=np.float64)
+    if notes.ndim != 2:
+        raise ValueError(f"notes_matrix doit être en 2 dimensions, reçu: {notes.ndim}")
+    coeffs = np.broadcast_to(np.asarray(coefficients, dtype=np.float64), notes.shape)
+    if selection_mask is None:
+        masque = np.ones(notes.shape, dtype=bool)
+    else:
+        masque = np.broadcast_to(np.asarray(selection_mask, dtype=bool), notes.shape)
+    
+    if np.any(coeffs[masque] <= 0):
+        raise ValueError("Le coefficient doit être positif")
+    notes_retenues = notes[masque]
+    if np.any((notes_retenues < 0) | (notes_retenues > 20)) or np.isnan(notes_retenues).any():
+        raise ValueError("La note doit être entre 0 et 20")
+    
+    somme_notes = np.zeros(notes.shape[0])
+    somme_coeffs = np.zeros(notes.shape[0])
+    for j in range(notes.shape[1]):
+        colonne = masque[:, j]
+        somme_notes += np.where(colonne, notes[:, j] * coeffs[:, j], 0.0)
+        somme_coeffs += np.where(colonne, coeffs[:, j], 0.0)
+    
+    moyennes = np.zeros(notes.shape[0])
+    np.divide(somme_notes, somme_coeffs, out=moyennes, where=somme_coeffs > 0)
+    return moyennes
+
+
+def calculer_moyennes_tables(tables: List[MatiereTable]) -> List[float]:
+    """
+    Calcule la moyenne de plusieurs MatiereTable en une seule passe.
+    
+    Les tables (de longueurs différentes) sont alignées dans une matrice
+    complétée par un masque, puis passées à calculer_moyennes_batch. Sans
+    NumPy, on se rabat sur calculer_moyenne table par table.
+    
+    Args:
+        tables: Les tables, une par élève
+        
+    Returns:
+        La liste des moyennes, dans l'ordre des tables
+    """
+    np = charger_numpy()
+    if np is None:
+        return [calculer_moyenne(t) for t in tables]
+    if not tables:
+        return []
+    
+    largeur = max(len(t) for t in tables)
+    notes = np.zeros((len(tables), largeur))
+    coeffs = np.ones((len(tables), largeur))
+    masque = np.zeros((len(tables), largeur), dtype=bool)
+    for i, t in enumerate(tables):
+        n = len(t)
+        notes[i, :n] = t.notes
+        coeffs[i, :n] = t.coefficients
+        masque[i, :n] = True
+    
+    return calculer_moyennes_batch(notes, coeffs, masque).tolist()
+
+
+@dataclass
+class NotesCibles:
+    """
+    Résultat de calculer_notes_cibles, pour E élèves, M matières et K cibles.
+    
+    Les valeurs inatteignables valent NaN.
+    """
+    cibles: TableauNumpy                # (K,) moyennes visées
+    moyenne_actuelle: TableauNumpy      # (E,) moyenne des notes déjà connues
+    atteignable: TableauNumpy           # (E, K) la cible peut-elle encore être atteinte
+    note_uniforme: TableauNumpy         # (E, K) note minimale à obtenir partout
+    note_min_par_matiere: TableauNumpy  # (E, K, M) note minimale dans chaque matière restante
+
+
+# Écart d'arrondi toléré sur les points manquants (une cible atteinte
+# exactement ne doit pas être déclarée inatteignable)
+TOLERANCE_CIBLE = 1e-9
+
+
+def calculer_notes_cibles(notes_matrix, coefficients, connues_mask, selection_mask=None,
+                          cibles: Optional[Sequence[float]] = None) -> NotesCibles:
+    """
+    Calcule, pour chaque élève et chaque moyenne visée, les notes minimales
+    à obtenir dans les matières restantes.
+    
+    - note_uniforme : la même note x dans toutes les matières restantes ;
+    - note_min_par_matiere : la note minimale dans une matière si toutes les
+      autres matières restantes sont à 20 (la plage faisable est [min, 20]).
+    
+    Args:
+        notes_matrix: Tableau (élèves x matières) ; seules les notes connues sont lues
+        coefficients: Coefficients par matière (1D) ou par élève (2D)
+        connues_mask: Tableau booléen des notes déjà obtenues
+        selection_mask: Matières comptant dans la moyenne ; toutes si None
+        cibles: Moyennes visées ; par défaut les seuils du barème par défaut
+        
+    Returns:
+        Un NotesCibles
+    """
+    np = charger_numpy()
+    if np is None:
+        raise ImportError("NumPy est requis pour calculer_notes_cibles")
+    
+    notes = np.asarray(notes_matrix, dtype=np.float64)
+    if notes.ndim != 2:
+        raise ValueError(f"notes_matrix doit être en 2 dimensions, reçu: {notes.ndim}")
+    coeffs = np.broadcast_to(np.asarray(coefficients, dtype=np.float64), notes.shape)
+    selection = (np.ones(notes.shape, dtype=bool) if selection_mask is None
+                 else np.broadcast_to(np.asarray(selection_mask, dtype=bool), notes.shape))
+    connues = np.broadcast_to(np.asarray(connues_mask, dtype=bool), notes.shape) & selection
+    restantes = selection & ~connues
+    if cibles is None:
+        cibles = obtenir_bareme().seuils
+    cibles = np.asarray(cibles, dtype=np.float64)
+    
+    if np.any(coeffs[selection] <= 0):
+        raise ValueError("Le coefficient doit être positif")
+    notes_connues = notes[connues]
+    if np.any((notes_connues < 0) | (notes_connues > 20)) or np.isnan(notes_connues).any():
+        raise ValueError("La note doit être entre 0 et 20")
+    
+    somme_connue = np.where(connues, notes * coeffs, 0.0).sum(axis=1)
+    coeffs_connus = np.where(connues, coeffs, 0.0).sum(axis=1)
+    coeffs_restants = np.where(restantes, coeffs, 0.0).sum(axis=1)
+    coeffs_total = coeffs_connus + coeffs_restants
+    
+    moyenne_actuelle = np.zeros(notes.shape[0])
+    np.divide(somme_connue, coeffs_connus, out=moyenne_actuelle, where=coeffs_connus > 0)
+    
+    # Points manquants pour chaque cible : T * Σcoef - Σ(note × coef) connues
+    manque = cibles[None, :] * coeffs_total[:, None] - somme_connue[:, None]  # (E, K)
+    
+    # Même tolérance qu'il reste des matières ou non : au mieux, les matières
+    # restantes apportent 20 × Σcoef restants. Sans aucune matière
+    # sélectionnée, il n'y a pas de moyenne : aucune cible n'est atteignable.
+    atteignable = (manque <= 20.0 * coeffs_restants[:, None] + TOLERANCE_CIBLE) \
+        & (coeffs_total[:, None] > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        uniforme = np.clip(manque / coeffs_restants[:, None], 0.0, 20.0)
+        uniforme = np.where(coeffs_restants[:, None] > 0, uniforme, 0.0)
+        uniforme = np.where(atteignable, uniforme, np.nan)
+        
+        # Dans la matière j, les autres matières restantes apportent au plus 20 × coef
+        autres = 20.0 * (coeffs_restants[:, None] - coeffs)  # (E, M)
+        par_matiere = (manque[:, :, None] - autres[:, None, :]) / coeffs[:, None, :]
+        par_matiere = np.clip(par_matiere, 0.0, 20.0)
+        par_matiere = np.where(restantes[:, None, :] & atteignable[:, :, None], par_matiere, np.nan)
+    
+    return NotesCibles(cibles, moyenne_actuelle, atteignable, uniforme, par_matiere)
+
+
+def classer_tables(tables: Dict[Hashable, MatiereTable]) -> Classement:
+    """
+    Calcule les moyennes d'une classe et construit son index de classement.
+    
+    Args:
+        tables: La table des matières de chaque élève, par identifiant
+        
+    Returns:
+        Un Classement, à tenir ensuite à jour avec Classement.mettre_a_jour
+    """
+    eleves = list(tables)
+    moyennes = calculer_moyennes_tables([tables[e] for e in eleves])
+    return Classement.depuis_moyennes(dict(zip(eleves, moyennes)))
+
+
+class MoyenneIncrementale:
+    """
+    Accumulateur de moyenne pondérée mis à jour en O(1).
+    
+    Conserve Σ(note × coef) et Σcoef des matières sélectionnées : changer une
+    note ou (dé)sélectionner une matière ne demande pas de tout resommer.
+    Les sommes sont recalculées exactement toutes les `resynchronisation`
+    mises à jour pour éviter la dérive des arrondis.
+    """
+    
+    def __init__(self, resynchronisation: int = 1000):
+        self._entrees: Dict[Hashable, list] = {}  # clé -> [coefficient, note, sélectionnée]
+        self._somme_notes = 0.0
+        self._somme_coeffs = 0.0
+        self._nb_selectionnees = 0
+        self._mises_a_jour = 0
+        self._resynchronisation = resynchronisation
+    
+    def _retirer_des_sommes(self, entree: list):
+        if entree[2]:
+            self._somme_notes -= entree[1] * entree[0]
+            self._somme_coeffs -= entree[0]
+            self._nb_selectionnees -= 1
+    
+    def _ajouter_aux_sommes(self, entree: list):
+        if entree[2]:
+            self._somme_notes += entree[1] * entree[0]
+            self._somme_coeffs += entree[0]
+            self._nb_selectionnees += 1
+        self._mises_a_jour += 1
+        if self._mises_a_jour >= self._resynchronisation:
+            self.recalculer()
+    
+    def definir(self, cle: Hashable, coefficient: float, note: float = 0.0,
+                selectionnee: bool = True):
+        """
+        Ajoute ou remplace une matière.
+        
+        Raises:
+            ValueError: Si le coefficient est négatif ou nul
+            ValueError: Si la note est en dehors de [0, 20]
+        """
+        if coefficient <= 0:
+            raise ValueError(f"Le coefficient doit être positif, reçu: {coefficient}")
+        if not (0 <= note <= 20):
+            raise ValueError(f"La note doit être entre 0 et 20, reçu: {note}")
+        ancienne = self._entrees.get(cle)
+        if ancienne is not None:
+            self._retirer_des_sommes(ancienne)
+        entree = [coefficient, note, selectionnee]
+        self._entrees[cle] = entree
+        self._ajouter_aux_sommes(entree)
+    
+    def modifier_note(self, cle: Hashable, note: float):
+        """Met à jour la note d'une matière existante."""
+        if not (0 <= note <= 20):
+            raise ValueError(f"La note doit être entre 0 et 20, reçu: {note}")
+        entree = self._entrees[cle]
+        self._retirer_des_sommes(entree)
+        entree[1] = note
+        self._ajouter_aux_sommes(entree)
+    
+    def selectionner(self, cle: Hashable, selectionnee: bool):
+        """Inclut ou exclut une matière du calcul."""
+        entree = self._entrees[cle]
+        if entree[2] == bool(selectionnee):
+            return
+        self._retirer_des_sommes(entree)
+        entree[2] = bool(selectionnee)
+        self._ajouter_aux_sommes(entree)
+    
+    def retirer(self, cle: Hashable):
+        """Retire une matière de l'accumulateur."""
+        entree = self._entrees.pop(cle)
+        self._retirer_des_sommes(entree)
+    
+    def recalculer(self):
+        """Recalcule exactement les sommes à partir des entrées."""
+        selection = [e for e in self._entrees.values() if e[2]]
+        self._somme_notes = sum(e[1] * e[0] for e in selection)
+        self._somme_coeffs = sum(e[0] for e in selection)
+        self._nb_selectionnees = len(selection)
+        self._mises_a_jour = 0
+    
+    @property
+    def nombre_selectionnees(self) -> int:
+        """Nombre de matières actuellement sélectionnées."""
+        return self._nb_selectionnees
+    
+    @property
+    def moyenne(self) -> float:
+        """La moyenne pondérée courante (0.0 si aucune matière sélectionnée)."""
+        if not self._nb_selectionnees or self._somme_coeffs <= 0:
+            return 0.0
+        return self._somme_notes / self._somme_coeffs
+    
+    def __len__(self) -> int:
+        return len(self._entrees)
+
+
+def obtenir_appreciation(moyenne: Union[float, MatiereTable], bareme: str = BAREME_PAR_DEFAUT) -> dict:
     """
     Retourne l'appréciation et la couleur en fonction de la moyenne.
     
     Args:
-        moyenne: La moyenne calculée
+        moyenne: La moyenne calculée, ou une MatiereTable dont on calcule la moyenne
+        bareme: Le nom du barème à appliquer (voir le module baremes)
         
     Returns:
         Un dictionnaire avec le commentaire et la couleur
     """
-    if moyenne >= 16:
-        return {"texte": "Excellent travail!", "couleur": "#27ae60"}
-    elif moyenne >= 14:
-        return {"texte": "Très bien!", "couleur": "#2ecc71"}
-    elif moyenne >= 12:
-        return {"texte": "Bien!", "couleur": "#3498db"}
-    elif moyenne >= 10:
-        return {"texte": "Passable", "couleur": "#f39c12"}
-    else:
-        return {"texte": "Doit faire des efforts", "couleur": "#e74c3c"}
+    if isinstance(moyenne, MatiereTable):
+        moyenne = calculer_moyenne(moyenne)
+    
+    return obtenir_bareme(bareme).classer(moyenne).vers_dict()
 
 
 def valider_note(note_str: str) -> bool:
@@ -0,0 +1,239 @@
+"""
+Catalogue des matières proposées, par établissement (ou par classe).
+
+Le catalogue est stocké en base (table catalogue_matieres) avec un numéro de
+version par établissement, incrémenté dans la transaction de chaque
+modification. Chaque processus garde la dernière version lue : la liste, son
+JSON déjà sérialisé avec son ETag, et un index des noms normalisés
+(casefold) pour détecter les doublons sans parcourir la liste.
+
+Un processus ne relit le numéro de version qu'au plus une fois par
+intervalle : il voit ses propres ajouts immédiatement, et ceux des autres
+workers après ce délai, sans interroger la base à chaque lecture.
+
+Un établissement qui n'a encore rien modifié utilise les matières par défaut
+(version 0) ; elles sont copiées en base à sa première modification.
+
+L'identifiant d'établissement vient du client : le nombre d'établissements
+gardés en mémoire est borné, le moins récemment vérifié est évincé.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from cache_reponses import EntreeCache, calculer_etag
+
+ETABLISSEMENT_PAR_DEFAUT = "defaut"
+# Bornes d'un catalogue, pour qu'il ne grossisse pas sans limite
+MATIERES_MAX = 200
+NOM_MAX = 100
+# Établissements gardés en mémoire par processus
+ETABLISSEMENTS_MAX = 1000
+
+
+class ErreurCatalogue(ValueError):
+    """Modification ou établissement refusé (doublon, catalogue plein...)."""
+
+
+def normaliser_nom(nom: str) -> str:
+    """Clé de comparaison d'un nom de matière : espaces retirés, casse repliée."""
+    return nom.strip().casefold()
+
+
+def normaliser_etablissement(etablissement: Optional[str]) -> str:
+    """
+    Retourne l'identifiant d'établissement à utiliser.
+
+    Raises:
+        ErreurCatalogue: Si l'identifiant est trop long
+    """
+    etablissement = (etablissement or "").strip() or ETABLISSEMENT_PAR_DEFAUT
+    if len(etablissement) > NOM_MAX:
+        raise ErreurCatalogue(f"Identifiant d'établissement trop long (max {NOM_MAX} caractères)")
+    return etablissement
+
+
+@dataclass(frozen=True)
+class VersionCatalogue:
+    """Une version figée du catalogue d'un établissement."""
+    etablissement: str
+    version: int
+    matieres: Tuple[Tuple[str, object], ...]
+    index: Dict[str, int]
+    reponse: EntreeCache
+
+    def __contains__(self, nom: str) -> bool:
+        return normaliser_nom(nom) in self.index
+
+    def vers_dicts(self) -> List[dict]:
+        return [{"nom": nom, "coefficient": coefficient} for nom, coefficient in self.matieres]
+
+
+class CatalogueMatieres:
+    """Catalogues des établissements, lus en base et gardés en mémoire."""
+
+    def __init__(self, connexion: Callable, defaut: Iterable[dict], intervalle: float = 1.0,
+                 capacite: int = ETABLISSEMENTS_MAX):
+        """
+        Args:
+            connexion: Fabrique de connexion (par exemple PoolSQLite.connexion)
+            defaut: Matières d'un établissement qui n'a rien modifié
+            intervalle: Délai (s) pendant lequel une version lue est servie
+                sans vérifier le numéro de version en base
+            capacite: Nombre maximal d'établissements gardés en mémoire
+        """
+        self._connexion = connexion
+        self._defaut = tuple((m["nom"], m["coefficient"]) for m in defaut)
+        self.intervalle = intervalle
+        self.capacite = capacite
+        # établissement -> (version, instant de la dernière vérification), du
+        # moins récemment vérifié au plus récent
+        self._versions: "OrderedDict[str, Tuple[VersionCatalogue, float]]" = OrderedDict()
+        self._verrou = threading.Lock()
+
+        self.lectures = 0
+        self.verifications = 0
+        self.rechargements = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _construire(etablissement: str, version: int, matieres) -> VersionCatalogue:
+        matieres = tuple(matieres)
+        dicts = [{"nom": nom, "coefficient": coefficient} for nom, coefficient in matieres]
+        # Même sérialisation que jsonify (clés triées, ASCII, compacte)
+        corps = (json.dumps(dicts, separators=(',', ':'), sort_keys=True) + '\n').encode('utf-8')
+        return VersionCatalogue(
+            etablissement=etablissement,
+            version=version,
+            matieres=matieres,
+            index={normaliser_nom(nom): position for position, (nom, _) in enumerate(matieres)},
+            reponse=EntreeCache(corps, 'application/json', calculer_etag(corps), frozenset()),
+        )
+
+    @staticmethod
+    def _lire_version(conn, etablissement: str) -> int:
+        ligne = conn.execute(
+            'SELECT version FROM catalogue_versions WHERE etablissement = ?', (etablissement,)
+        ).fetchone()
+        return ligne[0] if ligne is not None else 0
+
+    def _charger(self, conn, etablissement: str) -> VersionCatalogue:
+        version = self._lire_version(conn, etablissement)
+        if version == 0:
+            return self._construire(etablissement, 0, self._defaut)
+        lignes = conn.execute(
+            'SELECT nom, coefficient FROM catalogue_matieres WHERE etablissement = ? ORDER BY position',
+            (etablissement,)
+        ).fetchall()
+        return self._construire(etablissement, version, (tuple(ligne) for ligne in lignes))
+
+    def _memoriser(self, catalogue: VersionCatalogue, instant: float):
+        with self._verrou:
+            ancien = self._versions.get(catalogue.etablissement)
+            # Une lecture lente ne remplace pas une version plus récente
+            if ancien is None or ancien[0].version <= catalogue.version:
+                self._versions[catalogue.etablissement] = (catalogue, instant)
+            self._versions.move_to_end(catalogue.etablissement)
+            while len(self._versions) > self.capacite:
+                self._versions.popitem(last=False)
+                self.evictions += 1
+
+    def lire(self, etablissement: str = ETABLISSEMENT_PAR_DEFAUT) -> VersionCatalogue:
+        """Retourne la version courante du catalogue d'un établissement."""
+        self.lectures += 1
+        entree = self._versions.get(etablissement)
+        maintenant = time.monotonic()
+        if entree is not None and maintenant - entree[1] < self.intervalle:
+            return entree[0]
+
+        with self._connexion() as conn:
+            if entree is not None and self._lire_version(conn, etablissement) == entree[0].version:
+                self.verifications += 1
+                catalogue = entree[0]
+            else:
+                self.rechargements += 1
+                catalogue = self._charger(conn, etablissement)
+        self._memoriser(catalogue, maintenant)
+        return catalogue
+
+    def ajouter(self, etablissement: str, nom: str, coefficient) -> VersionCatalogue:
+        """
+        Ajoute une matière au catalogue d'un établissement.
+
+        Returns:
+            La nouvelle version du catalogue
+
+        Raises:
+            ErreurCatalogue: Si la matière existe déjà, si le catalogue est plein
+                ou si le coefficient n'est pas un nombre fini > 0
+        """
+        try:
+            fini = math.isfinite(coefficient)
+        except (TypeError, OverflowError):
+            fini = False
+        # NaN serait refusé par la contrainte NOT NULL, inf serait stocké tel quel
+        if not fini or coefficient <= 0:
+            raise ErreurCatalogue(f"Le coefficient doit être un nombre fini > 0, reçu: {coefficient!r}"[:200])
+        nom = nom.strip()
+        if len(nom) > NOM_MAX:
+            raise ErreurCatalogue(f"Nom trop long (max {NOM_MAX} caractères)")
+        cle = normaliser_nom(nom)
+        # Refus sans écriture d'un doublon déjà connu de ce processus
+        if cle in self.lire(etablissement).index:
+            raise ErreurCatalogue("Cette matière existe déjà")
+
+        with self._connexion() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                version = self._lire_version(conn, etablissement)
+                if version == 0:
+                    conn.executemany(
+                        'INSERT INTO catalogue_matieres (etablissement, nom_cle, position, nom, coefficient) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        [(etablissement, normaliser_nom(n), position, n, c)
+                         for position, (n, c) in enumerate(self._defaut)]
+                    )
+                nombre, derniere = conn.execute(
+                    'SELECT COUNT(*), MAX(position) FROM catalogue_matieres WHERE etablissement = ?',
+                    (etablissement,)
+                ).fetchone()
+                if nombre >= MATIERES_MAX:
+                    raise ErreurCatalogue(f"Catalogue plein (max {MATIERES_MAX} matières)")
+                if conn.execute(
+                    'SELECT 1 FROM catalogue_matieres WHERE etablissement = ? AND nom_cle = ?',
+                    (etablissement, cle)
+                ).fetchone():
+                    raise ErreurCatalogue("Cette matière existe déjà")
+                conn.execute(
+                    'INSERT INTO catalogue_matieres (etablissement, nom_cle, position, nom, coefficient) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (etablissement, cle, 0 if derniere is None else derniere + 1, nom, coefficient)
+                )
+                conn.execute(
+                    'INSERT OR REPLACE INTO catalogue_versions (etablissement, version) VALUES (?, ?)',
+                    (etablissement, version + 1)
+                )
+                catalogue = self._charger(conn, etablissement)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        self._memoriser(catalogue, time.monotonic())
+        return catalogue
+
+    def statistiques(self) -> dict:
+        """Compteurs de lectures servies en mémoire, vérifiées ou rechargées."""
+        return {
+            "etablissements": len(self._versions),
+            "capacite": self.capacite,
+            "evictions": self.evictions,
+            "lectures": self.lectures,
+            "verifications": self.verifications,
+            "rechargements": self.rechargements,
+            "intervalle_s": self.intervalle,
+        }
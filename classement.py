@@ -0,0 +1,151 @@
+"""
+Index de classement d'une classe : rang, meilleurs élèves et percentile.
+
+Les moyennes sont arrondies au centième (comme à l'affichage) et comptées dans
+un arbre de Fenwick : modifier la moyenne d'un élève coûte O(log n) au lieu
+d'un nouveau tri de toute la classe.
+"""
+
+from typing import Dict, Hashable, List, Tuple
+
+NOTE_MAX = 20
+
+
+class ArbreFenwick:
+    """Arbre de Fenwick (arbre indexé binaire) de compteurs entiers."""
+
+    def __init__(self, taille: int):
+        self.taille = taille
+        self._arbre = [0] * (taille + 1)
+
+    @classmethod
+    def depuis_compteurs(cls, compteurs: List[int]) -> "ArbreFenwick":
+        """Construit l'arbre en O(n) à partir des compteurs de chaque case."""
+        arbre = cls(len(compteurs))
+        donnees = arbre._arbre
+        donnees[1:] = compteurs
+        for i in range(1, arbre.taille + 1):
+            parent = i + (i & -i)
+            if parent <= arbre.taille:
+                donnees[parent] += donnees[i]
+        return arbre
+
+    def ajouter(self, index: int, delta: int):
+        """Ajoute delta au compteur de la case index (base 0)."""
+        i = index + 1
+        while i <= self.taille:
+            self._arbre[i] += delta
+            i += i & -i
+
+    def somme_prefixe(self, index: int) -> int:
+        """Somme des compteurs des cases 0 à index incluses."""
+        total = 0
+        i = min(index + 1, self.taille)
+        while i > 0:
+            total += self._arbre[i]
+            i -= i & -i
+        return total
+
+
+class Classement:
+    """
+    Classement incrémental des élèves d'une classe selon leur moyenne.
+
+    Le rang suit la convention « 1, 2, 2, 4 » : les ex æquo partagent le
+    même rang.
+    """
+
+    def __init__(self, precision: int = 2):
+        """
+        Args:
+            precision: Nombre de décimales conservées pour départager les moyennes
+        """
+        self._echelle = 10 ** precision
+        self._nb_cases = NOTE_MAX * self._echelle + 1
+        self._arbre = ArbreFenwick(self._nb_cases)
+        self._cases: Dict[int, Dict[Hashable, float]] = {}
+        self._case_eleve: Dict[Hashable, int] = {}
+
+    @classmethod
+    def depuis_moyennes(cls, moyennes: Dict[Hashable, float], precision: int = 2) -> "Classement":
+        """Construit le classement d'une classe entière en une passe."""
+        classement = cls(precision)
+        compteurs = [0] * classement._nb_cases
+        for eleve, moyenne in moyennes.items():
+            case = classement._case(moyenne)
+            classement._cases.setdefault(case, {})[eleve] = moyenne
+            classement._case_eleve[eleve] = case
+            compteurs[case] += 1
+        classement._arbre = ArbreFenwick.depuis_compteurs(compteurs)
+        return classement
+
+    def _case(self, moyenne: float) -> int:
+        if not (0 <= moyenne <= NOTE_MAX):
+            raise ValueError(f"La moyenne doit être entre 0 et {NOTE_MAX}, reçu: {moyenne}")
+        return int(round(moyenne * self._echelle))
+
+    def mettre_a_jour(self, eleve: Hashable, moyenne: float):
+        """Ajoute un élève ou modifie sa moyenne, en O(log n)."""
+        case = self._case(moyenne)
+        ancienne = self._case_eleve.get(eleve)
+        if ancienne is not None:
+            if ancienne == case:
+                self._cases[case][eleve] = moyenne
+                return
+            self._retirer_de_case(eleve, ancienne)
+        self._cases.setdefault(case, {})[eleve] = moyenne
+        self._case_eleve[eleve] = case
+        self._arbre.ajouter(case, 1)
+
+    def _retirer_de_case(self, eleve: Hashable, case: int):
+        eleves = self._cases[case]
+        del eleves[eleve]
+        if not eleves:
+            del self._cases[case]
+        self._arbre.ajouter(case, -1)
+
+    def retirer(self, eleve: Hashable):
+        """
+        Retire un élève du classement.
+
+        Raises:
+            KeyError: Si l'élève n'est pas classé
+        """
+        case = self._case_eleve.pop(eleve)
+        self._retirer_de_case(eleve, case)
+
+    def moyenne(self, eleve: Hashable) -> float:
+        """Retourne la moyenne enregistrée d'un élève."""
+        return self._cases[self._case_eleve[eleve]][eleve]
+
+    def rang(self, eleve: Hashable) -> int:
+        """Retourne le rang de l'élève (1 = meilleure moyenne)."""
+        case = self._case_eleve[eleve]
+        return len(self._case_eleve) - self._arbre.somme_prefixe(case) + 1
+
+    def percentile(self, eleve: Hashable) -> float:
+        """Pourcentage des élèves dont la moyenne est inférieure ou égale."""
+        case = self._case_eleve[eleve]
+        return 100.0 * self._arbre.somme_prefixe(case) / len(self._case_eleve)
+
+    def meilleurs(self, k: int) -> List[Tuple[Hashable, float, int]]:
+        """
+        Retourne les k meilleurs élèves.
+
+        Returns:
+            Des triplets (élève, moyenne, rang), du meilleur au moins bon
+        """
+        resultat = []
+        for case in sorted(self._cases, reverse=True):
+            rang = len(resultat) + 1
+            for eleve, moyenne in self._cases[case].items():
+                if len(resultat) >= k:
+                    return resultat
+                resultat.append((eleve, moyenne, rang))
+        return resultat
+
+    def __len__(self) -> int:
+        return len(self._case_eleve)
+
+    def __contains__(self, eleve: Hashable) -> bool:
+        return eleve in self._case_eleve
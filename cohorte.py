@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Traitement en ligne de commande d'un export de notes (CSV ou JSONL).
+
+Le fichier est lu en flux, par lots de taille fixe : la mémoire utilisée reste
+constante quelle que soit la taille de l'export.
+
+Avec --jobs N, le fichier est découpé en N plages d'octets traitées en
+parallèle ; les résultats sont recollés dans l'ordre d'origine. Ce mode
+suppose qu'aucun champ CSV ne contient de saut de ligne.
+
+Exemples :
+    calculateur-cohorte notes.csv -o moyennes.csv --coef Maths=4 --coef SVT=5
+    calculateur-cohorte notes.jsonl -o moyennes.jsonl --jobs 8
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from baremes import BAREME_PAR_DEFAUT, baremes_disponibles, obtenir_bareme
+from calculs import MatiereTable, calculer_moyennes_tables
+
+TAILLE_LOT_PAR_DEFAUT = 1000
+# Même refus que /api/calculer pour un élève sans matière retenue
+ERREUR_AUCUNE_MATIERE = "Veuillez sélectionner au moins une matière"
+
+
+@dataclass
+class Bilan:
+    """Compteurs d'un traitement de cohorte."""
+    lignes: int = 0
+    calculees: int = 0
+    erreurs: int = 0
+    duree: float = 0.0
+
+    def fusionner(self, autre: "Bilan"):
+        """Ajoute les compteurs d'un autre bilan à celui-ci."""
+        self.lignes += autre.lignes
+        self.calculees += autre.calculees
+        self.erreurs += autre.erreurs
+
+
+def _lire_note(valeur) -> float:
+    """Convertit une note (nombre ou texte, virgule décimale acceptée)."""
+    if isinstance(valeur, str):
+        valeur = valeur.strip().replace(',', '.')
+    return float(valeur)
+
+
+def table_depuis_csv(ligne: Dict[str, str], coefficients: Dict[str, float]) -> MatiereTable:
+    """
+    Construit la table d'un élève à partir d'une ligne CSV.
+
+    Une cellule vide signifie que la matière n'est pas retenue.
+
+    Raises:
+        ValueError: Si une note est invalide ou si aucune matière n'est retenue
+    """
+    noms, coeffs, notes = [], [], []
+    for nom, coefficient in coefficients.items():
+        valeur = ligne.get(nom)
+        if valeur is None or not valeur.strip():
+            continue
+        try:
+            notes.append(_lire_note(valeur))
+        except ValueError:
+            raise ValueError(f"Note invalide pour {nom}: {valeur!r}")
+        noms.append(nom)
+        coeffs.append(coefficient)
+    if not noms:
+        raise ValueError(ERREUR_AUCUNE_MATIERE)
+    return MatiereTable(noms, coeffs, notes)
+
+
+def table_depuis_json(objet: dict) -> MatiereTable:
+    """
+    Construit la table d'un élève à partir d'un objet JSON au format de
+    /api/calculer ; "selectionnee" vaut True s'il est absent.
+
+    Raises:
+        ValueError: Si une matière est invalide ou si aucune n'est retenue
+    """
+    matieres = objet.get('matieres') if isinstance(objet, dict) else None
+    if not isinstance(matieres, list):
+        raise ValueError("Champ 'matieres' manquant")
+
+    noms, coeffs, notes = [], [], []
+    for m in matieres:
+        if not isinstance(m, dict):
+            raise ValueError("Matière invalide")
+        if not m.get('selectionnee', True):
+            continue
+        try:
+            notes.append(_lire_note(m['note']) if m.get('note') not in (None, '') else 0.0)
+            coeffs.append(float(m['coefficient']))
+            noms.append(m['nom'])
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Erreur pour {m.get('nom')}: {str(e)}")
+    if not noms:
+        raise ValueError(ERREUR_AUCUNE_MATIERE)
+    return MatiereTable(noms, coeffs, notes)
+
+
+def _calculer_lot(lot: List[tuple], bilan: Bilan, bareme: str) -> Iterator[tuple]:
+    """
+    Calcule les moyennes et les appréciations d'un lot de
+    (enregistrement, table ou erreur).
+
+    Yields:
+        (enregistrement, moyenne, appréciation, erreur)
+    """
+    valides = [table for _, table in lot if isinstance(table, MatiereTable)]
+    moyennes = calculer_moyennes_tables(valides)
+    resultats = iter(zip(moyennes, obtenir_bareme(bareme).textes_lot(moyennes)))
+    for enregistrement, table in lot:
+        bilan.lignes += 1
+        if isinstance(table, MatiereTable):
+            moyenne, appreciation = next(resultats)
+            bilan.calculees += 1
+            yield enregistrement, moyenne, appreciation, None
+        else:
+            bilan.erreurs += 1
+            yield enregistrement, None, None, table
+
+
+def _preparer(enregistrements: Iterable, convertir) -> Iterator[tuple]:
+    """Associe chaque enregistrement à sa table, ou au message d'erreur."""
+    for enregistrement in enregistrements:
+        try:
+            yield enregistrement, convertir(enregistrement)
+        except ValueError as e:
+            yield enregistrement, str(e)
+
+
+def _par_lots(elements: Iterable, taille: int) -> Iterator[list]:
+    """Découpe un itérable en listes d'au plus `taille` éléments."""
+    iterateur = iter(elements)
+    while True:
+        lot = list(islice(iterateur, taille))
+        if not lot:
+            return
+        yield lot
+
+
+def traiter_csv(lignes: Iterable[str], sortie: TextIO, coefficients: Dict[str, float],
+                entetes: Optional[List[str]] = None, separateur: str = ',',
+                ecrire_entetes: bool = True, taille_lot: int = TAILLE_LOT_PAR_DEFAUT,
+                bareme: str = BAREME_PAR_DEFAUT) -> Bilan:
+    """
+    Traite un flux CSV : une ligne par élève, une colonne par matière.
+
+    Args:
+        lignes: Les lignes du fichier (un objet fichier convient)
+        sortie: Le flux où écrire le CSV enrichi
+        coefficients: Coefficient de chaque colonne matière
+        entetes: Les en-têtes, s'ils ne sont pas en première ligne
+        separateur: Le séparateur de colonnes
+        ecrire_entetes: Écrire la ligne d'en-têtes en sortie
+        taille_lot: Nombre d'élèves calculés par passe
+        bareme: Le barème des appréciations
+
+    Returns:
+        Le bilan du traitement
+    """
+    debut = time.perf_counter()
+    bilan = Bilan()
+    lecteur = csv.DictReader(lignes, fieldnames=entetes, delimiter=separateur)
+    if lecteur.fieldnames is None:
+        bilan.duree = time.perf_counter() - debut
+        return bilan
+
+    manquantes = [nom for nom in coefficients if nom not in lecteur.fieldnames]
+    if manquantes:
+        raise ValueError(f"Colonnes absentes du fichier: {', '.join(manquantes)}")
+
+    colonnes = list(lecteur.fieldnames) + ['moyenne', 'appreciation', 'erreur']
+    ecrivain = csv.DictWriter(sortie, fieldnames=colonnes, delimiter=separateur,
+                              extrasaction='ignore', lineterminator='\n')
+    if ecrire_entetes:
+        ecrivain.writeheader()
+
+    preparees = _preparer(lecteur, lambda ligne: table_depuis_csv(ligne, coefficients))
+    for lot in _par_lots(preparees, taille_lot):
+        for ligne, moyenne, appreciation, erreur in _calculer_lot(lot, bilan, bareme):
+            ligne['moyenne'] = '' if moyenne is None else f"{moyenne:.2f}"
+            ligne['appreciation'] = appreciation or ''
+            ligne['erreur'] = erreur or ''
+            ecrivain.writerow(ligne)
+
+    bilan.duree = time.perf_counter() - debut
+    return bilan
+
+
+def traiter_jsonl(lignes: Iterable[str], sortie: TextIO,
+                  taille_lot: int = TAILLE_LOT_PAR_DEFAUT,
+                  bareme: str = BAREME_PAR_DEFAUT) -> Bilan:
+    """
+    Traite un flux JSONL : un objet par ligne, au format de /api/calculer.
+
+    Chaque objet est réécrit avec les champs "moyenne" et "appreciation",
+    ou "erreur" si la ligne est invalide. Une ligne qui n'est pas du JSON
+    valide est recopiée telle quelle dans le champ "ligne" de l'erreur.
+
+    Returns:
+        Le bilan du traitement
+    """
+    debut = time.perf_counter()
+    bilan = Bilan()
+
+    def decoder(lignes):
+        for ligne in lignes:
+            if ligne.strip():
+                try:
+                    yield json.loads(ligne)
+                except ValueError as e:
+                    yield {"ligne": ligne.rstrip('\r\n'), "erreur_json": str(e)}
+
+    def convertir(objet):
+        if isinstance(objet, dict) and 'erreur_json' in objet:
+            raise ValueError(f"JSON invalide: {objet.pop('erreur_json')}")
+        return table_depuis_json(objet)
+
+    for lot in _par_lots(_preparer(decoder(lignes), convertir), taille_lot):
+        for objet, moyenne, appreciation, erreur in _calculer_lot(lot, bilan, bareme):
+            if not isinstance(objet, dict):
+                objet = {"valeur": objet}
+            if erreur is None:
+                objet['moyenne'] = round(moyenne, 2)
+                objet['appreciation'] = appreciation
+            else:
+                objet['erreur'] = erreur
+            sortie.write(json.dumps(objet, ensure_ascii=False))
+            sortie.write('\n')
+
+    bilan.duree = time.perf_counter() - debut
+    return bilan
+
+
+def _lignes_plage(fichier, debut: int, fin: int) -> Iterator[str]:
+    """
+    Lit les lignes qui commencent dans la plage d'octets [debut, fin).
+
+    La ligne à cheval sur `debut` appartient au fragment précédent.
+    """
+    if debut > 0:
+        fichier.seek(debut - 1)
+        fichier.readline()
+    else:
+        fichier.seek(0)
+    premiere = debut == 0
+    while fichier.tell() < fin:
+        ligne = fichier.readline()
+        if not ligne:
+            return
+        # Comme en lecture séquentielle, un BOM (fichier exporté par Excel) est ignoré
+        yield ligne.decode('utf-8-sig' if premiere else 'utf-8')
+        premiere = False
+
+
+def decouper_plages(debut: int, fin: int, nombre: int) -> List[tuple]:
+    """Découpe [debut, fin) en `nombre` plages d'octets contiguës."""
+    taille = fin - debut
+    bornes = [debut + taille * i // nombre for i in range(nombre + 1)]
+    return [(bornes[i], bornes[i + 1]) for i in range(nombre)]
+
+
+def _traiter_fragment(chemin: str, index: int, debut: int, fin: int, format_fichier: str,
+                      coefficients: Dict[str, float], entetes: Optional[List[str]],
+                      separateur: str, taille_lot: int, bareme: str) -> tuple:
+    """
+    Traite une plage d'octets du fichier dans un processus séparé.
+
+    Returns:
+        (index, fichier temporaire de sortie, bilan)
+    """
+    descripteur, chemin_sortie = tempfile.mkstemp(prefix=f'cohorte-{index}-', suffix='.part')
+    with open(chemin, 'rb') as entree, \
+            os.fdopen(descripteur, 'w', encoding='utf-8', newline='') as sortie:
+        lignes = _lignes_plage(entree, debut, fin)
+        if format_fichier == 'csv':
+            bilan = traiter_csv(lignes, sortie, coefficients, entetes=entetes,
+                                separateur=separateur, ecrire_entetes=False,
+                                taille_lot=taille_lot, bareme=bareme)
+        else:
+            bilan = traiter_jsonl(lignes, sortie, taille_lot=taille_lot, bareme=bareme)
+    return index, chemin_sortie, bilan
+
+
+def traiter_en_parallele(chemin: str, sortie: TextIO, format_fichier: str,
+                         coefficients: Dict[str, float], jobs: int, separateur: str = ',',
+                         taille_lot: int = TAILLE_LOT_PAR_DEFAUT,
+                         bareme: str = BAREME_PAR_DEFAUT) -> Bilan:
+    """
+    Traite un fichier en le découpant en plages d'octets réparties sur
+    `jobs` processus. La sortie est identique à celle du traitement en flux.
+
+    Returns:
+        Le bilan global du traitement
+    """
+    debut_total = time.perf_counter()
+    entetes = None
+    debut_donnees = 0
+    with open(chemin, 'rb') as entree:
+        if format_fichier == 'csv':
+            premiere_ligne = entree.readline()
+            debut_donnees = entree.tell()
+            if not premiere_ligne.strip():
+                return Bilan(duree=time.perf_counter() - debut_total)
+            entetes = next(csv.reader([premiere_ligne.decode('utf-8-sig')], delimiter=separateur))
+            manquantes = [nom for nom in coefficients if nom not in entetes]
+            if manquantes:
+                raise ValueError(f"Colonnes absentes du fichier: {', '.join(manquantes)}")
+        entree.seek(0, os.SEEK_END)
+        taille = entree.tell()
+
+    if entetes is not None:
+        csv.writer(sortie, delimiter=separateur, lineterminator='\n').writerow(
+            entetes + ['moyenne', 'appreciation', 'erreur']
+        )
+
+    bilan = Bilan()
+    plages = decouper_plages(debut_donnees, taille, jobs)
+    with ProcessPoolExecutor(max_workers=jobs) as executeur:
+        futurs = [
+            executeur.submit(_traiter_fragment, chemin, i, debut, fin, format_fichier,
+                             coefficients, entetes, separateur, taille_lot, bareme)
+            for i, (debut, fin) in enumerate(plages)
+        ]
+        # Les fragments sont recollés dans l'ordre du fichier, quel que soit
+        # l'ordre dans lequel ils se terminent
+        try:
+            for futur in futurs:
+                index, chemin_partiel, bilan_fragment = futur.result()
+                debut, fin = plages[index]
+                print(
+                    f"fragment {index}: octets {debut}-{fin}, {bilan_fragment.lignes} élèves "
+                    f"en {bilan_fragment.duree:.2f} s",
+                    file=sys.stderr
+                )
+                with open(chemin_partiel, encoding='utf-8', newline='') as partiel:
+                    shutil.copyfileobj(partiel, sortie)
+                os.remove(chemin_partiel)
+                bilan.fusionner(bilan_fragment)
+        except BaseException:
+            for futur in futurs:
+                futur.cancel()
+            for futur in futurs:
+                if futur.done() and not futur.cancelled() and futur.exception() is None:
+                    chemin_partiel = futur.result()[1]
+                    if os.path.exists(chemin_partiel):
+                        os.remove(chemin_partiel)
+            raise
+
+    bilan.duree = time.perf_counter() - debut_total
+    return bilan
+
+
+def detecter_format(chemin: str) -> str:
+    """Déduit le format (csv ou jsonl) de l'extension du fichier."""
+    if chemin.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+
+def lire_coefficients(valeurs: List[str]) -> Dict[str, float]:
+    """Convertit une liste de 'Nom=coef' en dictionnaire."""
+    coefficients = {}
+    for valeur in valeurs:
+        nom, sep, coef = valeur.rpartition('=')
+        if not sep or not nom:
+            raise ValueError(f"Coefficient invalide (attendu Nom=valeur): {valeur!r}")
+        coefficients[nom] = float(coef.replace(',', '.'))
+        if coefficients[nom] <= 0:
+            raise ValueError(f"Le coefficient doit être positif, reçu: {valeur!r}")
+    return coefficients
+
+
+def creer_parser() -> argparse.ArgumentParser:
+    """Crée l'analyseur des arguments de la ligne de commande."""
+    parser = argparse.ArgumentParser(
+        prog='calculateur-cohorte',
+        description="Calcule les moyennes d'un export de notes CSV ou JSONL."
+    )
+    parser.add_argument('entree', help="Fichier d'entrée ('-' pour l'entrée standard)")
+    parser.add_argument('-o', '--sortie', default='-',
+                        help="Fichier de sortie ('-' pour la sortie standard)")
+    parser.add_argument('-f', '--format', choices=['csv', 'jsonl'],
+                        help="Format du fichier (déduit de l'extension par défaut)")
+    parser.add_argument('--coef', action='append', default=[], metavar='NOM=VALEUR',
+                        help="Colonne matière et son coefficient (CSV, répétable)")
+    parser.add_argument('--separateur', default=',', help="Séparateur CSV (',' par défaut)")
+    parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT_PAR_DEFAUT,
+                        help="Nombre d'élèves calculés par passe")
+    parser.add_argument('--bareme', default=BAREME_PAR_DEFAUT, choices=baremes_disponibles(),
+                        help="Barème des appréciations")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Nombre de processus (fichier d'entrée requis si > 1)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Point d'entrée de la ligne de commande."""
+    args = creer_parser().parse_args(argv)
+    format_fichier = args.format or detecter_format(args.entree)
+
+    try:
+        coefficients = lire_coefficients(args.coef)
+        if format_fichier == 'csv' and not coefficients:
+            raise ValueError("Indiquez au moins une colonne matière avec --coef")
+        if args.taille_lot <= 0:
+            raise ValueError("--taille-lot doit être positif")
+        if args.jobs <= 0:
+            raise ValueError("--jobs doit être positif")
+        if args.jobs > 1 and args.entree == '-':
+            raise ValueError("--jobs nécessite un fichier d'entrée")
+
+        if args.jobs > 1:
+            sortie = sys.stdout if args.sortie == '-' else open(args.sortie, 'w', encoding='utf-8', newline='')
+            try:
+                bilan = traiter_en_parallele(args.entree, sortie, format_fichier, coefficients,
+                                             args.jobs, separateur=args.separateur,
+                                             taille_lot=args.taille_lot, bareme=args.bareme)
+            finally:
+                if sortie is not sys.stdout:
+                    sortie.close()
+            return _afficher_bilan(bilan)
+
+        # utf-8-sig, comme avec --jobs : un BOM ne reste pas collé au premier en-tête
+        entree = sys.stdin if args.entree == '-' else open(args.entree, encoding='utf-8-sig', newline='')
+        sortie = sys.stdout if args.sortie == '-' else open(args.sortie, 'w', encoding='utf-8', newline='')
+        try:
+            if format_fichier == 'csv':
+                bilan = traiter_csv(entree, sortie, coefficients, separateur=args.separateur,
+                                    taille_lot=args.taille_lot, bareme=args.bareme)
+            else:
+                bilan = traiter_jsonl(entree, sortie, taille_lot=args.taille_lot,
+                                      bareme=args.bareme)
+        finally:
+            if entree is not sys.stdin:
+                entree.close()
+            if sortie is not sys.stdout:
+                sortie.close()
+    except (OSError, ValueError) as e:
+        print(f"Erreur: {e}", file=sys.stderr)
+        return 2
+
+    return _afficher_bilan(bilan)
+
+
+def _afficher_bilan(bilan: Bilan) -> int:
+    """Affiche le bilan sur la sortie d'erreur et retourne le code de sortie."""
+    debit = bilan.lignes / bilan.duree if bilan.duree > 0 else 0.0
+    print(
+        f"{bilan.lignes} élèves, {bilan.calculees} moyennes, {bilan.erreurs} erreurs "
+        f"en {bilan.duree:.2f} s ({debit:.0f} élèves/s)",
+        file=sys.stderr
+    )
+    return 1 if bilan.erreurs else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
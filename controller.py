@@ -1,10 +1,12 @@
+import math
 import tkinter as tk
 from tkinter import messagebox
-from typing import List
+from typing import List, Optional
 from models.matiere import Matiere
 from views.main_window import MainWindow
 from views.matieres_frame import MatieresFrame
 from utils.calculs import calculer_moyenne, calculer_moyenne_generale
+from calculs import MoyenneIncrementale
 
 class CalculateurMoyenneController:
     """
@@ -36,8 +38,13 @@ class CalculateurMoyenneController:
             on_reset_click=self.reinitialiser_notes
         )
         
+        # Accumulateur pour l'affichage en temps réel de la moyenne
+        self.accumulateur = MoyenneIncrementale()
+        self._matieres_par_variable = {}
+        
         # Création du cadre des matières
         self.creer_cadre_matieres()
+        self.initialiser_accumulateur()
     
     def creer_cadre_matieres(self):
         """Crée et affiche le cadre des matières."""
@@ -48,10 +55,56 @@ class CalculateurMoyenneController:
         )
         self.main_window.definir_cadre_matieres(matieres_frame)
     
-    def on_note_change(self, *args):
-        """Appelée lorsqu'une note est modifiée."""
-        # Pourrait être utilisé pour une mise à jour en temps réel si nécessaire
-        pass
+    def initialiser_accumulateur(self):
+        """Alimente l'accumulateur et suit les cases à cocher des matières."""
+        for matiere in self.matieres:
+            selectionnee = bool(matiere.var and matiere.var.get())
+            note = self._lire_note(matiere)
+            if note is None:
+                note = matiere.default_note
+            self.accumulateur.definir(id(matiere), matiere.coefficient, note, selectionnee)
+            self._matieres_par_variable[str(matiere.note_var)] = matiere
+            if matiere.var is not None:
+                self._matieres_par_variable[str(matiere.var)] = matiere
+                matiere.var.trace_add('write', self.on_selection_change)
+    
+    @staticmethod
+    def _lire_note(matiere: Matiere) -> Optional[float]:
+        """
+        Retourne la note saisie, ou None si elle n'est pas dans [0, 20]
+        (« nan » et « inf » sont acceptés par float() mais refusés ici).
+        """
+        note = matiere.note
+        if not (math.isfinite(note) and 0 <= note <= 20):
+            return None
+        return note
+    
+    def on_note_change(self, nom_variable, *args):
+        """Appelée lorsqu'une note est modifiée : met à jour la moyenne en O(1)."""
+        matiere = self._matieres_par_variable.get(nom_variable)
+        if matiere is None:
+            return
+        note = self._lire_note(matiere)
+        if note is None:
+            # La dernière note valide reste comptée jusqu'à la correction
+            self.main_window.afficher_erreur(
+                f"Note invalide pour {matiere.nom} : entrez une note entre 0 et 20"
+            )
+            return
+        self.accumulateur.modifier_note(id(matiere), note)
+        self.afficher_moyenne_en_direct()
+    
+    def on_selection_change(self, nom_variable, *args):
+        """Appelée lorsqu'une case à cocher change d'état."""
+        matiere = self._matieres_par_variable.get(nom_variable)
+        if matiere is None:
+            return
+        self.accumulateur.selectionner(id(matiere), matiere.var.get())
+        self.afficher_moyenne_en_direct()
+    
+    def afficher_moyenne_en_direct(self):
+        """Affiche la moyenne courante de l'accumulateur."""
+        self.main_window.afficher_resultat(self.accumulateur.moyenne)
     
     def calculer_moyenne(self):
         """Calcule et affiche la moyenne des matières sélectionnées."""
@@ -81,9 +134,13 @@ class CalculateurMoyenneController:
         """Réinitialise toutes les notes à leurs valeurs par défaut."""
         for matiere in self.matieres:
             matiere.note_var.set(str(matiere.default_note))
+            # Sans attendre on_note_change : l'accumulateur et l'affichage
+            # repartent tous deux des notes par défaut
+            self.accumulateur.modifier_note(id(matiere), matiere.default_note)
+        self.accumulateur.recalculer()
         
         # Mettre à jour l'affichage
-        self.main_window.afficher_resultat(0.0)
+        self.afficher_moyenne_en_direct()
     
     def run(self):
         """Lance l'application."""
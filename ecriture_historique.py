@@ -0,0 +1,244 @@
+"""
+Écriture différée de l'historique des calculs.
+
+Les insertions sont mises en file puis écrites par un thread dédié, par lots,
+dans une seule transaction : une rafale de calculs coûte une synchronisation
+disque par lot au lieu d'une par requête.
+
+Modes de durabilité :
+- "immediate" : chaque appel écrit et valide sa ligne (comportement historique) ;
+- "groupee"   : l'appel attend que son lot soit validé (commit de groupe) ;
+- "differee"  : l'appel rend la main aussitôt ; les lignes en file sont
+                perdues si le processus est tué avant le vidage.
+
+Si un lot échoue, ses lignes sont réécrites une à une : une ligne refusée
+par SQLite est abandonnée et comptée (lignes_rejetees), elle ne bloque ni
+les autres lignes du lot ni les lots suivants.
+
+Chaque transaction incrémente aussi la version de l'étiquette de cache
+'historique:<profil>' des profils écrits : les analyses en cache de tous les
+workers voient les nouvelles lignes (voir cache_reponses).
+"""
+
+import atexit
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from base_donnees import incrementer_versions
+
+DURABILITES = ("immediate", "groupee", "differee")
+
+REQUETE_INSERTION = 'INSERT INTO historique (profil_id, moyenne) VALUES (?, ?)'
+
+
+def _etiquettes(lignes) -> set:
+    return {f'historique:{ligne[0]}' for ligne in lignes}
+
+
+class EcrivainHistorique:
+    """File d'insertions dans historique, vidée par lots par un thread dédié."""
+
+    def __init__(self, pool, durabilite: str = "groupee", taille_lot: int = 200,
+                 delai_max: float = 0.05, taille_file_max: int = 10_000):
+        """
+        Args:
+            pool: Le PoolSQLite où écrire
+            durabilite: Un des modes de DURABILITES
+            taille_lot: Vider dès que la file atteint ce nombre de lignes
+            delai_max: Vider au plus tard ce délai (s) après la plus ancienne ligne
+            taille_file_max: Au-delà, les appels attendent un vidage
+
+        Raises:
+            ValueError: Si le mode de durabilité est inconnu
+        """
+        if durabilite not in DURABILITES:
+            raise ValueError(f"Durabilité inconnue: {durabilite!r} (attendu: {', '.join(DURABILITES)})")
+        self.pool = pool
+        self.durabilite = durabilite
+        self.taille_lot = taille_lot
+        self.delai_max = delai_max
+        self.taille_file_max = taille_file_max
+
+        self._file = deque()         # (profil_id, moyenne, instant, Future ou None)
+        self._condition = threading.Condition()
+        self._vidage_en_cours = threading.Lock()
+        self._arrete = False
+        self._thread = None
+
+        self.lignes_ecrites = 0
+        self.vidages = 0
+        self.erreurs = 0
+        self.lignes_rejetees = 0
+        self.latence_vidage_totale = 0.0
+        self.latence_vidage_max = 0.0
+        self.profondeur_max = 0
+
+    def demarrer(self):
+        """Démarre le thread d'écriture (appelé automatiquement au premier ajout)."""
+        with self._condition:
+            if self._thread is not None or self.durabilite == "immediate":
+                return
+            self._thread = threading.Thread(target=self._boucle, name="ecrivain-historique", daemon=True)
+            self._thread.start()
+        atexit.register(self.arreter)
+
+    def ajouter(self, profil_id, moyenne):
+        """
+        Ajoute une entrée à l'historique selon le mode de durabilité.
+
+        Raises:
+            RuntimeError: Si l'écrivain est arrêté
+            sqlite3.Error: En mode immediate ou groupee, si l'écriture échoue
+        """
+        if self.durabilite == "immediate":
+            debut = time.perf_counter()
+            with self.pool.connexion() as conn:
+                conn.execute(REQUETE_INSERTION, (profil_id, moyenne))
+                incrementer_versions(conn, _etiquettes([(profil_id,)]))
+                conn.commit()
+            self._compter_vidage(1, time.perf_counter() - debut)
+            return
+
+        self.demarrer()
+        futur = Future() if self.durabilite == "groupee" else None
+        with self._condition:
+            while len(self._file) >= self.taille_file_max and not self._arrete:
+                self._condition.wait()
+            if self._arrete:
+                raise RuntimeError("L'écrivain d'historique est arrêté")
+            self._file.append((profil_id, moyenne, time.monotonic(), futur))
+            self.profondeur_max = max(self.profondeur_max, len(self._file))
+            if len(self._file) >= self.taille_lot or futur is not None:
+                self._condition.notify_all()
+
+        if futur is not None:
+            futur.result()
+
+    def _boucle(self):
+        while True:
+            with self._condition:
+                while not self._arrete:
+                    if self._file:
+                        # Des appelants attendent : on vide tout de suite, les
+                        # lignes arrivées pendant l'écriture formeront le lot suivant
+                        if len(self._file) >= self.taille_lot or self._file[-1][3] is not None:
+                            break
+                        restant = self._file[0][2] + self.delai_max - time.monotonic()
+                        if restant <= 0:
+                            break
+                        self._condition.wait(restant)
+                    else:
+                        self._condition.wait()
+                arret = self._arrete
+            self.vider()
+            if arret:
+                # Dernier vidage fait : ajouter() refuse désormais toute ligne
+                return
+
+    def vider(self) -> int:
+        """
+        Écrit immédiatement toutes les lignes en file, en une transaction.
+
+        Returns:
+            Le nombre de lignes écrites
+        """
+        with self._vidage_en_cours:
+            with self._condition:
+                lot = list(self._file)
+                self._file.clear()
+                self._condition.notify_all()
+            if not lot:
+                return 0
+
+            debut = time.perf_counter()
+            try:
+                with self.pool.connexion() as conn:
+                    conn.executemany(REQUETE_INSERTION, [(p, m) for p, m, _, _ in lot])
+                    incrementer_versions(conn, _etiquettes(lot))
+                    conn.commit()
+                ecrites, rejets = lot, []
+            except Exception:
+                ecrites, rejets = self._ecrire_une_a_une(lot)
+
+            if rejets:
+                with self._condition:
+                    self.erreurs += 1
+                    self.lignes_rejetees += len(rejets)
+                print(f"historique: {len(rejets)} ligne(s) rejetée(s) sur {len(lot)}: {rejets[0][1]}",
+                      file=sys.stderr)
+            if ecrites:
+                self._compter_vidage(len(ecrites), time.perf_counter() - debut)
+            for _, _, _, futur in ecrites:
+                if futur is not None:
+                    futur.set_result(None)
+            for (_, _, _, futur), erreur in rejets:
+                if futur is not None:
+                    futur.set_exception(erreur)
+            return len(ecrites)
+
+    def _ecrire_une_a_une(self, lot: list) -> tuple:
+        """
+        Réécrit un lot refusé ligne par ligne, dans une transaction : seules
+        les lignes que SQLite refuse sont écartées.
+
+        Returns:
+            (lignes écrites, [(ligne rejetée, exception)])
+        """
+        ecrites, rejets = [], []
+        try:
+            with self.pool.connexion() as conn:
+                for ligne in lot:
+                    try:
+                        conn.execute(REQUETE_INSERTION, ligne[:2])
+                        ecrites.append(ligne)
+                    except sqlite3.Error as e:
+                        rejets.append((ligne, e))
+                incrementer_versions(conn, _etiquettes(ecrites))
+                conn.commit()
+        except Exception as e:
+            # La transaction elle-même a échoué : aucune ligne n'est écrite
+            return [], [(ligne, e) for ligne in lot]
+        return ecrites, rejets
+
+    def _compter_vidage(self, lignes: int, duree: float):
+        with self._condition:
+            self.lignes_ecrites += lignes
+            self.vidages += 1
+            self.latence_vidage_totale += duree
+            self.latence_vidage_max = max(self.latence_vidage_max, duree)
+
+    def en_attente(self) -> int:
+        """Nombre de lignes en file."""
+        with self._condition:
+            return len(self._file)
+
+    def arreter(self):
+        """Vide la file et arrête le thread d'écriture."""
+        with self._condition:
+            self._arrete = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.vider()
+
+    def statistiques(self) -> dict:
+        """Compteurs de la file et des vidages."""
+        with self._condition:
+            return {
+                "durabilite": self.durabilite,
+                "profondeur_file": len(self._file),
+                "profondeur_max": self.profondeur_max,
+                "lignes_ecrites": self.lignes_ecrites,
+                "vidages": self.vidages,
+                "erreurs": self.erreurs,
+                "lignes_rejetees": self.lignes_rejetees,
+                "lignes_par_vidage": round(self.lignes_ecrites / self.vidages, 2) if self.vidages else 0.0,
+                "latence_vidage_moyenne_ms": round(
+                    1000 * self.latence_vidage_totale / self.vidages, 3) if self.vidages else 0.0,
+                "latence_vidage_max_ms": round(1000 * self.latence_vidage_max, 3),
+            }
@@ -9,6 +9,8 @@ import tkinter as tk
 from tkinter import ttk, messagebox, StringVar
 from typing import List, Optional
 
+from baremes import obtenir_bareme
+
 class Matiere:
     """
     A class to represent a school subject with its name, coefficient, and grade.
@@ -46,6 +48,18 @@ class Matiere:
         return f"{self.nom} (coeff: {self.coefficient}, note: {self.note})"
 
 
+def moyenne_ponderee(matieres) -> float:
+    """
+    Compute the weighted average of the given subjects.
+    
+    Args:
+        matieres: Non-empty iterable of subjects with `note` and `coefficient`
+    """
+    somme_notes = sum(m.note * m.coefficient for m in matieres)
+    somme_coeffs = sum(m.coefficient for m in matieres)
+    return somme_notes / somme_coeffs
+
+
 class App:
     """Main application class that creates and manages the GUI."""
     
@@ -213,9 +227,7 @@ class App:
         
         # Calculate weighted average
         try:
-            somme_notes = sum(m.note * m.coefficient for m in selected)
-            somme_coeffs = sum(m.coefficient for m in selected)
-            moyenne = somme_notes / somme_coeffs
+            moyenne = moyenne_ponderee(selected)
             
             # Clear previous results
             for widget in self.results_frame.winfo_children():
@@ -244,21 +256,9 @@ class App:
             avg_label.pack(pady=(10, 0), anchor='w')
             
             # Add comment based on average
-            if moyenne >= 16:
-                comment = "Excellent travail!"
-                color = 'dark green'
-            elif moyenne >= 14:
-                comment = "Très bien!"
-                color = 'green'
-            elif moyenne >= 12:
-                comment = "Bien!"
-                color = 'blue'
-            elif moyenne >= 10:
-                comment = "Passable"
-                color = 'orange'
-            else:
-                comment = "Doit faire des efforts"
-                color = 'red'
+            mention = obtenir_bareme().classer(moyenne)
+            comment = mention.texte
+            color = mention.couleur
                 
             ttk.Label(
                 self.results_frame,
@@ -0,0 +1,255 @@
+"""
+Métriques de l'application au format texte de Prometheus (route /metrics).
+
+Pour chaque route : le nombre de requêtes par méthode et code HTTP, les
+erreurs, un histogramme de la durée totale et un histogramme par phase
+(décodage, validation, calcul, SQLite, sérialisation). Les phases sont
+chronométrées là où elles ont lieu avec `mesurer(phase)` ; les durées sont
+cumulées dans la requête en cours (variable de contexte) puis ajoutées aux
+histogrammes à la fin de la requête.
+
+Le coût par requête est de quelques appels à perf_counter et d'une prise de
+verrou : les métriques peuvent rester actives en production.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    import resource
+except ImportError:
+    # Absent sous Windows : seule la mémoire lue dans /proc est disponible
+    resource = None
+
+# Bornes (secondes) des histogrammes de durée
+BORNES_PAR_DEFAUT = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PHASES = ("decode", "validate", "compute", "sqlite", "serialize")
+
+_requete_courante: contextvars.ContextVar = contextvars.ContextVar('requete_courante', default=None)
+
+
+class Histogramme:
+    """Histogramme à bornes fixes (compteurs non cumulés, cumulés à l'export)."""
+
+    __slots__ = ('bornes', 'compteurs', 'somme', 'nombre')
+
+    def __init__(self, bornes: Tuple[float, ...]):
+        self.bornes = bornes
+        # Un compteur par borne, plus un pour +Inf
+        self.compteurs = [0] * (len(bornes) + 1)
+        self.somme = 0.0
+        self.nombre = 0
+
+    def observer(self, valeur: float):
+        # Prometheus : une observation compte dans le seau « le » si valeur <= borne
+        self.compteurs[bisect_left(self.bornes, valeur)] += 1
+        self.somme += valeur
+        self.nombre += 1
+
+
+class _Requete:
+    """Durées des phases cumulées pendant une requête."""
+
+    __slots__ = ('debut', 'durees', 'actives')
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.durees: Dict[str, float] = {}
+        self.actives = set()
+
+
+class _Mesure:
+    """Chronomètre une phase de la requête en cours (ignoré hors requête)."""
+
+    __slots__ = ('phase', 'requete', 'debut')
+
+    def __init__(self, phase: str):
+        self.phase = phase
+        self.requete = None
+
+    def __enter__(self):
+        requete = _requete_courante.get()
+        # Une phase imbriquée dans elle-même (emprunts de connexion
+        # imbriqués) n'est comptée qu'une fois
+        if requete is not None and self.phase not in requete.actives:
+            requete.actives.add(self.phase)
+            self.requete = requete
+            self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        requete = self.requete
+        if requete is not None:
+            duree = time.perf_counter() - self.debut
+            requete.durees[self.phase] = requete.durees.get(self.phase, 0.0) + duree
+            requete.actives.discard(self.phase)
+        return False
+
+
+class _MesureInactive:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_INACTIVE = _MesureInactive()
+
+
+def memoire_processus() -> Dict[str, int]:
+    """
+    Mémoire du processus en octets : résidente et virtuelle (Linux), ou
+    à défaut le pic de mémoire résidente.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            virtuelle, residente = (int(x) for x in f.read().split()[:2])
+        page = os.sysconf('SC_PAGE_SIZE')
+        return {"residente": residente * page, "virtuelle": virtuelle * page}
+    except (OSError, ValueError):
+        pass
+    if resource is None:
+        return {}
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    return {"residente_max": pic if os.uname().sysname == 'Darwin' else pic * 1024}
+
+
+def _echapper(valeur: str) -> str:
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquettes(paires: Iterable[Tuple[str, str]]) -> str:
+    return '{' + ','.join(f'{nom}="{_echapper(valeur)}"' for nom, valeur in paires) + '}'
+
+
+class Metriques:
+    """Compteurs et histogrammes des requêtes, exportés au format Prometheus."""
+
+    def __init__(self, prefixe: str = "calculateur", bornes: Iterable[float] = BORNES_PAR_DEFAUT,
+                 actif: bool = True):
+        """
+        Args:
+            prefixe: Préfixe des noms de métriques
+            bornes: Bornes croissantes (secondes) des histogrammes
+            actif: Sans effet si False (mesures et enregistrements ignorés)
+        """
+        self.prefixe = prefixe
+        self.bornes = tuple(sorted(bornes))
+        self.actif = actif
+        self._verrou = threading.Lock()
+        self._requetes: Dict[Tuple[str, str, int], int] = {}
+        self._erreurs: Dict[Tuple[str, str], int] = {}
+        self._durees: Dict[str, Histogramme] = {}
+        self._phases: Dict[Tuple[str, str], Histogramme] = {}
+        self._debut = time.time()
+
+    def mesurer(self, phase: str):
+        """Context manager qui ajoute la durée du bloc à la phase de la requête en cours."""
+        return _Mesure(phase) if self.actif else _INACTIVE
+
+    def debut_requete(self):
+        """Commence le suivi d'une requête dans le contexte courant."""
+        if self.actif:
+            _requete_courante.set(_Requete())
+
+    def fin_requete(self, route: str, methode: str, code: int):
+        """Enregistre la requête du contexte courant, terminée, et ses phases."""
+        requete = _requete_courante.get()
+        if requete is None:
+            return
+        _requete_courante.set(None)
+        duree = time.perf_counter() - requete.debut
+        with self._verrou:
+            cle = (route, methode, code)
+            self._requetes[cle] = self._requetes.get(cle, 0) + 1
+            if code >= 400:
+                type_erreur = "serveur" if code >= 500 else "client"
+                self._erreurs[(route, type_erreur)] = self._erreurs.get((route, type_erreur), 0) + 1
+            histogramme = self._durees.get(route)
+            if histogramme is None:
+                histogramme = self._durees[route] = Histogramme(self.bornes)
+            histogramme.observer(duree)
+            for phase, duree_phase in requete.durees.items():
+                histogramme = self._phases.get((route, phase))
+                if histogramme is None:
+                    histogramme = self._phases[(route, phase)] = Histogramme(self.bornes)
+                histogramme.observer(duree_phase)
+
+    def _histogrammes(self, nom: str, aide: str, series: Dict[tuple, Histogramme],
+                      noms_etiquettes: Tuple[str, ...]) -> List[str]:
+        lignes = [f"# HELP {nom} {aide}", f"# TYPE {nom} histogram"]
+        for cle, h in sorted(series.items()):
+            paires = list(zip(noms_etiquettes, cle if isinstance(cle, tuple) else (cle,)))
+            cumul = 0
+            for borne, compteur in zip(self.bornes + (float('inf'),), h.compteurs):
+                cumul += compteur
+                le = '+Inf' if borne == float('inf') else repr(borne)
+                lignes.append(f"{nom}_bucket{_etiquettes(paires + [('le', le)])} {cumul}")
+            lignes.append(f"{nom}_sum{_etiquettes(paires)} {h.somme!r}")
+            lignes.append(f"{nom}_count{_etiquettes(paires)} {h.nombre}")
+        return lignes
+
+    def exposer(self) -> str:
+        """Retourne toutes les métriques au format texte de Prometheus (0.0.4)."""
+        p = self.prefixe
+        with self._verrou:
+            requetes = dict(self._requetes)
+            erreurs = dict(self._erreurs)
+            # Copie des histogrammes pour ne pas garder le verrou pendant le formatage
+            durees = {cle: self._copie(h) for cle, h in self._durees.items()}
+            phases = {cle: self._copie(h) for cle, h in self._phases.items()}
+
+        lignes = [f"# HELP {p}_requetes_total Requêtes HTTP traitées.",
+                  f"# TYPE {p}_requetes_total counter"]
+        for (route, methode, code), nombre in sorted(requetes.items()):
+            lignes.append(f"{p}_requetes_total"
+                          f"{_etiquettes([('route', route), ('methode', methode), ('code', code)])} {nombre}")
+        lignes += [f"# HELP {p}_erreurs_total Requêtes en erreur (client : 4xx, serveur : 5xx).",
+                   f"# TYPE {p}_erreurs_total counter"]
+        for (route, type_erreur), nombre in sorted(erreurs.items()):
+            lignes.append(f"{p}_erreurs_total{_etiquettes([('route', route), ('type', type_erreur)])} {nombre}")
+        lignes += self._histogrammes(
+            f"{p}_requete_duree_secondes", "Durée totale des requêtes.", durees, ('route',)
+        )
+        lignes += self._histogrammes(
+            f"{p}_phase_duree_secondes",
+            "Durée des phases d'une requête (decode, validate, compute, sqlite, serialize).",
+            phases, ('route', 'phase')
+        )
+
+        memoire = memoire_processus()
+        if "residente" in memoire:
+            lignes += ["# HELP process_resident_memory_bytes Mémoire résidente du processus.",
+                       "# TYPE process_resident_memory_bytes gauge",
+                       f"process_resident_memory_bytes {memoire['residente']}",
+                       "# HELP process_virtual_memory_bytes Mémoire virtuelle du processus.",
+                       "# TYPE process_virtual_memory_bytes gauge",
+                       f"process_virtual_memory_bytes {memoire['virtuelle']}"]
+        elif "residente_max" in memoire:
+            lignes += ["# HELP process_max_resident_memory_bytes Pic de mémoire résidente du processus.",
+                       "# TYPE process_max_resident_memory_bytes gauge",
+                       f"process_max_resident_memory_bytes {memoire['residente_max']}"]
+        temps = os.times()
+        lignes += ["# HELP process_cpu_seconds_total Temps CPU (utilisateur et système) du processus.",
+                   "# TYPE process_cpu_seconds_total counter",
+                   f"process_cpu_seconds_total {temps.user + temps.system!r}",
+                   "# HELP process_start_time_seconds Démarrage du processus (epoch).",
+                   "# TYPE process_start_time_seconds gauge",
+                   f"process_start_time_seconds {self._debut!r}"]
+        return '\n'.join(lignes) + '\n'
+
+    @staticmethod
+    def _copie(h: Histogramme) -> Histogramme:
+        copie = Histogramme(h.bornes)
+        copie.compteurs = list(h.compteurs)
+        copie.somme = h.somme
+        copie.nombre = h.nombre
+        return copie
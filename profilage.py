@@ -0,0 +1,258 @@
+"""
+Profilage à la demande des requêtes de l'API.
+
+Une requête est profilée si le mode est actif (tirage selon un taux
+d'échantillonnage), ou si elle porte l'en-tête X-Profilage avec le jeton
+configuré. Deux profileurs sont disponibles :
+
+- cprofile : profil déterministe (fichier .prof, lisible avec pstats ou
+  snakeviz) ;
+- echantillons : un thread relève la pile de la requête à intervalle
+  régulier (fichier .txt de piles repliées, pour flamegraph.pl ou
+  speedscope). Plus léger, il sert aussi quand cProfile est déjà occupé
+  par une autre requête.
+
+Chaque capture est écrite avec un fichier .json de métadonnées (route,
+durée, fonctions les plus coûteuses) dans un dossier dont seules les
+captures les plus récentes sont gardées.
+
+Configuration (variables d'environnement) :
+    PROFILAGE=1              profiler un échantillon des requêtes
+    PROFILAGE_TAUX=0.01      part des requêtes profilées en mode actif
+    PROFILAGE_JETON=secret   autorise l'en-tête « X-Profilage: secret »
+    PROFILAGE_MODE=cprofile  ou echantillons
+    PROFILAGE_DOSSIER=...    dossier des captures
+    PROFILAGE_MAX=100        nombre de captures conservées
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+MODES = ("cprofile", "echantillons")
+# Intervalle entre deux relevés de pile (s)
+INTERVALLE_ECHANTILLONS = 0.001
+# Fonctions gardées dans le résumé d'une capture
+RESUME_FONCTIONS = 10
+
+
+class _Echantillonneur:
+    """Relève périodiquement la pile d'un thread et compte les piles repliées."""
+
+    def __init__(self, thread_id: int, intervalle: float = INTERVALLE_ECHANTILLONS):
+        self.thread_id = thread_id
+        self.intervalle = intervalle
+        self.piles = Counter()
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._boucle, name="profilage", daemon=True)
+
+    def demarrer(self):
+        self._thread.start()
+
+    def arreter(self):
+        self._arret.set()
+        self._thread.join()
+
+    def _boucle(self):
+        while not self._arret.wait(self.intervalle):
+            cadre = sys._current_frames().get(self.thread_id)
+            pile = []
+            while cadre is not None:
+                code = cadre.f_code
+                pile.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                cadre = cadre.f_back
+            if pile:
+                self.piles[';'.join(reversed(pile))] += 1
+
+    def ecrire(self, chemin: str):
+        with open(chemin, 'w', encoding='utf-8') as f:
+            for pile, nombre in self.piles.most_common():
+                f.write(f"{pile} {nombre}\n")
+
+    def resume(self) -> List[dict]:
+        """Fonctions le plus souvent en haut de la pile (temps propre)."""
+        feuilles = Counter()
+        for pile, nombre in self.piles.items():
+            feuilles[pile.rsplit(';', 1)[-1]] += nombre
+        total = sum(feuilles.values()) or 1
+        return [{"fonction": nom, "echantillons": nombre, "part": round(nombre / total, 3)}
+                for nom, nombre in feuilles.most_common(RESUME_FONCTIONS)]
+
+
+@dataclass
+class Capture:
+    """Une requête en cours de profilage."""
+    mode: str
+    debut: float = field(default_factory=time.perf_counter)
+    profil: Optional[cProfile.Profile] = None
+    echantillonneur: Optional[_Echantillonneur] = None
+
+
+def _resume_cprofile(profil: cProfile.Profile) -> List[dict]:
+    stats = pstats.Stats(profil, stream=io.StringIO())
+    lignes = []
+    for (fichier, ligne, nom), (_, appels, propre, cumule, _) in stats.stats.items():
+        lignes.append({
+            "fonction": f"{nom} ({os.path.basename(fichier)}:{ligne})",
+            "appels": appels,
+            "propre_ms": round(propre * 1000, 3),
+            "cumule_ms": round(cumule * 1000, 3),
+        })
+    lignes.sort(key=lambda l: l["cumule_ms"], reverse=True)
+    return lignes[:RESUME_FONCTIONS]
+
+
+class Profileur:
+    """Décide quelles requêtes profiler et range les captures sur disque."""
+
+    def __init__(self, dossier: str, actif: bool = False, taux: float = 0.01,
+                 jeton: Optional[str] = None, mode: str = "cprofile", maximum: int = 100):
+        """
+        Args:
+            dossier: Dossier des captures (créé au besoin)
+            actif: Profiler un échantillon de toutes les requêtes
+            taux: Part des requêtes profilées quand le mode est actif
+            jeton: Valeur de l'en-tête X-Profilage qui force le profilage
+            mode: "cprofile" ou "echantillons"
+            maximum: Nombre de captures conservées (les plus anciennes sont supprimées)
+
+        Raises:
+            ValueError: Si le mode est inconnu
+        """
+        if mode not in MODES:
+            raise ValueError(f"Mode de profilage inconnu: {mode!r} (attendu: {', '.join(MODES)})")
+        self.dossier = dossier
+        self.actif = actif
+        self.taux = taux
+        self.jeton = jeton
+        self.mode = mode
+        self.maximum = maximum
+        # cProfile ne peut profiler qu'une requête à la fois (Python 3.12+)
+        self._cprofile_verrou = threading.Lock()
+        self._numero = 0
+        self._verrou = threading.Lock()
+
+    @classmethod
+    def depuis_environnement(cls, dossier_par_defaut: str) -> "Profileur":
+        return cls(
+            dossier=os.environ.get('PROFILAGE_DOSSIER') or dossier_par_defaut,
+            actif=os.environ.get('PROFILAGE', '0') == '1',
+            taux=float(os.environ.get('PROFILAGE_TAUX', 0.01)),
+            jeton=os.environ.get('PROFILAGE_JETON') or None,
+            mode=os.environ.get('PROFILAGE_MODE', 'cprofile'),
+            maximum=int(os.environ.get('PROFILAGE_MAX', 100)),
+        )
+
+    def jeton_valide(self, entete: Optional[str]) -> bool:
+        """Indique si l'en-tête X-Profilage porte le jeton configuré."""
+        if not (self.jeton and entete):
+            return False
+        # compare_digest refuse les str non ASCII : on compare les octets
+        return hmac.compare_digest(entete.encode('utf-8'), self.jeton.encode('utf-8'))
+
+    def demarrer(self, entete: Optional[str] = None) -> Optional[Capture]:
+        """
+        Commence le profilage de la requête courante si elle est retenue.
+
+        Returns:
+            La capture en cours, ou None si la requête n'est pas profilée
+        """
+        if not self.jeton_valide(entete) and not (self.actif and random.random() < self.taux):
+            return None
+        if self.mode == "cprofile" and self._cprofile_verrou.acquire(blocking=False):
+            capture = Capture("cprofile", profil=cProfile.Profile())
+            capture.profil.enable()
+            return capture
+        capture = Capture("echantillons", echantillonneur=_Echantillonneur(threading.get_ident()))
+        capture.echantillonneur.demarrer()
+        return capture
+
+    def terminer(self, capture: Optional[Capture], route: str, methode: str, statut: int) -> Optional[str]:
+        """
+        Arrête le profilage et écrit la capture.
+
+        Returns:
+            Le nom de la capture, ou None si la requête n'était pas profilée
+        """
+        if capture is None:
+            return None
+        duree = time.perf_counter() - capture.debut
+        if capture.profil is not None:
+            capture.profil.disable()
+            self._cprofile_verrou.release()
+        else:
+            capture.echantillonneur.arreter()
+
+        with self._verrou:
+            self._numero += 1
+            numero = self._numero
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'racine'
+        nom = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{numero:05d}-{methode}-{slug}"
+        os.makedirs(self.dossier, exist_ok=True)
+        if capture.profil is not None:
+            fichier = nom + '.prof'
+            capture.profil.dump_stats(os.path.join(self.dossier, fichier))
+            resume = _resume_cprofile(capture.profil)
+        else:
+            fichier = nom + '.txt'
+            capture.echantillonneur.ecrire(os.path.join(self.dossier, fichier))
+            resume = capture.echantillonneur.resume()
+        meta = {
+            "nom": nom,
+            "fichier": fichier,
+            "mode": capture.mode,
+            "route": route,
+            "methode": methode,
+            "statut": statut,
+            "duree_ms": round(duree * 1000, 3),
+            "date": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "pid": os.getpid(),
+            "resume": resume,
+        }
+        with open(os.path.join(self.dossier, nom + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._rotation()
+        return nom
+
+    def _metadonnees(self) -> List[str]:
+        try:
+            return sorted(n for n in os.listdir(self.dossier) if n.endswith('.json'))
+        except FileNotFoundError:
+            return []
+
+    def _rotation(self):
+        # Les noms commencent par la date : l'ordre alphabétique est chronologique
+        noms = self._metadonnees()
+        for nom in noms[:max(len(noms) - self.maximum, 0)]:
+            base = nom[:-len('.json')]
+            for extension in ('.json', '.prof', '.txt'):
+                try:
+                    os.remove(os.path.join(self.dossier, base + extension))
+                except FileNotFoundError:
+                    pass
+
+    def plus_lentes(self, limite: int = 20, route: Optional[str] = None) -> List[dict]:
+        """Retourne les captures les plus lentes (tous processus confondus)."""
+        captures = []
+        for nom in self._metadonnees():
+            try:
+                with open(os.path.join(self.dossier, nom), encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                # Capture supprimée par la rotation d'un autre worker
+                continue
+            if route is None or meta.get("route") == route:
+                captures.append(meta)
+        captures.sort(key=lambda m: m.get("duree_ms", 0), reverse=True)
+        return captures[:limite]
@@ -0,0 +1,173 @@
+"""
+Classements des classes stockés en base, partagés par tous les workers.
+
+Les moyennes sont dans la table classement_moyennes, avec un numéro de
+version par classe (classement_versions) incrémenté dans la transaction de
+chaque modification. Chaque processus garde le Classement (arbre de
+Fenwick) de la dernière version lue : ses propres écritures le mettent à
+jour en O(log n) ; il n'est reconstruit depuis la base que si un autre
+worker a modifié la classe entre-temps.
+
+Contrairement au catalogue des matières, la version est relue à chaque
+consultation (une lecture par clé primaire) : un classement ne doit pas
+différer d'un worker à l'autre, même brièvement.
+"""
+
+import threading
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from classement import NOTE_MAX, Classement
+
+T = TypeVar('T')
+
+
+class RegistreClassements:
+    """Classements des classes, lus en base et gardés en mémoire."""
+
+    def __init__(self, connexion: Callable, precision: int = 2):
+        """
+        Args:
+            connexion: Fabrique de connexion (par exemple PoolSQLite.connexion)
+            precision: Nombre de décimales conservées pour départager les moyennes
+        """
+        self._connexion = connexion
+        self.precision = precision
+        # classe -> (version, classement) ; un Classement n'est pas thread-safe,
+        # il n'est lu et modifié que sous le verrou
+        self._classements: Dict[str, Tuple[int, Classement]] = {}
+        self._verrou = threading.Lock()
+
+        self.lectures = 0
+        self.rechargements = 0
+
+    @staticmethod
+    def _lire_version(conn, classe: str) -> int:
+        ligne = conn.execute(
+            'SELECT version FROM classement_versions WHERE classe = ?', (classe,)
+        ).fetchone()
+        return ligne[0] if ligne is not None else 0
+
+    def _recharger(self, conn, classe: str) -> Classement:
+        """Reconstruit le classement depuis la base (appelé sous le verrou)."""
+        self.rechargements += 1
+        version = self._lire_version(conn, classe)
+        if version == 0:
+            # Classe inconnue : rien n'est gardé pour les noms de classe quelconques
+            self._classements.pop(classe, None)
+            return Classement(self.precision)
+        lignes = conn.execute(
+            'SELECT eleve, moyenne FROM classement_moyennes WHERE classe = ?', (classe,)
+        ).fetchall()
+        classement = Classement.depuis_moyennes(dict(lignes), self.precision)
+        self._classements[classe] = (version, classement)
+        return classement
+
+    def consulter(self, classe: str, fonction: Callable[[Classement], T]) -> Optional[T]:
+        """
+        Applique `fonction` au classement courant d'une classe.
+
+        Returns:
+            Le résultat de `fonction`, ou None si la classe n'a aucun élève
+        """
+        with self._connexion() as conn:
+            version = self._lire_version(conn, classe)
+            with self._verrou:
+                self.lectures += 1
+                entree = self._classements.get(classe)
+                # Une version plus récente déjà en mémoire est gardée
+                if entree is not None and entree[0] >= version:
+                    classement = entree[1]
+                else:
+                    classement = self._recharger(conn, classe)
+                if not len(classement):
+                    return None
+                return fonction(classement)
+
+    def _modifier(self, classe: str, ecrire: Callable, appliquer: Callable[[Classement], None],
+                  fonction: Optional[Callable[[Classement], T]]) -> Optional[T]:
+        """
+        Exécute `ecrire(conn)` dans une transaction qui incrémente la version,
+        puis reporte la modification sur le classement en mémoire.
+
+        Returns:
+            Le résultat de `fonction` appliquée au classement à jour ; None si
+            `ecrire` a renvoyé False (rien à modifier)
+        """
+        with self._connexion() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                version = self._lire_version(conn, classe)
+                if ecrire(conn) is False:
+                    conn.rollback()
+                    return None
+                conn.execute(
+                    'INSERT OR REPLACE INTO classement_versions (classe, version) VALUES (?, ?)',
+                    (classe, version + 1)
+                )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+            with self._verrou:
+                entree = self._classements.get(classe)
+                if entree is not None and entree[0] == version:
+                    # Version en mémoire juste avant la nôtre : mise à jour en O(log n)
+                    classement = entree[1]
+                    appliquer(classement)
+                    self._classements[classe] = (version + 1, classement)
+                elif entree is not None and entree[0] > version:
+                    classement = entree[1]
+                else:
+                    classement = self._recharger(conn, classe)
+                return fonction(classement) if fonction is not None else None
+
+    def mettre_a_jour(self, classe: str, eleve: str, moyenne: float,
+                      fonction: Optional[Callable[[Classement], T]] = None) -> Optional[T]:
+        """
+        Ajoute un élève ou modifie sa moyenne.
+
+        Returns:
+            Le résultat de `fonction` appliquée au classement à jour
+
+        Raises:
+            ValueError: Si la moyenne est en dehors de [0, NOTE_MAX]
+        """
+        if not (0 <= moyenne <= NOTE_MAX):
+            raise ValueError(f"La moyenne doit être entre 0 et {NOTE_MAX}, reçu: {moyenne}")
+
+        def ecrire(conn):
+            conn.execute(
+                'INSERT OR REPLACE INTO classement_moyennes (classe, eleve, moyenne) VALUES (?, ?, ?)',
+                (classe, eleve, moyenne)
+            )
+
+        return self._modifier(classe, ecrire, lambda c: c.mettre_a_jour(eleve, moyenne), fonction)
+
+    def retirer(self, classe: str, eleve: str) -> bool:
+        """
+        Retire un élève d'un classement.
+
+        Returns:
+            False si l'élève n'était pas classé
+        """
+        retire = False
+
+        def ecrire(conn):
+            nonlocal retire
+            retire = conn.execute(
+                'DELETE FROM classement_moyennes WHERE classe = ? AND eleve = ?', (classe, eleve)
+            ).rowcount > 0
+            return retire
+
+        self._modifier(classe, ecrire, lambda c: c.retirer(eleve), None)
+        return retire
+
+    def statistiques(self) -> dict:
+        """Compteurs de consultations et de reconstructions depuis la base."""
+        with self._verrou:
+            return {
+                "classes": len(self._classements),
+                "lectures": self.lectures,
+                "rechargements": self.rechargements,
+            }
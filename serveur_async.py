@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Mode de service asynchrone de la version Web.
+
+Un serveur HTTP/1.1 asyncio (bibliothèque standard uniquement) garde les
+connexions ouvertes (keep-alive) sans leur réserver de thread : des milliers
+de clients inactifs ne coûtent que quelques Kio chacun.
+
+- toutes les routes sont servies par l'application Flask (mêmes routes,
+  mêmes réponses JSON, mêmes hooks : métriques, profilage, démarrage à
+  froid), dans des threads : la boucle ne fait que lire et écrire les
+  connexions ;
+- /api/calculer ne touche pas à la base : il a son propre pool de threads,
+  qu'une longue requête SQLite n'occupe jamais. Les autres routes partagent
+  un pool borné.
+
+Le corps d'une requête est délimité par un unique Content-Length : un
+en-tête répété ou mal formé est refusé (400), comme Transfer-Encoding (411),
+pour qu'un mandataire placé devant ne puisse pas lire la requête autrement.
+Pour la même raison, un en-tête dont le nom contient « _ » est ignoré
+(Content_Length deviendrait CONTENT_LENGTH dans l'environ WSGI), comme le
+font gunicorn et werkzeug.
+
+Un petit corps est lu avant d'appeler l'application ; au-delà de
+TAILLE_CORPS_TAMPON, wsgi.input lit la connexion au fur et à mesure que
+l'application le consomme (import NDJSON en flux, mémoire constante).
+
+Une exception de l'application donne une réponse 500, tracée sur stderr.
+
+Lancement :
+    python serveur_async.py --port 5000 --threads 8 --threads-calcul 2
+"""
+
+import argparse
+import asyncio
+import io
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http import HTTPStatus
+from urllib.parse import unquote_to_bytes
+
+import web_app
+
+TAILLE_ENTETES_MAX = 64 * 1024
+TAILLE_CORPS_TAMPON = 64 * 1024
+TAILLE_MORCEAU = 64 * 1024
+DELAI_INACTIVITE = 15.0
+# int() accepterait aussi « +5 », « 1_0 » ou des espaces
+_LONGUEUR = re.compile(r'[0-9]{1,20}')
+# Caractères autorisés dans un nom d'en-tête (token de la RFC 9110)
+_NOM_ENTETE = re.compile(r"[!#$%&'*+.^_`|~0-9A-Za-z-]+")
+
+
+class RequeteInvalide(Exception):
+    """Requête HTTP que le serveur refuse avant de la traiter."""
+
+    def __init__(self, statut: int, message: str):
+        super().__init__(message)
+        self.statut = statut
+
+
+class CorpsEnFlux(io.RawIOBase):
+    """
+    wsgi.input d'un corps volumineux : chaque lecture de l'application (dans
+    un thread du pool) est confiée à la boucle, qui lit la connexion. Au plus
+    `longueur` octets sont lus, jamais la requête suivante.
+    """
+
+    def __init__(self, lecteur: asyncio.StreamReader, boucle: asyncio.AbstractEventLoop,
+                 longueur: int, delai: float):
+        super().__init__()
+        self._lecteur = lecteur
+        self._boucle = boucle
+        self._delai = delai
+        self.restant = longueur
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, tampon) -> int:
+        if self.restant <= 0:
+            return 0
+        taille = min(len(tampon), self.restant, TAILLE_MORCEAU)
+        lecture = asyncio.wait_for(self._lecteur.read(taille), self._delai)
+        donnees = asyncio.run_coroutine_threadsafe(lecture, self._boucle).result()
+        if not donnees:
+            raise ConnectionError("Connexion fermée avant la fin du corps")
+        tampon[:len(donnees)] = donnees
+        self.restant -= len(donnees)
+        return len(donnees)
+
+
+class Requete:
+    """Une requête HTTP lue sur la connexion."""
+    __slots__ = ("methode", "cible", "version", "entetes", "corps")
+
+    def __init__(self, methode: str, cible: str, version: str, entetes: list, corps: io.IOBase = None):
+        self.methode = methode
+        self.cible = cible
+        self.version = version
+        self.entetes = entetes
+        self.corps = corps if corps is not None else io.BytesIO()
+
+    def entete(self, nom: str, defaut: str = None) -> str:
+        nom = nom.lower()
+        for cle, valeur in self.entetes:
+            if cle.lower() == nom:
+                return valeur
+        return defaut
+
+    @property
+    def chemin(self) -> str:
+        return self.cible.split('?', 1)[0]
+
+    def garder_ouverte(self) -> bool:
+        connexion = (self.entete('Connection') or '').lower()
+        if self.version == 'HTTP/1.0':
+            return connexion == 'keep-alive'
+        return connexion != 'close'
+
+    def corps_consomme(self) -> bool:
+        """Faux si l'application n'a pas lu tout le corps : la suite est encore sur la connexion."""
+        return getattr(self.corps, 'restant', 0) <= 0
+
+
+def analyser_entete(brut: bytes) -> Requete:
+    """
+    Analyse la ligne de requête et les en-têtes.
+
+    Raises:
+        RequeteInvalide: Si la requête est mal formée
+    """
+    try:
+        lignes = brut.decode('latin-1').split('\r\n')
+        methode, cible, version = lignes[0].split(' ')
+    except ValueError:
+        raise RequeteInvalide(400, "Ligne de requête invalide") from None
+    if version not in ('HTTP/1.0', 'HTTP/1.1'):
+        raise RequeteInvalide(505, f"Version HTTP non prise en charge: {version}")
+
+    entetes = []
+    for ligne in lignes[1:]:
+        if not ligne:
+            continue
+        nom, sep, valeur = ligne.partition(':')
+        if not sep or not _NOM_ENTETE.fullmatch(nom):
+            raise RequeteInvalide(400, "En-tête invalide")
+        entetes.append((nom, valeur.strip()))
+    return Requete(methode, cible, version, entetes)
+
+
+class ServeurAsync:
+    """Serveur HTTP asyncio devant l'application Flask."""
+
+    def __init__(self, application=None, threads: int = 8, file_max: int = 1000,
+                 delai_inactivite: float = DELAI_INACTIVITE, threads_calcul: int = 2):
+        """
+        Args:
+            application: Application WSGI (web_app.app par défaut)
+            threads: Nombre de threads pour les routes qui accèdent à la base
+            threads_calcul: Nombre de threads réservés aux routes de ROUTES_CALCUL
+            file_max: Requêtes en attente d'un thread au-delà desquelles on répond 503
+            delai_inactivite: Fermeture d'une connexion keep-alive inactive (s)
+        """
+        self.application = application or web_app.app
+        self.threads = threads
+        self.file_max = file_max
+        self.delai_inactivite = delai_inactivite
+        self.threads_calcul = threads_calcul
+        self.executeur = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+        self.executeur_calcul = ThreadPoolExecutor(max_workers=threads_calcul, thread_name_prefix='calcul')
+
+        compacte = getattr(self.application.json, 'compact', None)
+        if compacte or (compacte is None and not self.application.debug):
+            self._args_json = {'separators': (',', ':')}
+        else:
+            self._args_json = {'indent': 2}
+
+        # Routes servies dans la boucle, sans Flask : (méthode, chemin) -> coroutine
+        self.routes_boucle = {
+            ('GET', '/api/stats/serveur'): self._statistiques,
+        }
+        # Routes sans accès à la base, servies par Flask dans executeur_calcul
+        self.routes_calcul = {('POST', '/api/calculer')}
+
+        self.connexions_ouvertes = 0
+        self.connexions_max = 0
+        self.requetes_boucle = 0
+        self.requetes_threads = 0
+        self.requetes_calcul = 0
+        self.en_attente = 0
+        self.refus = 0
+        self.erreurs = 0
+        self._debut = time.monotonic()
+
+    async def demarrer(self, hote: str = '127.0.0.1', port: int = 5000, **kwargs) -> asyncio.AbstractServer:
+        """Ouvre le port d'écoute et retourne le serveur asyncio."""
+        return await asyncio.start_server(
+            self._connexion, hote, port, limit=TAILLE_ENTETES_MAX, backlog=4096, **kwargs
+        )
+
+    def fermer(self):
+        """Arrête les pools de threads (les requêtes en cours se terminent)."""
+        self.executeur.shutdown(wait=True)
+        self.executeur_calcul.shutdown(wait=True)
+
+    async def _connexion(self, lecteur: asyncio.StreamReader, ecrivain: asyncio.StreamWriter):
+        self.connexions_ouvertes += 1
+        self.connexions_max = max(self.connexions_max, self.connexions_ouvertes)
+        try:
+            while True:
+                try:
+                    brut = await asyncio.wait_for(lecteur.readuntil(b'\r\n\r\n'), self.delai_inactivite)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._ecrire(ecrivain, 431, {"error": "En-têtes trop volumineux"}, fermer=True)
+                    return
+
+                try:
+                    requete = analyser_entete(brut[:-4])
+                    await self._lire_corps(lecteur, ecrivain, requete)
+                except RequeteInvalide as e:
+                    await self._ecrire(ecrivain, e.statut, {"error": str(e)}, fermer=True)
+                    return
+
+                garder = requete.garder_ouverte()
+                traitement = self.routes_boucle.get((requete.methode, requete.chemin))
+                reponse = None
+                if traitement is not None:
+                    web_app.METRIQUES.debut_requete()
+                    reponse = await traitement(requete)
+                    if reponse is not None:
+                        web_app.METRIQUES.fin_requete(requete.chemin, requete.methode, reponse[0])
+                if reponse is None:
+                    calcul = (requete.methode, requete.chemin) in self.routes_calcul
+                    try:
+                        reponse = await self._wsgi(requete, ecrivain, calcul)
+                    except Exception:
+                        self.erreurs += 1
+                        print(f"Erreur de l'application sur {requete.methode} {requete.chemin}",
+                              file=sys.stderr)
+                        traceback.print_exc()
+                        reponse = self._json(500, {"error": "Erreur interne du serveur"})
+                        garder = False
+                # Un reste de corps non lu serait pris pour la requête suivante
+                garder = garder and requete.corps_consomme()
+                statut, entetes, corps = reponse
+
+                if isinstance(corps, bytes):
+                    await self._ecrire_brut(ecrivain, requete, statut, entetes, corps, fermer=not garder)
+                else:
+                    # Sans découpage (HTTP/1.0), la fin du corps est la fermeture
+                    garder = garder and requete.version == 'HTTP/1.1'
+                    await self._ecrire_flux(ecrivain, requete, statut, entetes, corps, fermer=not garder)
+                if not garder:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            # Réponse déjà commencée (corps en flux) : la connexion est fermée
+            self.erreurs += 1
+            traceback.print_exc()
+        finally:
+            self.connexions_ouvertes -= 1
+            ecrivain.close()
+
+    async def _lire_corps(self, lecteur: asyncio.StreamReader, ecrivain: asyncio.StreamWriter,
+                          requete: Requete):
+        if requete.entete('Transfer-Encoding'):
+            raise RequeteInvalide(411, "Transfer-Encoding non pris en charge, Content-Length requis")
+        longueurs = [valeur for nom, valeur in requete.entetes if nom.lower() == 'content-length']
+        if not longueurs:
+            return
+        if len(longueurs) > 1:
+            # Même identiques, deux longueurs peuvent être lues différemment
+            # par un mandataire : la requête est refusée
+            raise RequeteInvalide(400, "Content-Length répété")
+        if not _LONGUEUR.fullmatch(longueurs[0]):
+            raise RequeteInvalide(400, "Content-Length invalide")
+        longueur = int(longueurs[0])
+        if not longueur:
+            return
+        if requete.version == 'HTTP/1.1' and (requete.entete('Expect') or '').lower() == '100-continue':
+            ecrivain.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        if longueur <= TAILLE_CORPS_TAMPON:
+            requete.corps = io.BytesIO(await lecteur.readexactly(longueur))
+        else:
+            requete.corps = CorpsEnFlux(lecteur, asyncio.get_running_loop(), longueur, self.delai_inactivite)
+
+    # ---- Routes servies dans la boucle ----
+
+    def _json(self, statut: int, donnees) -> tuple:
+        # Même sérialisation que jsonify (clés triées, ASCII, compacte hors
+        # mode debug, saut de ligne final)
+        corps = (self.application.json.dumps(donnees, **self._args_json) + '\n').encode('utf-8')
+        return statut, [('Content-Type', 'application/json')], corps
+
+    async def _statistiques(self, requete: Requete):
+        self.requetes_boucle += 1
+        return self._json(200, self.statistiques())
+
+    # ---- Routes confiées à Flask ----
+
+    async def _wsgi(self, requete: Requete, ecrivain: asyncio.StreamWriter, calcul: bool = False) -> tuple:
+        if self.en_attente >= self.file_max:
+            self.refus += 1
+            statut, entetes, corps = self._json(503, {"error": "Serveur surchargé, réessayez plus tard"})
+            return statut, entetes + [('Retry-After', '1')], corps
+        self.en_attente += 1
+        if calcul:
+            self.requetes_calcul += 1
+        else:
+            self.requetes_threads += 1
+        try:
+            environ = self._environ(requete, ecrivain)
+            boucle = asyncio.get_running_loop()
+            executeur = self.executeur_calcul if calcul else self.executeur
+            return await boucle.run_in_executor(executeur, self._appeler_wsgi, environ)
+        finally:
+            self.en_attente -= 1
+
+    def _environ(self, requete: Requete, ecrivain: asyncio.StreamWriter) -> dict:
+        chemin, _, requete_brute = requete.cible.partition('?')
+        local = ecrivain.get_extra_info('sockname') or ('localhost', 80)
+        pair = ecrivain.get_extra_info('peername')
+        environ = {
+            'REQUEST_METHOD': requete.methode,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote_to_bytes(chemin).decode('latin-1'),
+            'QUERY_STRING': requete_brute,
+            'SERVER_NAME': str(local[0]),
+            'SERVER_PORT': str(local[1]),
+            'SERVER_PROTOCOL': requete.version,
+            'REMOTE_ADDR': pair[0] if pair else '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': requete.corps,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for nom, valeur in requete.entetes:
+            if '_' in nom:
+                continue
+            cle = nom.upper().replace('-', '_')
+            if cle in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[cle] = valeur
+            else:
+                cle = 'HTTP_' + cle
+                environ[cle] = environ[cle] + ',' + valeur if cle in environ else valeur
+        return environ
+
+    def _appeler_wsgi(self, environ: dict) -> tuple:
+        # Exécuté dans un thread du pool : le corps est produit ici, sauf
+        # s'il est de longueur inconnue (export en flux) ; l'itérable est
+        # alors renvoyé et lu morceau par morceau par _ecrire_flux
+        reponse = {}
+
+        def start_response(statut, entetes, exc_info=None):
+            reponse['statut'] = int(statut.split(' ', 1)[0])
+            reponse['entetes'] = entetes
+            return lambda donnees: morceaux.append(donnees)
+
+        morceaux = []
+        iterable = self.application(environ, start_response)
+        longueur_connue = any(nom.lower() == 'content-length' for nom, _ in reponse['entetes'])
+        if not longueur_connue and not morceaux:
+            return reponse['statut'], reponse['entetes'], iterable
+        try:
+            morceaux.extend(iterable)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        return reponse['statut'], reponse['entetes'], b''.join(morceaux)
+
+    # ---- Écriture des réponses ----
+
+    async def _ecrire(self, ecrivain, statut: int, donnees, fermer: bool = False):
+        statut, entetes, corps = self._json(statut, donnees)
+        await self._ecrire_brut(ecrivain, None, statut, entetes, corps, fermer)
+
+    @staticmethod
+    def _entete_reponse(statut: int, entetes: list, fermer: bool, supplementaires: list) -> bytes:
+        try:
+            raison = HTTPStatus(statut).phrase
+        except ValueError:
+            raison = ''
+        lignes = [f"HTTP/1.1 {statut} {raison}"]
+        for nom, valeur in entetes:
+            if nom.lower() not in ('content-length', 'connection', 'date', 'transfer-encoding'):
+                lignes.append(f"{nom}: {valeur}")
+        lignes.append(f"Date: {formatdate(usegmt=True)}")
+        lignes += supplementaires
+        lignes.append(f"Connection: {'close' if fermer else 'keep-alive'}")
+        return ('\r\n'.join(lignes) + '\r\n\r\n').encode('latin-1')
+
+    @staticmethod
+    def _sans_corps(requete, statut: int) -> bool:
+        return statut in (204, 304) or 100 <= statut < 200 or bool(requete and requete.methode == 'HEAD')
+
+    async def _ecrire_brut(self, ecrivain, requete, statut: int, entetes: list, corps: bytes, fermer: bool):
+        if statut in (204, 304):
+            longueur = []
+        elif requete is not None and requete.methode == 'HEAD':
+            # Pas de corps, mais la longueur annoncée est celle du GET
+            longueur = [f"Content-Length: {valeur}" for nom, valeur in entetes
+                        if nom.lower() == 'content-length'][:1]
+        else:
+            longueur = [f"Content-Length: {len(corps)}"]
+        ecrivain.write(self._entete_reponse(statut, entetes, fermer, longueur))
+        if not self._sans_corps(requete, statut):
+            ecrivain.write(corps)
+        await ecrivain.drain()
+
+    async def _ecrire_flux(self, ecrivain, requete, statut: int, entetes: list, iterable, fermer: bool):
+        """
+        Écrit un corps de longueur inconnue au fil de sa production, en
+        « Transfer-Encoding: chunked » si la connexion reste ouverte. Chaque
+        morceau est produit dans un thread du pool (lectures en base) ; la
+        mémoire utilisée ne dépend pas de la taille de la réponse.
+        """
+        decoupe = not fermer
+        sans_corps = self._sans_corps(requete, statut)
+        boucle = asyncio.get_running_loop()
+        try:
+            ecrivain.write(self._entete_reponse(
+                statut, entetes, fermer, ["Transfer-Encoding: chunked"] if decoupe and not sans_corps else []
+            ))
+            if not sans_corps:
+                iterateur = iter(iterable)
+                while True:
+                    morceau = await boucle.run_in_executor(self.executeur, next, iterateur, None)
+                    if morceau is None:
+                        break
+                    if not morceau:
+                        continue
+                    if decoupe:
+                        ecrivain.write(b'%x\r\n' % len(morceau) + morceau + b'\r\n')
+                    else:
+                        ecrivain.write(morceau)
+                    await ecrivain.drain()
+                if decoupe:
+                    ecrivain.write(b'0\r\n\r\n')
+            await ecrivain.drain()
+        finally:
+            if hasattr(iterable, 'close'):
+                await boucle.run_in_executor(self.executeur, iterable.close)
+
+    def statistiques(self) -> dict:
+        """Compteurs de connexions et de répartition boucle / pools de threads."""
+        return {
+            "connexions_ouvertes": self.connexions_ouvertes,
+            "connexions_max": self.connexions_max,
+            "requetes_boucle": self.requetes_boucle,
+            "requetes_threads": self.requetes_threads,
+            "requetes_calcul": self.requetes_calcul,
+            "threads": self.threads,
+            "threads_calcul": self.threads_calcul,
+            "en_attente_thread": self.en_attente,
+            "refus_surcharge": self.refus,
+            "erreurs_application": self.erreurs,
+            "duree_s": round(time.monotonic() - self._debut, 1),
+        }
+
+
+async def servir(hote: str, port: int, threads: int, file_max: int, threads_calcul: int = 2):
+    serveur = ServeurAsync(threads=threads, file_max=file_max, threads_calcul=threads_calcul)
+    ecoute = await serveur.demarrer(hote, port)
+    print(f"Serveur asynchrone sur http://{hote}:{port} ({threads} threads pour la base)", file=sys.stderr)
+    try:
+        async with ecoute:
+            await ecoute.serve_forever()
+    finally:
+        serveur.fermer()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Version Web servie par une boucle asyncio.")
+    parser.add_argument('--hote', default='127.0.0.1', help="Adresse d'écoute")
+    parser.add_argument('--port', type=int, default=5000, help="Port d'écoute")
+    parser.add_argument('--threads', type=int, default=8, help="Threads pour les routes qui accèdent à la base")
+    parser.add_argument('--threads-calcul', type=int, default=2,
+                        help="Threads réservés à /api/calculer (sans accès à la base)")
+    parser.add_argument('--file-max', type=int, default=1000,
+                        help="Requêtes en attente d'un thread avant de répondre 503")
+    args = parser.parse_args(argv)
+
+    web_app.init_db()
+    try:
+        asyncio.run(servir(args.hote, args.port, args.threads, args.file_max, args.threads_calcul))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
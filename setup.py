@@ -31,10 +31,11 @@ setup(
         "Topic :: Education",
     ],
     python_requires=">=3.6",
-    py_modules=["main"],
+    py_modules=["main", "baremes", "calculs", "classement", "cohorte"],
     entry_points={
         "console_scripts": [
             "calculateur-moyenne=main:main",
+            "calculateur-cohorte=cohorte:main",
         ],
     },
     include_package_data=True,
@@ -0,0 +1,47 @@
+"""
+Fixtures partagées : base temporaire migrée, pool de connexions et module
+web_app isolé sur sa propre base.
+"""
+
+import pytest
+
+from base_donnees import PoolSQLite, initialiser_schema
+from cache_reponses import CacheReponses
+
+
+@pytest.fixture
+def chemin_base(tmp_path):
+    chemin = str(tmp_path / "profils.db")
+    initialiser_schema(chemin)
+    return chemin
+
+
+@pytest.fixture
+def pool(chemin_base):
+    pool = PoolSQLite(chemin_base, taille=4)
+    yield pool
+    pool.fermer()
+
+
+@pytest.fixture
+def web_app(monkeypatch, tmp_path):
+    """Module web_app sur une base neuve, sans l'état laissé par un autre test."""
+    module = pytest.importorskip("web_app")
+    monkeypatch.setattr(module, "DB_FILE", str(tmp_path / "profils.db"))
+    monkeypatch.setattr(module, "_schema_pret", False)
+    for nom in ("_pool", "_ecrivain_historique", "_catalogue", "_classements"):
+        monkeypatch.setattr(module, nom, None)
+    cache = module.CACHE_REPONSES
+    monkeypatch.setattr(module, "CACHE_REPONSES", CacheReponses(
+        cache.capacite, lire_versions=module._lire_versions_cache, intervalle=cache.intervalle
+    ))
+    yield module
+    if module._ecrivain_historique is not None:
+        module._ecrivain_historique.arreter()
+    if module._pool is not None:
+        module._pool.fermer()
+
+
+@pytest.fixture
+def client(web_app):
+    return web_app.app.test_client()
@@ -0,0 +1,67 @@
+"""
+Analyse de l'historique en cache : elle suit les ajouts faits par ce worker,
+par l'écrivain d'un autre worker et par un import.
+"""
+
+import pytest
+
+from base_donnees import PoolSQLite
+from ecriture_historique import EcrivainHistorique
+from transfert import importer_ndjson
+
+
+@pytest.fixture
+def profil(client, web_app, monkeypatch):
+    monkeypatch.setattr(web_app.CACHE_REPONSES, 'intervalle', 0)
+    return client.post('/api/profils', json={"nom": "Alice", "matieres": []}).get_json()["id"]
+
+
+def _analyse(client, profil, etag=None):
+    return client.get(f'/api/historique/{profil}/analyse',
+                      headers={'If-None-Match': etag} if etag else {})
+
+
+def test_ajout_par_ce_worker(client, profil):
+    client.post('/api/historique', json={"profil_id": profil, "moyenne": 10})
+    avant = _analyse(client, profil)
+    client.post('/api/historique', json={"profil_id": profil, "moyenne": 14})
+    apres = _analyse(client, profil, avant.headers['ETag'])
+
+    assert avant.get_json()["nombre"] == 1
+    assert apres.status_code == 200
+    assert apres.get_json()["nombre"] == 2
+
+
+@pytest.mark.parametrize("durabilite", ["immediate", "groupee"])
+def test_ajout_par_l_ecrivain_d_un_autre_worker(client, web_app, profil, durabilite):
+    avant = _analyse(client, profil)
+    assert _analyse(client, profil, avant.headers['ETag']).status_code == 304
+
+    autre_pool = PoolSQLite(web_app.DB_FILE, taille=1)
+    autre = EcrivainHistorique(autre_pool, durabilite=durabilite)
+    autre.ajouter(profil, 12.0)
+    autre.arreter()
+    autre_pool.fermer()
+
+    apres = _analyse(client, profil, avant.headers['ETag'])
+    assert apres.status_code == 200
+    assert apres.get_json()["nombre"] == 1
+
+
+def test_ajout_par_un_import(client, web_app, profil):
+    avant = _analyse(client, profil)
+    autre_pool = PoolSQLite(web_app.DB_FILE, taille=1)
+    try:
+        bilan = importer_ndjson(autre_pool.connexion, [
+            '{"type":"profil","id":1,"nom":"Alice","matieres":[]}',
+            '{"type":"historique","profil_id":1,"moyenne":11.5}',
+            '{"type":"historique","profil_id":1,"moyenne":13.5}',
+        ], conflit="remplacer")
+    finally:
+        autre_pool.fermer()
+    assert bilan.erreurs == 0
+
+    apres = _analyse(client, profil, avant.headers['ETag'])
+    assert apres.status_code == 200
+    assert apres.get_json()["nombre"] == 2
+    assert apres.get_json()["moyenne"] == 12.5
@@ -0,0 +1,179 @@
+"""
+Ressources statiques : sorties minifiées toujours valides (et de même
+comportement pour le JavaScript), noms à empreinte servis en cache immuable
+dans la variante précompressée acceptée.
+"""
+
+import gzip
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+
+import assets
+
+# Pièges du minifieur : marqueurs de commentaire dans les chaînes, gabarits
+# imbriqués, expressions régulières et division, insertion des points-virgules
+SCRIPT_PIEGES = r"""
+// Commentaire de ligne
+const a = 10 / 2 / 5;   // division, pas une expression régulière
+const re = /\/\*[^/]*\*\//g;  /* expression régulière contenant des marqueurs */
+const s = "// pas un commentaire /* non plus */";
+const u = 'l\'apostrophe // reste';
+const t = `gabarit ${ {x: 1}.x + `imbriqué ${a /* commentaire */}` } // gardé`;
+const r = [1, 2, 3].map(x => x * 2).filter(x => /4|6/.test(String(x)));
+let b = a
+let c = b
+++c
+function f() {
+    return
+        42
+}
+/*
+ * Bloc
+ */
+const d = { e: { f: `}` } }.e.f;
+console.log(JSON.stringify([a, re.source, s, u, t, r, b, c, f(), d, "x /* y */ z".replace(re, '')]));
+"""
+
+
+def _node():
+    node = shutil.which('node') or shutil.which('nodejs')
+    if node is None:
+        pytest.skip("Node.js non installé")
+    return node
+
+
+def _executer(node, script):
+    resultat = subprocess.run([node], input=script, capture_output=True, text=True, timeout=30)
+    assert resultat.returncode == 0, resultat.stderr
+    return resultat.stdout
+
+
+def _lire(nom):
+    with open(os.path.join(assets.DOSSIER_SOURCE, nom), encoding='utf-8') as f:
+        return f.read()
+
+
+def test_js_minifie_meme_comportement():
+    node = _node()
+    minifie = assets.minifier_js(SCRIPT_PIEGES)
+
+    assert '/* commentaire */' not in minifie and 'Bloc' not in minifie
+    assert _executer(node, minifie) == _executer(node, SCRIPT_PIEGES)
+
+
+def test_script_de_l_application_reste_valide(tmp_path):
+    node = _node()
+    source = _lire('script.js')
+    minifie = assets.minifier_js(source)
+    chemin = tmp_path / "script.min.js"
+    chemin.write_text(minifie, encoding='utf-8')
+
+    resultat = subprocess.run([node, '--check', str(chemin)], capture_output=True, text=True, timeout=30)
+    assert resultat.returncode == 0, resultat.stderr
+    assert len(minifie) < len(source)
+    # Les gabarits HTML sont recopiés à l'identique
+    assert re.findall(r'`[^`]*`', minifie) == re.findall(r'`[^`]*`', source)
+
+
+def _jetons_css(texte):
+    """Jetons CSS hors commentaires : les espaces qui séparent deux mots comptent."""
+    texte = re.sub(r'/\*.*?\*/', '', texte, flags=re.S)
+    return re.findall(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[\w#.%!-]+|[^\s\w]', texte)
+
+
+def _sans_dernier_point_virgule(jetons):
+    return [j for i, j in enumerate(jetons) if not (j == ';' and jetons[i + 1:i + 2] == ['}'])]
+
+
+@pytest.mark.parametrize("css", [
+    None,
+    '/* en-tête */\na  b > c ,\nd { margin : 0  auto ; content: "  /* gardé */ ; " }\n',
+    "@media (max-width: 600px) { .x { font: 12px 'A B', serif; } }",
+], ids=["style_de_l_application", "selecteurs_et_chaines", "media"])
+def test_css_minifie_memes_jetons(css):
+    source = _lire('style.css') if css is None else css
+    minifie = assets.minifier_css(source)
+
+    assert _jetons_css(minifie) == _sans_dernier_point_virgule(_jetons_css(source))
+    assert minifie.count('{') == minifie.count('}')
+    assert len(minifie) < len(source)
+
+
+def test_css_chaines_conservees():
+    assert assets.minifier_css('a { content: "a  /* b */ c" ; }') == 'a{content:"a  /* b */ c"}\n'
+
+
+# ============ Construction ============
+
+def test_construction_reprise_au_chargement(tmp_path):
+    sortie = str(tmp_path / "dist")
+    construites = assets.construire(dossier_sortie=sortie)
+    chargees = assets.charger(dossier_sortie=sortie)
+
+    for nom, ressource in construites.items():
+        assert re.fullmatch(r'(style|script)\.[0-9a-f]{10}\.(css|js)', ressource.nom_publie)
+        assert chargees[nom] == ressource
+        assert gzip.decompress(ressource.variantes['gzip']) == ressource.variantes['identity']
+    # Même entrée, mêmes octets
+    assert assets.preparer('style.css', _lire('style.css').encode()) == construites['style.css']
+
+
+def test_source_modifiee_reconstruite(tmp_path):
+    source = tmp_path / "static"
+    source.mkdir()
+    (source / "style.css").write_text("a { color: red; }")
+    sortie = str(tmp_path / "dist")
+    ancienne = assets.construire(str(source), sortie, ('style.css',))['style.css']
+
+    (source / "style.css").write_text("a { color: blue; }")
+    nouvelle = assets.charger(str(source), sortie, ('style.css',))['style.css']
+    assert nouvelle.nom_publie != ancienne.nom_publie
+    assert nouvelle.variantes['identity'] == b'a{color:blue}\n'
+
+    # Une nouvelle construction retire les fichiers de l'ancienne
+    assets.construire(str(source), sortie, ('style.css',))
+    assert not any(f.startswith(ancienne.nom_publie) for f in os.listdir(sortie))
+
+
+@pytest.mark.parametrize("accept, attendu", [
+    (None, "identity"),
+    ("gzip, deflate", "gzip"),
+    ("br;q=1.0, gzip;q=0.5", "br"),
+    ("gzip;q=0", "identity"),
+    ("*", "br"),
+    ("br;q=0, *", "gzip"),
+], ids=["absent", "gzip", "br", "gzip_refuse", "etoile", "br_refuse"])
+def test_choix_de_l_encodage(accept, attendu):
+    assert assets.choisir_encodage(accept, ("identity", "gzip", "br")) == attendu
+
+
+# ============ Routes ============
+
+def test_ressources_servies_en_cache_immuable(client):
+    page = client.get('/').get_data(as_text=True)
+    url = re.search(r'href="(/assets/style\.[0-9a-f]{10}\.css)"', page).group(1)
+    assert re.search(r'src="/assets/script\.[0-9a-f]{10}\.js"', page)
+
+    brute = client.get(url)
+    assert brute.status_code == 200
+    assert brute.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert 'Content-Encoding' not in brute.headers
+    assert brute.mimetype == 'text/css'
+
+    compressee = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert compressee.headers['Content-Encoding'] == 'gzip'
+    assert compressee.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(compressee.get_data()) == brute.get_data()
+    assert compressee.headers['ETag'] != brute.headers['ETag']
+
+    revalidee = client.get(url, headers={'Accept-Encoding': 'gzip',
+                                         'If-None-Match': compressee.headers['ETag']})
+    assert revalidee.status_code == 304 and revalidee.get_data() == b''
+
+
+def test_ressource_inconnue(client):
+    assert client.get('/assets/style.0000000000.css').status_code == 404
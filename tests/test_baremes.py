@@ -0,0 +1,69 @@
+"""
+Registre des barèmes : seuils atteints inclus, classement en lot identique
+au classement unitaire (avec ou sans NumPy) et registre protégé.
+"""
+
+import pytest
+
+import baremes
+from baremes import Bareme, enregistrer_bareme, obtenir_bareme
+from calculs import obtenir_appreciation
+
+# Les bornes, juste en dessous et juste au-dessus de chaque seuil
+MOYENNES = [0.0, 7.99, 8.0, 9.999, 10.0, 10.01, 11.5, 12.0, 13.99, 14.0, 15.999, 16.0, 19.75, 20.0]
+
+
+@pytest.mark.parametrize("moyenne, texte", [
+    (0.0, "Doit faire des efforts"),
+    (9.99, "Doit faire des efforts"),
+    (10.0, "Passable"),
+    (12.0, "Bien!"),
+    (13.99, "Bien!"),
+    (14.0, "Très bien!"),
+    (16.0, "Excellent travail!"),
+    (20.0, "Excellent travail!"),
+])
+def test_seuil_atteint_inclus(moyenne, texte):
+    assert obtenir_bareme().classer(moyenne).texte == texte
+    assert obtenir_appreciation(moyenne)["texte"] == texte
+
+
+@pytest.mark.parametrize("sans_numpy", [False, True], ids=["numpy", "sans_numpy"])
+@pytest.mark.parametrize("nom", ["appreciation", "mentions_bac", "ects"])
+def test_lot_identique_au_classement_unitaire(monkeypatch, nom, sans_numpy):
+    bareme = obtenir_bareme(nom)
+    if sans_numpy:
+        monkeypatch.setattr(baremes, "charger_numpy", lambda: None)
+    elif baremes.charger_numpy() is None:
+        pytest.skip("NumPy non installé")
+
+    attendus = [bareme.classer(m).texte for m in MOYENNES]
+    assert bareme.textes_lot(MOYENNES) == attendus
+    assert [int(i) for i in bareme.indices_lot(MOYENNES)] == [bareme.indice(m) for m in MOYENNES]
+
+
+def test_paliers_dans_le_desordre_et_depuis_une_configuration():
+    bareme = Bareme.depuis_dict("test", {
+        "paliers": [{"seuil": 15, "texte": "Haut", "couleur": "#0f0"},
+                    {"seuil": 5, "texte": "Moyen", "couleur": "#ff0"}],
+        "defaut": {"texte": "Bas", "couleur": "#f00"},
+    })
+    assert bareme.seuils == (5.0, 15.0)
+    assert [bareme.classer(m).texte for m in (4.9, 5, 14.9, 15)] == ["Bas", "Moyen", "Moyen", "Haut"]
+
+
+def test_seuils_en_double_refuses():
+    with pytest.raises(ValueError, match="Seuils en double"):
+        Bareme("double", [(10, "A", "#000"), (10.0, "B", "#111")], ("C", "#222"))
+
+
+def test_registre(monkeypatch):
+    monkeypatch.setattr(baremes, "_REGISTRE", dict(baremes._REGISTRE))
+    with pytest.raises(ValueError, match="existe déjà"):
+        enregistrer_bareme(Bareme("ects", [], ("F", "#000")))
+    with pytest.raises(KeyError, match="Barème inconnu"):
+        obtenir_bareme("inconnu")
+
+    remplace = enregistrer_bareme(Bareme("ects", [], ("Sans mention", "#000")), remplacer=True)
+    assert obtenir_bareme("ects") is remplace
+    assert "ects" in baremes.baremes_disponibles()
@@ -0,0 +1,148 @@
+"""
+Cache des réponses : succès, 304, invalidation locale par étiquettes et
+invalidation par les versions en base (écritures d'un autre worker).
+"""
+
+import sqlite3
+
+import pytest
+
+from base_donnees import incrementer_versions
+from cache_reponses import CacheReponses, etag_correspond
+
+
+class _Versions:
+    """Versions en base simulées, comptant les lectures."""
+
+    def __init__(self):
+        self.valeurs = {}
+        self.lectures = 0
+
+    def __call__(self, etiquettes):
+        self.lectures += 1
+        return tuple((e, self.valeurs.get(e, 0)) for e in sorted(set(etiquettes)))
+
+
+def _stocker(cache, cle, corps, etiquettes=()):
+    return cache.stocker(cle, corps, 'application/json', etiquettes, cache.generation(etiquettes))
+
+
+def test_succes_lru_et_invalidation_par_etiquette():
+    cache = CacheReponses(capacite=2)
+    _stocker(cache, 'a', b'1', ['profils'])
+    _stocker(cache, 'b', b'2', ['profil:1'])
+    assert cache.lire('a').corps == b'1'
+    _stocker(cache, 'c', b'3')
+
+    # 'b' était la moins récemment lue
+    assert cache.lire('b') is None
+    assert cache.invalider('profils') == 1
+    assert cache.lire('a') is None
+    assert cache.lire('c').corps == b'3'
+
+
+def test_reponse_construite_pendant_une_invalidation_non_memorisee():
+    cache = CacheReponses()
+    generation = cache.generation()
+    cache.invalider('profils')
+    cache.stocker('a', b'1', 'application/json', ['profils'], generation)
+    assert cache.lire('a') is None
+
+
+def test_version_en_base_verifiee_au_plus_une_fois_par_intervalle(monkeypatch):
+    versions = _Versions()
+    cache = CacheReponses(lire_versions=versions, intervalle=10)
+    horloge = [100.0]
+    monkeypatch.setattr('cache_reponses.time.monotonic', lambda: horloge[0])
+    _stocker(cache, 'a', b'1', ['profils'])
+    lectures = versions.lectures
+
+    # Écriture d'un autre worker : invisible pendant l'intervalle
+    versions.valeurs['profils'] = 1
+    assert cache.lire('a') is not None
+    assert versions.lectures == lectures
+
+    horloge[0] += 11
+    assert cache.lire('a') is None
+    assert cache.statistiques()["perimees"] == 1
+
+    _stocker(cache, 'a', b'2', ['profils'])
+    horloge[0] += 11
+    assert cache.lire('a').corps == b'2'
+    assert cache.statistiques()["verifications"] == 2
+
+
+def test_etag_correspond():
+    assert etag_correspond('W/"x", "y"', '"x"')
+    assert etag_correspond('*', '"x"')
+    assert not etag_correspond('"y"', '"x"')
+    assert not etag_correspond(None, '"x"')
+
+
+# ============ Routes ============
+
+@pytest.fixture
+def profil(client):
+    reponse = client.post('/api/profils', json={"nom": "Alice", "matieres": [
+        {"nom": "Maths", "coefficient": 4, "note": 12, "selectionnee": True}
+    ]})
+    return reponse.get_json()["id"]
+
+
+def test_route_succes_puis_304(client, web_app, profil):
+    premiere = client.get(f'/api/profils/{profil}')
+    seconde = client.get(f'/api/profils/{profil}')
+    conditionnelle = client.get(f'/api/profils/{profil}',
+                                headers={'If-None-Match': premiere.headers['ETag']})
+
+    assert premiere.status_code == seconde.status_code == 200
+    assert seconde.headers['ETag'] == premiere.headers['ETag']
+    assert conditionnelle.status_code == 304
+    assert conditionnelle.data == b''
+    stats = web_app.CACHE_REPONSES.statistiques()
+    assert stats["succes"] == 2 and stats["reponses_304"] == 1
+
+
+def test_route_invalidee_par_une_ecriture_locale(client, profil):
+    avant = client.get(f'/api/profils/{profil}')
+    client.put(f'/api/profils/{profil}', json={"matieres": [
+        {"nom": "Maths", "coefficient": 4, "note": 15, "selectionnee": True}
+    ]})
+    apres = client.get(f'/api/profils/{profil}', headers={'If-None-Match': avant.headers['ETag']})
+
+    assert apres.status_code == 200
+    assert apres.get_json()["matieres"][0]["note"] == 15
+
+
+def test_route_invalidee_par_un_autre_worker(client, web_app, profil, monkeypatch):
+    monkeypatch.setattr(web_app.CACHE_REPONSES, 'intervalle', 0)
+    liste = client.get('/api/profils')
+    detail = client.get(f'/api/profils/{profil}')
+
+    # Autre processus : connexion séparée, sans passer par ce cache
+    conn = sqlite3.connect(web_app.DB_FILE)
+    conn.execute("UPDATE profils SET nom = 'Alicia' WHERE id = ?", (profil,))
+    incrementer_versions(conn, ['profils', f'profil:{profil}'])
+    conn.commit()
+    conn.close()
+
+    for url, avant in (('/api/profils', liste), (f'/api/profils/{profil}', detail)):
+        reponse = client.get(url, headers={'If-None-Match': avant.headers['ETag']})
+        assert reponse.status_code == 200
+        assert b'Alicia' in reponse.data
+
+
+def test_route_invalidee_par_un_import(client, web_app, profil, monkeypatch):
+    from transfert import main as transfert
+
+    monkeypatch.setattr(web_app.CACHE_REPONSES, 'intervalle', 0)
+    avant = client.get('/api/profils')
+    chemin = web_app.DB_FILE + '.ndjson'
+    with open(chemin, 'w', encoding='utf-8') as f:
+        f.write('{"type":"entete","format":"calculateur-moyenne/1"}\n'
+                '{"type":"profil","id":9,"nom":"Bob","matieres":[]}\n')
+    assert transfert(['--base', web_app.DB_FILE, 'importer', chemin]) == 0
+
+    reponse = client.get('/api/profils', headers={'If-None-Match': avant.headers['ETag']})
+    assert reponse.status_code == 200
+    assert {p["nom"] for p in reponse.get_json()} == {"Alice", "Bob"}
@@ -0,0 +1,73 @@
+"""
+/api/calculer/batch : mêmes moyennes et mentions que /api/calculer, élève
+par élève, et une erreur d'un élève n'empêche pas le calcul des autres.
+"""
+
+import random
+
+import pytest
+
+
+def _matieres(rng):
+    return [{"nom": f"M{j}", "coefficient": rng.choice([1, 2, 4, 5]),
+             "note": round(rng.uniform(0, 20) * 4) / 4, "selectionnee": rng.random() < 0.8}
+            for j in range(rng.randint(1, 9))]
+
+
+def test_identique_au_calcul_eleve_par_eleve(client):
+    rng = random.Random(3)
+    eleves = [{"id": f"e{i}", "matieres": _matieres(rng)} for i in range(60)]
+    eleves[0]["matieres"][0]["selectionnee"] = True
+
+    reponse = client.post('/api/calculer/batch', json={"eleves": eleves})
+    assert reponse.status_code == 200
+    corps = reponse.get_json()
+
+    assert [r["id"] for r in corps["resultats"]] == [e["id"] for e in eleves]
+    for eleve, resultat in zip(eleves, corps["resultats"]):
+        seul = client.post('/api/calculer', json={"matieres": eleve["matieres"]}).get_json()
+        if "error" in seul:
+            assert resultat["error"] == seul["error"]
+        else:
+            assert (resultat["moyenne"], resultat["appreciation"], resultat["couleur"]) == \
+                (seul["moyenne"], seul["appreciation"], seul["couleur"])
+    assert corps["meta"]["eleves"] == 60
+    assert corps["meta"]["calcules"] + corps["meta"]["erreurs"] == 60
+
+
+def test_erreurs_par_eleve(client):
+    eleves = [
+        {"id": "ok", "matieres": [{"nom": "Maths", "coefficient": 4, "note": 12, "selectionnee": True}]},
+        {"id": "aucune", "matieres": [{"nom": "Maths", "coefficient": 4, "note": 12, "selectionnee": False}]},
+        {"id": "note", "matieres": [{"nom": "Maths", "coefficient": 4, "note": 25, "selectionnee": True}]},
+        "pas un objet",
+        {"id": "sans_matieres"},
+    ]
+    corps = client.post('/api/calculer/batch', json={"eleves": eleves}).get_json()
+    resultats = corps["resultats"]
+
+    assert resultats[0]["moyenne"] == 12.0
+    assert resultats[1]["error"] == "Veuillez sélectionner au moins une matière"
+    assert resultats[2]["erreurs"][0]["champ"] == "eleves[2].matieres[0].note"
+    assert resultats[3] == {"id": 3, "error": "Données invalides"}
+    assert resultats[4]["error"] == "Données invalides"
+    assert (corps["meta"]["calcules"], corps["meta"]["erreurs"]) == (1, 4)
+
+
+def test_bareme_choisi(client):
+    eleves = [{"matieres": [{"nom": "Maths", "coefficient": 1, "note": note, "selectionnee": True}]}
+              for note in (8, 10.5, 19)]
+    corps = client.post('/api/calculer/batch', json={"eleves": eleves, "bareme": "ects"}).get_json()
+    assert [r["appreciation"] for r in corps["resultats"]] == ["F", "E", "A"]
+
+
+@pytest.mark.parametrize("corps", [
+    '{"eleves": {}}',
+    '[]',
+    '{"eleves": [], "bareme": "inconnu"}',
+    '{"eleves": [',
+], ids=["eleves_objet", "liste", "bareme_inconnu", "json_tronque"])
+def test_requete_refusee(client, corps):
+    reponse = client.post('/api/calculer/batch', data=corps, content_type='application/json')
+    assert reponse.status_code == 400
+    assert "error" in reponse.get_json()
@@ -0,0 +1,54 @@
+"""
+Calculs de moyennes : MatiereTable identique aux listes, annotations
+résolubles sans NumPy et notes cibles.
+"""
+
+import os
+import random
+import subprocess
+import sys
+import typing
+
+import pytest
+
+import calculs
+
+
+def test_annotations_resolues_sans_importer_numpy():
+    code = ("import sys, typing, calculs; typing.get_type_hints(calculs.NotesCibles); "
+            "sys.exit('numpy' in sys.modules)")
+    dossier = os.path.dirname(os.path.abspath(calculs.__file__))
+    assert subprocess.run([sys.executable, '-c', code], cwd=dossier).returncode == 0
+    assert set(typing.get_type_hints(calculs.NotesCibles)) == {
+        "cibles", "moyenne_actuelle", "atteignable", "note_uniforme", "note_min_par_matiere"
+    }
+
+
+def test_notes_cibles():
+    pytest.importorskip("numpy")
+    # Maths (coef 2) connue à 8 ; SVT (coef 1) et Philo (coef 1) restantes
+    resultat = calculs.calculer_notes_cibles([[8, 0, 0]], [2, 1, 1], [[True, False, False]],
+                                             cibles=[10, 20])
+
+    assert resultat.moyenne_actuelle.tolist() == [8.0]
+    assert resultat.atteignable.tolist() == [[True, False]]
+    assert resultat.note_uniforme[0, 0] == pytest.approx(12.0)
+    # Philo à 20 : SVT doit valoir au moins 4
+    assert resultat.note_min_par_matiere[0, 0].tolist()[1:] == pytest.approx([4.0, 4.0])
+
+
+def test_moyenne_d_une_table_identique_au_calcul_sur_liste():
+    rng = random.Random(2)
+    for _ in range(200):
+        taille = rng.randint(1, 12)
+        coefficients = [rng.choice([0.5, 1, 2, 3, 4, 5]) for _ in range(taille)]
+        notes = [round(rng.uniform(0, 20) * 4) / 4 for _ in range(taille)]
+        table = calculs.MatiereTable([f"m{i}" for i in range(taille)], coefficients, notes)
+        liste = [calculs.Matiere(m.nom, m.coefficient, m.note) for m in table]
+
+        assert calculs.calculer_moyenne(table) == calculs.calculer_moyenne(liste)
+
+
+def test_moyenne_d_une_table_vide():
+    assert calculs.calculer_moyenne(calculs.MatiereTable()) == 0.0
+    assert calculs.calculer_moyenne([]) == 0.0
@@ -0,0 +1,80 @@
+"""
+Catalogue des matières : versions partagées entre workers, mémoire bornée
+et coefficients refusés.
+"""
+
+import math
+
+import pytest
+
+from catalogue_matieres import CatalogueMatieres, ErreurCatalogue
+
+DEFAUT = [{"nom": "Maths", "coefficient": 4}, {"nom": "SVT", "coefficient": 5}]
+
+
+@pytest.fixture
+def catalogue(pool):
+    return CatalogueMatieres(pool.connexion, DEFAUT, intervalle=0)
+
+
+def test_matieres_par_defaut_puis_ajout(catalogue):
+    assert catalogue.lire("lycee").version == 0
+    assert catalogue.lire("lycee").vers_dicts() == DEFAUT
+
+    version = catalogue.ajouter("lycee", " Philo ", 2)
+
+    assert version.version == 1
+    assert [nom for nom, _ in version.matieres] == ["Maths", "SVT", "Philo"]
+    assert catalogue.lire("autre").version == 0
+    with pytest.raises(ErreurCatalogue, match="existe déjà"):
+        catalogue.ajouter("lycee", "PHILO", 3)
+
+
+def test_ajout_d_un_autre_worker_vu_apres_l_intervalle(pool, catalogue):
+    lent = CatalogueMatieres(pool.connexion, DEFAUT, intervalle=3600)
+    assert lent.lire("lycee").version == 0
+
+    catalogue.ajouter("lycee", "Philo", 2)
+
+    assert lent.lire("lycee").version == 0
+    lent.intervalle = 0
+    assert lent.lire("lycee").version == 1
+
+
+@pytest.mark.parametrize("coefficient", [0, -1, math.inf, math.nan, 10 ** 400, None, "2"])
+def test_coefficient_refuse(catalogue, coefficient):
+    with pytest.raises(ErreurCatalogue, match="coefficient"):
+        catalogue.ajouter("lycee", "Philo", coefficient)
+    assert catalogue.lire("lycee").version == 0
+
+
+def test_etablissements_en_memoire_bornes(pool):
+    catalogue = CatalogueMatieres(pool.connexion, DEFAUT, capacite=3)
+    catalogue.ajouter("lycee", "Philo", 2)
+    for numero in range(10):
+        catalogue.lire(f"inconnu-{numero}")
+
+    stats = catalogue.statistiques()
+    assert stats["etablissements"] == 3
+    assert stats["evictions"] == 8
+    # Un établissement évincé est relu en base
+    assert catalogue.lire("lycee").version == 1
+
+
+@pytest.mark.parametrize("corps", [
+    '{"nom": "Philo", "coefficient": 1e999}',
+    '{"nom": "Philo", "coefficient": NaN}',
+    '{"nom": "Philo", "coefficient": "abc"}',
+    '{"nom": "Philo", "coefficient": 0}',
+])
+def test_route_ajout_refuse_en_400(client, corps):
+    reponse = client.post('/api/ajouter-matiere', data=corps, content_type='application/json')
+    assert reponse.status_code == 400
+
+
+def test_route_liste_avec_etag(client):
+    client.post('/api/ajouter-matiere', json={"nom": "Philo", "coefficient": 2})
+    reponse = client.get('/api/matieres')
+    assert reponse.status_code == 200
+    assert "Philo" in [m["nom"] for m in reponse.get_json()]
+    assert client.get('/api/matieres', headers={'If-None-Match': reponse.headers['ETag']}).status_code == 304
@@ -0,0 +1,161 @@
+"""
+Classements : rang et percentile de l'arbre de Fenwick identiques à un tri
+complet après mises à jour et retraits, registre cohérent entre workers.
+"""
+
+import random
+
+import pytest
+
+from classement import Classement
+from registre_classements import RegistreClassements
+
+
+def _rang_attendu(moyennes, eleve):
+    return 1 + sum(1 for m in moyennes.values() if m > moyennes[eleve])
+
+
+def _percentile_attendu(moyennes, eleve):
+    return 100.0 * sum(1 for m in moyennes.values() if m <= moyennes[eleve]) / len(moyennes)
+
+
+def test_rang_et_percentile_apres_mises_a_jour():
+    rng = random.Random(8)
+    moyennes = {f"e{i}": round(rng.uniform(0, 20), 2) for i in range(50)}
+    classement = Classement.depuis_moyennes(moyennes)
+
+    for _ in range(500):
+        eleve = f"e{rng.randrange(70)}"
+        if eleve in moyennes and rng.random() < 0.2:
+            classement.retirer(eleve)
+            del moyennes[eleve]
+        else:
+            # Beaucoup d'égalités : les moyennes sont arrondies au demi-point
+            moyennes[eleve] = round(rng.uniform(0, 20) * 2) / 2
+            classement.mettre_a_jour(eleve, moyennes[eleve])
+
+        assert len(classement) == len(moyennes)
+        for autre in moyennes:
+            assert classement.rang(autre) == _rang_attendu(moyennes, autre)
+            assert classement.percentile(autre) == pytest.approx(_percentile_attendu(moyennes, autre))
+
+
+def test_egalites_et_meilleurs():
+    classement = Classement.depuis_moyennes({"a": 18, "b": 15.5, "c": 15.5, "d": 12, "e": 0})
+
+    assert [classement.rang(e) for e in "abcde"] == [1, 2, 2, 4, 5]
+    assert classement.percentile("e") == pytest.approx(20.0)
+    assert classement.percentile("b") == pytest.approx(80.0)
+    assert [(e, r) for e, _, r in classement.meilleurs(3)] in (
+        [("a", 1), ("b", 2), ("c", 2)], [("a", 1), ("c", 2), ("b", 2)]
+    )
+    assert len(classement.meilleurs(10)) == 5
+    assert classement.meilleurs(0) == []
+
+
+def test_precision_departage_les_moyennes():
+    classement = Classement.depuis_moyennes({"a": 12.004, "b": 12.0}, precision=2)
+    assert classement.rang("a") == classement.rang("b") == 1
+    classement = Classement.depuis_moyennes({"a": 12.01, "b": 12.0}, precision=2)
+    assert (classement.rang("a"), classement.rang("b")) == (1, 2)
+
+
+@pytest.mark.parametrize("moyenne", [-0.5, 20.01, float("nan")], ids=["negative", "au_dessus", "nan"])
+def test_moyenne_hors_bornes(moyenne):
+    classement = Classement()
+    with pytest.raises(ValueError, match="entre 0 et 20"):
+        classement.mettre_a_jour("a", moyenne)
+    with pytest.raises(ValueError):
+        Classement.depuis_moyennes({"a": moyenne})
+    assert len(classement) == 0
+
+
+def test_retirer_un_eleve_absent():
+    classement = Classement.depuis_moyennes({"a": 10})
+    with pytest.raises(KeyError):
+        classement.retirer("b")
+    classement.retirer("a")
+    assert "a" not in classement and len(classement) == 0
+
+
+# ============ Registre partagé ============
+
+def _position(eleve):
+    return lambda classement: (classement.rang(eleve), len(classement))
+
+
+def test_registre_voit_les_ecritures_d_un_autre_worker(pool):
+    premier = RegistreClassements(pool.connexion)
+    second = RegistreClassements(pool.connexion)
+
+    premier.mettre_a_jour("3A", "alice", 14)
+    premier.mettre_a_jour("3A", "bob", 11)
+    assert second.consulter("3A", _position("bob")) == (2, 2)
+
+    second.mettre_a_jour("3A", "chloe", 17)
+    assert premier.consulter("3A", _position("bob")) == (3, 3)
+    assert premier.retirer("3A", "chloe")
+    assert not premier.retirer("3A", "chloe")
+    assert second.consulter("3A", _position("alice")) == (1, 2)
+
+
+def test_registre_sans_rechargement_pour_ses_propres_ecritures(pool):
+    registre = RegistreClassements(pool.connexion)
+    registre.mettre_a_jour("3A", "alice", 14)
+    rechargements = registre.rechargements
+    for numero in range(20):
+        registre.mettre_a_jour("3A", f"e{numero}", numero)
+        registre.consulter("3A", len)
+
+    assert registre.rechargements == rechargements
+    # Un registre neuf reconstruit le classement depuis la base
+    assert RegistreClassements(pool.connexion).consulter("3A", _position("alice")) == (6, 21)
+
+
+def test_registre_classe_inconnue_ou_videe(pool):
+    registre = RegistreClassements(pool.connexion)
+    assert registre.consulter("inconnue", len) is None
+    assert registre.statistiques()["classes"] == 0
+
+    registre.mettre_a_jour("3A", "alice", 14)
+    registre.retirer("3A", "alice")
+    assert registre.consulter("3A", len) is None
+    with pytest.raises(ValueError):
+        registre.mettre_a_jour("3A", "alice", 21)
+
+
+# ============ Routes ============
+
+def test_routes_classement(client):
+    for eleve, moyenne in (("alice", 14), ("bob", 11), ("chloe", 14)):
+        reponse = client.put(f'/api/classements/3A/eleves/{eleve}', json={"moyenne": moyenne})
+        assert reponse.status_code == 200
+
+    assert client.get('/api/classements/3A/eleves/bob').get_json() == {
+        "eleve": "bob", "moyenne": 11.0, "rang": 3, "percentile": pytest.approx(33.3), "effectif": 3
+    }
+    corps = client.get('/api/classements/3A?k=2').get_json()
+    assert corps["effectif"] == 3
+    assert sorted((e["eleve"], e["rang"]) for e in corps["meilleurs"]) == [("alice", 1), ("chloe", 1)]
+
+    matieres = [{"nom": "Maths", "coefficient": 2, "note": 18, "selectionnee": True},
+                {"nom": "SVT", "coefficient": 1, "note": 15, "selectionnee": True}]
+    position = client.put('/api/classements/3A/eleves/bob', json={"matieres": matieres}).get_json()
+    assert (position["moyenne"], position["rang"]) == (17.0, 1)
+
+    assert client.delete('/api/classements/3A/eleves/bob').get_json() == {"success": True}
+    assert client.delete('/api/classements/3A/eleves/bob').status_code == 404
+    assert client.get('/api/classements/3A/eleves/bob').status_code == 404
+
+
+@pytest.mark.parametrize("corps", [
+    {"moyenne": 25},
+    {"moyenne": "abc"},
+    {},
+    {"matieres": [{"nom": "Maths", "coefficient": 1, "note": 12, "selectionnee": False}]},
+], ids=["hors_bornes", "texte", "vide", "aucune_matiere"])
+def test_classer_refuse(client, corps):
+    reponse = client.put('/api/classements/3A/eleves/alice', json=corps)
+    assert reponse.status_code == 400
+    assert "error" in reponse.get_json()
+    assert client.get('/api/classements/3A').status_code == 404
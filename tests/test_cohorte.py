@@ -0,0 +1,143 @@
+"""
+calculateur-cohorte : une ligne sans matière ou invalide donne une ligne
+d'erreur, en flux comme en parallèle, sans interrompre le traitement ; le
+découpage en fragments (--jobs) lit chaque ligne une seule fois.
+"""
+
+import csv
+import io
+import json
+
+import pytest
+
+import cohorte
+
+COEFFICIENTS = {"Maths": 4.0, "SVT": 5.0}
+
+
+def _csv(texte: str) -> list:
+    sortie = io.StringIO()
+    bilan = cohorte.traiter_csv(io.StringIO(texte), sortie, COEFFICIENTS)
+    return bilan, list(csv.DictReader(io.StringIO(sortie.getvalue())))
+
+
+def _jsonl(*lignes: str) -> list:
+    sortie = io.StringIO()
+    bilan = cohorte.traiter_jsonl(io.StringIO(''.join(l + '\n' for l in lignes)), sortie)
+    return bilan, [json.loads(l) for l in sortie.getvalue().splitlines()]
+
+
+def test_csv_eleve_sans_note_en_erreur():
+    bilan, lignes = _csv("eleve,Maths,SVT\nA,12,14\nB,,\nC,\"8,5\",\n")
+
+    assert (bilan.lignes, bilan.calculees, bilan.erreurs) == (3, 2, 1)
+    assert lignes[0]["moyenne"] == "13.11"
+    assert lignes[1]["moyenne"] == ""
+    assert lignes[1]["erreur"] == cohorte.ERREUR_AUCUNE_MATIERE
+    assert lignes[2]["moyenne"] == "8.50"
+
+
+def test_csv_note_invalide_en_erreur():
+    bilan, lignes = _csv("eleve,Maths,SVT\nA,douze,14\n")
+    assert bilan.erreurs == 1
+    assert "Note invalide pour Maths" in lignes[0]["erreur"]
+
+
+@pytest.mark.parametrize("ligne", [
+    '{"eleve": "B", "matieres": []}',
+    '{"eleve": "B", "matieres": [{"nom": "Maths", "coefficient": 4, "note": 12, "selectionnee": false}]}',
+], ids=["aucune_matiere", "aucune_selectionnee"])
+def test_jsonl_eleve_sans_matiere_en_erreur(ligne):
+    bilan, objets = _jsonl('{"matieres": [{"nom": "Maths", "coefficient": 4, "note": 12}]}', ligne)
+
+    assert (bilan.calculees, bilan.erreurs) == (1, 1)
+    assert objets[0]["moyenne"] == 12.0
+    assert objets[1]["erreur"] == cohorte.ERREUR_AUCUNE_MATIERE
+    assert "moyenne" not in objets[1]
+
+
+def test_jsonl_ligne_non_json_recopiee():
+    bilan, objets = _jsonl('{pas du json')
+    assert bilan.erreurs == 1
+    assert objets[0]["ligne"] == '{pas du json'
+    assert objets[0]["erreur"].startswith("JSON invalide")
+
+
+@pytest.mark.parametrize("format_fichier", ["csv", "jsonl"])
+def test_parallele_identique_au_flux(tmp_path, format_fichier):
+    if format_fichier == "csv":
+        # BOM en tête, comme un export Excel
+        contenu = "\ufeffeleve,Maths,SVT\n" + ''.join(
+            f"e{i},{i % 21},{'' if i % 7 == 0 else (i * 3) % 21}\n" for i in range(300)
+        ) + "vide,,\n"
+    else:
+        contenu = ''.join(
+            json.dumps({"eleve": i, "matieres": [{"nom": "Maths", "coefficient": 4, "note": i % 21}]
+                        if i % 11 else []}) + '\n'
+            for i in range(300)
+        )
+    chemin = tmp_path / f"notes.{format_fichier}"
+    chemin.write_text(contenu, encoding='utf-8')
+
+    sequentielle = io.StringIO()
+    with open(chemin, encoding='utf-8-sig', newline='') as entree:
+        if format_fichier == "csv":
+            attendu = cohorte.traiter_csv(entree, sequentielle, COEFFICIENTS)
+        else:
+            attendu = cohorte.traiter_jsonl(entree, sequentielle)
+    parallele = io.StringIO()
+    bilan = cohorte.traiter_en_parallele(str(chemin), parallele, format_fichier, COEFFICIENTS, jobs=3)
+
+    assert parallele.getvalue() == sequentielle.getvalue()
+    assert (bilan.lignes, bilan.erreurs) == (attendu.lignes, attendu.erreurs)
+    assert bilan.erreurs > 0
+    assert parallele.getvalue().startswith("eleve," if format_fichier == "csv" else "{")
+
+
+def test_chaque_ligne_lue_par_un_seul_fragment(tmp_path):
+    contenu = "".join(f"ligne {i} {'x' * (i % 7)}\n" for i in range(40)).encode()
+    chemin = tmp_path / "lignes.txt"
+    chemin.write_bytes(contenu)
+    attendu = contenu.decode().splitlines(keepends=True)
+
+    with open(chemin, 'rb') as fichier:
+        # Toutes les coupures possibles, y compris au milieu d'une ligne
+        for coupure in range(len(contenu) + 1):
+            lues = list(cohorte._lignes_plage(fichier, 0, coupure)) + \
+                list(cohorte._lignes_plage(fichier, coupure, len(contenu)))
+            assert lues == attendu, coupure
+    for nombre in (1, 3, 7):
+        plages = cohorte.decouper_plages(5, 105, nombre)
+        assert plages[0][0] == 5 and plages[-1][1] == 105
+        assert all(a[1] == b[0] for a, b in zip(plages, plages[1:]))
+
+
+def test_ligne_de_commande_jobs_identique_au_flux(tmp_path, capsys):
+    chemin = tmp_path / "notes.csv"
+    chemin.write_text("eleve;Maths;SVT\n" + "".join(f"e{i};{i % 21};{(i * 7) % 21}\n" for i in range(200)),
+                      encoding='utf-8')
+    sorties = []
+    for jobs in ("1", "2"):
+        sortie = tmp_path / f"sortie-{jobs}.csv"
+        code = cohorte.main([str(chemin), "-o", str(sortie), "--separateur", ";", "--coef", "Maths=4",
+                             "--coef", "SVT=5", "--jobs", jobs, "--bareme", "ects"])
+        assert code == 0
+        sorties.append(sortie.read_text(encoding='utf-8'))
+
+    assert sorties[0] == sorties[1]
+    assert sorties[0].splitlines()[0] == "eleve;Maths;SVT;moyenne;appreciation;erreur"
+    assert "200 élèves, 200 moyennes, 0 erreurs" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("arguments, message", [
+    (["-", "--coef", "Maths=4", "--jobs", "2"], "--jobs nécessite un fichier"),
+    (["notes.csv", "--coef", "Maths=4", "--jobs", "0"], "--jobs doit être positif"),
+    (["notes.csv", "--coef", "Philo=2", "--jobs", "2"], "Colonnes absentes du fichier: Philo"),
+    (["notes.csv"], "au moins une colonne"),
+], ids=["jobs_sans_fichier", "jobs_nul", "colonne_absente", "sans_coefficient"])
+def test_ligne_de_commande_refusee(tmp_path, monkeypatch, capsys, arguments, message):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "notes.csv").write_text("eleve,Maths\nA,12\n", encoding='utf-8')
+
+    assert cohorte.main(arguments) == 2
+    assert message in capsys.readouterr().err
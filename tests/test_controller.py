@@ -0,0 +1,93 @@
+"""
+Contrôleur Tkinter : moyenne en direct, saisie hors de [0, 20] signalée et
+réinitialisation de l'accumulateur avec l'affichage (sans fenêtre).
+"""
+
+import pytest
+
+pytest.importorskip("tkinter")
+
+from calculs import MoyenneIncrementale  # noqa: E402
+from controller import CalculateurMoyenneController  # noqa: E402
+
+
+class _Variable:
+    def __init__(self, valeur):
+        self.valeur = valeur
+
+    def get(self):
+        return self.valeur
+
+    def set(self, valeur):
+        self.valeur = valeur
+
+
+class _Matiere:
+    """Matière sans Tk : note lue comme models.matiere.Matiere.note."""
+
+    def __init__(self, nom, coefficient, note="0.0"):
+        self.nom = nom
+        self.coefficient = coefficient
+        self.default_note = 0.0
+        self.note_var = _Variable(note)
+        self.var = _Variable(True)
+
+    @property
+    def note(self):
+        try:
+            return float(self.note_var.get())
+        except ValueError:
+            return 0.0
+
+
+class _Fenetre:
+    def __init__(self):
+        self.affichages = []
+
+    def afficher_resultat(self, moyenne, est_moyenne_generale=False):
+        self.affichages.append(moyenne)
+
+    def afficher_erreur(self, message):
+        self.affichages.append(message)
+
+
+@pytest.fixture
+def controleur():
+    controleur = CalculateurMoyenneController.__new__(CalculateurMoyenneController)
+    controleur.matieres = [_Matiere("Maths", 4, "12"), _Matiere("SVT", 2, "18")]
+    controleur.main_window = _Fenetre()
+    controleur.accumulateur = MoyenneIncrementale()
+    controleur._matieres_par_variable = {}
+    for numero, matiere in enumerate(controleur.matieres):
+        controleur.accumulateur.definir(id(matiere), matiere.coefficient, matiere.note)
+        controleur._matieres_par_variable[f"note{numero}"] = matiere
+    return controleur
+
+
+def _saisir(controleur, numero, texte):
+    controleur.matieres[numero].note_var.set(texte)
+    controleur.on_note_change(f"note{numero}")
+
+
+def test_moyenne_en_direct(controleur):
+    _saisir(controleur, 1, "6")
+    assert controleur.main_window.affichages[-1] == pytest.approx(10.0)
+
+
+@pytest.mark.parametrize("texte", ["25", "-1", "nan", "inf"])
+def test_note_hors_bornes_signalee_sans_etre_comptee(controleur, texte):
+    _saisir(controleur, 1, texte)
+
+    assert "Note invalide pour SVT" in controleur.main_window.affichages[-1]
+    assert controleur.accumulateur.moyenne == pytest.approx(14.0)
+    _saisir(controleur, 1, "6")
+    assert controleur.main_window.affichages[-1] == pytest.approx(10.0)
+
+
+def test_reinitialisation_de_l_accumulateur_et_de_l_affichage(controleur):
+    controleur.matieres[1].default_note = 9.0
+    controleur.reinitialiser_notes()
+
+    assert [m.note_var.get() for m in controleur.matieres] == ["0.0", "9.0"]
+    assert controleur.accumulateur.moyenne == pytest.approx(3.0)
+    assert controleur.main_window.affichages[-1] == pytest.approx(3.0)
@@ -0,0 +1,84 @@
+"""
+Une ligne d'historique invalide ne doit bloquer ni les autres lignes de son
+lot, ni le thread d'écriture, ni l'arrêt du processus.
+"""
+
+import threading
+
+import pytest
+
+from ecriture_historique import EcrivainHistorique
+
+
+@pytest.fixture
+def pool(pool):
+    with pool.connexion() as conn:
+        conn.execute("INSERT INTO profils (nom) VALUES ('p')")
+        conn.commit()
+    return pool
+
+
+def _moyennes(pool):
+    with pool.connexion() as conn:
+        return sorted(ligne[0] for ligne in conn.execute('SELECT moyenne FROM historique'))
+
+
+def test_groupee_seul_l_appelant_fautif_echoue(pool):
+    ecrivain = EcrivainHistorique(pool, durabilite="groupee", taille_lot=4, delai_max=0.5)
+    depart = threading.Barrier(4)
+    erreurs = {}
+
+    def ajouter(moyenne):
+        depart.wait()
+        try:
+            ecrivain.ajouter(1, moyenne)
+        except Exception as e:
+            erreurs[repr(moyenne)] = e
+
+    threads = [threading.Thread(target=ajouter, args=(m,)) for m in (10.0, 12.0, [1, 2], 14.0)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    ecrivain.arreter()
+
+    assert list(erreurs) == ['[1, 2]']
+    assert _moyennes(pool) == [10.0, 12.0, 14.0]
+    assert ecrivain.statistiques()["lignes_rejetees"] == 1
+
+
+def test_differee_ligne_rejetee_sans_boucle_ni_blocage(pool):
+    ecrivain = EcrivainHistorique(pool, durabilite="differee", taille_lot=3, delai_max=0.01)
+    for moyenne in (10.0, {"x": 1}, 12.0):
+        ecrivain.ajouter(1, moyenne)
+
+    arret = threading.Thread(target=ecrivain.arreter)
+    arret.start()
+    arret.join(5)
+
+    assert not arret.is_alive()
+    assert _moyennes(pool) == [10.0, 12.0]
+    stats = ecrivain.statistiques()
+    assert stats["lignes_rejetees"] == 1
+    assert stats["profondeur_file"] == 0
+    # Un seul lot en échec : la ligne n'est pas retentée en boucle
+    assert stats["erreurs"] == 1
+
+
+@pytest.mark.parametrize("moyenne", [[1], {"a": 1}, "12", True, 1e999, 10 ** 400],
+                         ids=["liste", "objet", "texte", "booleen", "infini", "entier_enorme"])
+def test_route_refuse_une_moyenne_non_numerique(moyenne, monkeypatch, tmp_path):
+    web_app = pytest.importorskip("web_app")
+    monkeypatch.setattr(web_app, "DB_FILE", str(tmp_path / "profils.db"))
+    ajouts = []
+    monkeypatch.setattr(web_app, "obtenir_ecrivain_historique",
+                        lambda: type("E", (), {"ajouter": lambda self, *a: ajouts.append(a)})())
+
+    client = web_app.app.test_client()
+    # 1e999 est envoyé tel quel (Infinity n'est pas du JSON standard)
+    corps = '{"profil_id": 1, "moyenne": %s}' % (
+        "Infinity" if moyenne == 1e999 else web_app.json.dumps(moyenne))
+    reponse = client.post('/api/historique', data=corps, content_type='application/json')
+
+    assert reponse.status_code == 400
+    assert ajouts == []
@@ -0,0 +1,125 @@
+"""
+Pagination de l'historique par curseur : toutes les entrées, une seule fois,
+dans l'ordre, même quand plusieurs calculs partagent la même date.
+"""
+
+import base64
+import json
+import sqlite3
+
+import pytest
+
+from base_donnees import (
+    MIGRATIONS, SCHEMA_INITIAL, decoder_curseur, encoder_curseur, initialiser_schema, lire_page_historique
+)
+
+
+def _remplir(conn, profil_id, dates):
+    conn.executemany(
+        'INSERT INTO historique (profil_id, moyenne, date_calcul) VALUES (?, ?, ?)',
+        [(profil_id, numero % 21, date) for numero, date in enumerate(dates)]
+    )
+    conn.commit()
+
+
+def _parcourir(lire_page):
+    entrees, curseur, pages = [], None, 0
+    while True:
+        page, curseur = lire_page(curseur)
+        entrees.extend(page)
+        pages += 1
+        if curseur is None:
+            return entrees, pages
+
+
+@pytest.mark.parametrize("limite", [1, 3, 6, 7, 40], ids=["une", "trois", "six", "sept", "tout"])
+def test_parcours_complet(pool, limite):
+    # Cinq entrées par seconde : la date seule ne suffit pas à départager
+    dates = [f"2024-01-01 10:00:{seconde:02d}" for seconde in range(6) for _ in range(5)]
+    with pool.connexion() as conn:
+        _remplir(conn, 1, dates)
+        _remplir(conn, 2, dates[:4])
+        entrees, pages = _parcourir(lambda curseur: lire_page_historique(conn, 1, limite, curseur))
+        attendues = conn.execute(
+            'SELECT id FROM historique WHERE profil_id = 1 ORDER BY date_calcul DESC, id DESC'
+        ).fetchall()
+
+    assert [e["id"] for e in entrees] == [ligne[0] for ligne in attendues]
+    # Pas de page vide à la fin, même quand la dernière page est pleine
+    assert pages == -(-len(dates) // limite)
+
+
+def test_historique_vide(pool):
+    with pool.connexion() as conn:
+        assert lire_page_historique(conn, 1, 10) == ([], None)
+
+
+def test_curseur_aller_retour():
+    assert decoder_curseur(encoder_curseur("2024-01-01 10:00:00", 42)) == ("2024-01-01 10:00:00", 42)
+
+
+def _curseur_brut(valeur):
+    return base64.urlsafe_b64encode(json.dumps(valeur).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize("curseur", [
+    "pas-un-curseur!",
+    _curseur_brut(["2024-01-01", "42"]),
+    _curseur_brut([20240101, 42]),
+    _curseur_brut(["2024-01-01", True]),
+    _curseur_brut(["2024-01-01"]),
+    _curseur_brut({"date": "2024-01-01", "id": 42}),
+], ids=["base64", "id_texte", "date_nombre", "id_booleen", "incomplet", "objet"])
+def test_curseur_invalide(curseur):
+    with pytest.raises(ValueError, match="Curseur invalide"):
+        decoder_curseur(curseur)
+
+
+def test_index_ajoute_a_une_base_migree_avant_lui(tmp_path):
+    # Base restée à la première migration (matières normalisées, sans index)
+    chemin = str(tmp_path / "profils.db")
+    conn = sqlite3.connect(chemin)
+    for instruction in SCHEMA_INITIAL:
+        conn.execute(instruction)
+    MIGRATIONS[0](conn)
+    conn.execute('PRAGMA user_version = 1')
+    conn.commit()
+    conn.close()
+
+    assert initialiser_schema(chemin)
+    conn = sqlite3.connect(chemin)
+    plan = ' '.join(ligne[-1] for ligne in conn.execute(
+        'EXPLAIN QUERY PLAN SELECT id FROM historique WHERE profil_id = 1 '
+        'ORDER BY date_calcul DESC, id DESC LIMIT 10'
+    ))
+    assert 'idx_historique_profil_date' in plan and 'TEMP B-TREE' not in plan
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(MIGRATIONS)
+    conn.close()
+
+
+# ============ Routes ============
+
+def test_route_suit_le_curseur_suivant(client):
+    for moyenne in range(12):
+        assert client.post('/api/historique', json={"profil_id": 1, "moyenne": moyenne}).status_code == 200
+
+    moyennes, url = [], '/api/historique/1?limite=5'
+    while url:
+        reponse = client.get(url)
+        assert reponse.status_code == 200
+        moyennes.extend(e["moyenne"] for e in reponse.get_json())
+        suivant = reponse.headers.get('X-Curseur-Suivant')
+        url = f'/api/historique/1?limite=5&apres={suivant}' if suivant else None
+        if suivant:
+            assert f'apres={suivant}>; rel="next"' in reponse.headers['Link']
+
+    # Même date pour tous les calculs : l'id garde l'ordre d'insertion
+    assert moyennes == list(range(11, -1, -1))
+
+
+@pytest.mark.parametrize("curseur", ["!!", _curseur_brut(["2024-01-01", "1 OR 1=1"])],
+                         ids=["illisible", "id_texte"])
+def test_route_curseur_invalide(client, curseur):
+    reponse = client.get(f'/api/historique/1?apres={curseur}')
+    assert reponse.status_code == 400
+    assert reponse.get_json() == {"error": "Curseur invalide"}
@@ -0,0 +1,112 @@
+"""
+Métriques Prometheus : seaux cumulés (« le » inclus), phases comptées une
+fois par requête, erreurs par type et une série par route déclarée.
+"""
+
+import re
+
+import pytest
+
+from metriques import Histogramme, Metriques
+
+
+def _series(texte):
+    """Lignes d'échantillons du format texte : {nom{étiquettes}: valeur}."""
+    series = {}
+    for ligne in texte.splitlines():
+        if ligne and not ligne.startswith('#'):
+            nom, valeur = ligne.rsplit(' ', 1)
+            series[nom] = float(valeur)
+    return series
+
+
+def test_seau_inclut_sa_borne():
+    histogramme = Histogramme((0.1, 1.0))
+    for valeur in (0.05, 0.1, 0.5, 1.0, 3.0):
+        histogramme.observer(valeur)
+    assert histogramme.compteurs == [2, 2, 1]
+    assert (histogramme.nombre, histogramme.somme) == (5, pytest.approx(4.65))
+
+
+def test_export_cumule_les_seaux():
+    metriques = Metriques(bornes=(0.5, 0.001))
+    for _ in range(3):
+        metriques.debut_requete()
+        with metriques.mesurer('compute'):
+            pass
+        metriques.fin_requete('/api/calculer', 'POST', 200)
+    metriques.debut_requete()
+    metriques.fin_requete('/api/calculer', 'POST', 400)
+
+    series = _series(metriques.exposer())
+    prefixe = 'calculateur_requete_duree_secondes'
+    seaux = [series[f'{prefixe}_bucket{{route="/api/calculer",le="{le}"}}']
+             for le in ('0.001', '0.5', '+Inf')]
+    assert seaux == sorted(seaux) and seaux[-1] == 4
+    assert series[f'{prefixe}_count{{route="/api/calculer"}}'] == 4
+    assert series['calculateur_phase_duree_secondes_count{route="/api/calculer",phase="compute"}'] == 3
+    assert series['calculateur_requetes_total{route="/api/calculer",methode="POST",code="200"}'] == 3
+    assert series['calculateur_erreurs_total{route="/api/calculer",type="client"}'] == 1
+    assert 'process_cpu_seconds_total' in series
+
+
+def test_phase_imbriquee_comptee_une_fois():
+    metriques = Metriques()
+    metriques.debut_requete()
+    with metriques.mesurer('sqlite'):
+        with metriques.mesurer('sqlite'):
+            pass
+    metriques.fin_requete('/r', 'GET', 200)
+    assert metriques._phases[('/r', 'sqlite')].nombre == 1
+
+
+def test_hors_requete_ou_inactif():
+    metriques = Metriques()
+    with metriques.mesurer('compute'):
+        pass
+    metriques.fin_requete('/r', 'GET', 200)
+    inactif = Metriques(actif=False)
+    inactif.debut_requete()
+    with inactif.mesurer('compute'):
+        pass
+    inactif.fin_requete('/r', 'GET', 200)
+    assert metriques._requetes == inactif._requetes == {}
+
+
+def test_etiquettes_echappees():
+    metriques = Metriques()
+    metriques.debut_requete()
+    metriques.fin_requete('/a"b\\c\nd', 'GET', 500)
+    assert 'route="/a\\"b\\\\c\\nd",type="serveur"' in metriques.exposer()
+
+
+# ============ Routes ============
+
+@pytest.fixture
+def metriques_app(web_app, monkeypatch):
+    metriques = Metriques()
+    monkeypatch.setattr(web_app, "METRIQUES", metriques)
+    return metriques
+
+
+def test_route_metrics(client, metriques_app):
+    client.post('/api/calculer', json={"matieres": [
+        {"nom": "Maths", "coefficient": 2, "note": 12, "selectionnee": True}
+    ]})
+    client.post('/api/calculer', json={"matieres": [
+        {"nom": "Maths", "coefficient": 2, "note": 25, "selectionnee": True}
+    ]})
+    for profil_id in (1, 2, 3):
+        client.get(f'/api/profils/{profil_id}')
+
+    reponse = client.get('/metrics')
+    assert reponse.mimetype == 'text/plain'
+    series = _series(reponse.get_data(as_text=True))
+
+    assert series['calculateur_requetes_total{route="/api/calculer",methode="POST",code="200"}'] == 1
+    assert series['calculateur_requetes_total{route="/api/calculer",methode="POST",code="400"}'] == 1
+    # Une série par route déclarée, pas par identifiant
+    assert series['calculateur_requetes_total'
+                  '{route="/api/profils/<int:profil_id>",methode="GET",code="404"}'] == 3
+    phases = {m.group(1) for m in re.finditer(r'phase="(\w+)"', reponse.get_data(as_text=True))}
+    assert {"decode", "validate", "compute", "sqlite", "serialize"} <= phases
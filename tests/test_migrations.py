@@ -0,0 +1,110 @@
+"""
+Migrations du schéma : une base créée par l'ancienne version (matières en
+JSON dans profils.donnees) est migrée sans perte, une seule fois.
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+from base_donnees import (
+    MIGRATIONS, SCHEMA_INITIAL, ecrire_matieres_profil, initialiser_schema, lire_matieres_profil
+)
+
+MATIERES = [
+    {"nom": "Maths", "coefficient": 4, "note": 12.5, "selectionnee": True},
+    {"nom": "Philo", "coefficient": 2.5, "note": "14", "selectionnee": False, "couleur": "#f00"},
+    {"nom": "SVT"},
+    "pas une matière",
+]
+
+
+def _base_initiale(chemin, profils):
+    """Base au format d'origine : user_version 0, colonne profils.donnees."""
+    conn = sqlite3.connect(chemin)
+    for instruction in SCHEMA_INITIAL:
+        conn.execute(instruction)
+    for nom, donnees in profils:
+        conn.execute('INSERT INTO profils (nom, donnees) VALUES (?, ?)', (nom, donnees))
+    conn.execute("INSERT INTO historique (profil_id, moyenne) VALUES (1, 12.0)")
+    conn.commit()
+    conn.close()
+
+
+def _connexion(chemin):
+    conn = sqlite3.connect(chemin)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def test_base_initiale_migree(tmp_path):
+    chemin = str(tmp_path / "ancienne.db")
+    _base_initiale(chemin, [("Terminale", json.dumps(MATIERES)), ("Vide", "[]"),
+                            ("Corrompu", "{pas du json"), ("Objet", '{"nom": "Maths"}')])
+
+    assert initialiser_schema(chemin)
+
+    with _connexion(chemin) as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == len(MIGRATIONS)
+        colonnes = [ligne['name'] for ligne in conn.execute('PRAGMA table_info(profils)')]
+        assert colonnes == ['id', 'nom', 'date_creation', 'date_modification']
+        assert [ligne['nom'] for ligne in conn.execute('SELECT nom FROM profils ORDER BY id')] == [
+            "Terminale", "Vide", "Corrompu", "Objet"
+        ]
+        assert lire_matieres_profil(conn, 1) == MATIERES
+        for profil_id in (2, 3, 4):
+            assert lire_matieres_profil(conn, profil_id) == []
+        historique = conn.execute('SELECT profil_id, moyenne FROM historique').fetchall()
+        assert [tuple(ligne) for ligne in historique] == [(1, 12.0)]
+        tables = {ligne[0] for ligne in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"catalogue_matieres", "classement_moyennes", "cache_versions"} <= tables
+
+
+def test_migration_idempotente(tmp_path):
+    chemin = str(tmp_path / "ancienne.db")
+    _base_initiale(chemin, [("Terminale", json.dumps(MATIERES))])
+    assert initialiser_schema(chemin)
+
+    with _connexion(chemin) as conn:
+        ecrire_matieres_profil(conn, 1, MATIERES[:2])
+    # Une base à jour n'est pas migrée une seconde fois
+    assert not initialiser_schema(chemin)
+    with _connexion(chemin) as conn:
+        assert lire_matieres_profil(conn, 1) == MATIERES[:2]
+
+
+def test_base_neuve(chemin_base):
+    with _connexion(chemin_base) as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == len(MIGRATIONS)
+        assert conn.execute('SELECT COUNT(*) FROM profil_matieres').fetchone()[0] == 0
+
+
+def test_migration_en_echec_annulee(tmp_path, monkeypatch):
+    chemin = str(tmp_path / "ancienne.db")
+    _base_initiale(chemin, [("Terminale", json.dumps(MATIERES))])
+
+    def echec(conn):
+        raise sqlite3.OperationalError("échec volontaire")
+
+    monkeypatch.setattr("base_donnees.MIGRATIONS", MIGRATIONS[:1] + [echec])
+    with pytest.raises(sqlite3.OperationalError):
+        initialiser_schema(chemin)
+
+    # Rien n'a été appliqué : la colonne donnees et user_version sont intacts
+    with _connexion(chemin) as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == 0
+        assert json.loads(conn.execute('SELECT donnees FROM profils').fetchone()[0]) == MATIERES
+
+
+# ============ Routes ============
+
+def test_profil_migre_servi_par_l_api(client, web_app):
+    _base_initiale(web_app.DB_FILE, [("Terminale", json.dumps(MATIERES[:2]))])
+
+    assert client.get('/api/profils/1').get_json()["matieres"] == MATIERES[:2]
+    assert client.get('/api/profils/1?champs=nom,note').get_json()["matieres"] == [
+        {"nom": "Maths", "note": 12.5}, {"nom": "Philo", "note": "14"}
+    ]
+    assert client.put('/api/profils/1', json={"matieres": MATIERES[:1]}).status_code == 200
+    assert client.get('/api/profils/1').get_json()["matieres"] == MATIERES[:1]
@@ -0,0 +1,106 @@
+"""
+Pool de connexions SQLite : WAL, réutilisation, emprunts imbriqués, taille
+bornée et transaction laissée ouverte annulée au retour.
+"""
+
+import threading
+
+import pytest
+
+from base_donnees import PoolSQLite
+
+
+def test_connexion_en_wal_et_reutilisee(pool):
+    with pool.connexion() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+        premiere = conn
+    with pool.connexion() as conn:
+        assert conn is premiere
+
+    stats = pool.statistiques()
+    assert (stats["emprunts"], stats["creations"], stats["reutilisations"]) == (2, 1, 1)
+    assert (stats["ouvertes"], stats["inactives"], stats["empruntees"]) == (1, 1, 0)
+
+
+def test_emprunt_imbrique_meme_connexion(pool):
+    with pool.connexion() as exterieure:
+        with pool.connexion() as interieure:
+            assert interieure is exterieure
+        # Le bloc intérieur ne rend pas la connexion encore utilisée
+        assert pool.statistiques()["empruntees"] == 1
+    assert pool.statistiques()["emprunts"] == 1
+
+
+def test_transaction_ouverte_annulee_au_retour(pool):
+    with pytest.raises(RuntimeError):
+        with pool.connexion() as conn:
+            conn.execute("INSERT INTO profils (nom) VALUES ('brouillon')")
+            raise RuntimeError("échec du traitement")
+
+    with pool.connexion() as conn:
+        assert not conn.in_transaction
+        assert conn.execute('SELECT COUNT(*) FROM profils').fetchone()[0] == 0
+
+
+def test_taille_bornee(chemin_base):
+    pool = PoolSQLite(chemin_base, taille=2, attente_max=0.2)
+    liberer = threading.Event()
+    empruntees = threading.Barrier(3)
+
+    def detenir():
+        with pool.connexion():
+            empruntees.wait()
+            liberer.wait()
+
+    threads = [threading.Thread(target=detenir) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    try:
+        empruntees.wait()
+        with pytest.raises(TimeoutError):
+            with pool.connexion():
+                pass
+        assert pool.statistiques()["ouvertes"] == 2
+    finally:
+        liberer.set()
+        for thread in threads:
+            thread.join()
+
+    # Une place rendue sert l'emprunt suivant sans nouvelle connexion
+    with pool.connexion():
+        pass
+    stats = pool.statistiques()
+    assert (stats["creations"], stats["reutilisations"]) == (2, 1)
+    pool.fermer()
+
+
+def test_attente_d_une_connexion_rendue(chemin_base):
+    pool = PoolSQLite(chemin_base, taille=1, attente_max=5)
+    rendue = threading.Event()
+
+    def emprunter():
+        with pool.connexion():
+            rendue.set()
+
+    with pool.connexion():
+        thread = threading.Thread(target=emprunter)
+        thread.start()
+        assert not rendue.wait(0.1)
+    thread.join(5)
+    assert rendue.is_set()
+    assert pool.statistiques()["attentes"] == 1
+    pool.fermer()
+
+
+def test_pool_ferme(chemin_base):
+    pool = PoolSQLite(chemin_base, taille=2)
+    with pool.connexion() as conn:
+        pool.fermer()
+    # Connexion fermée à son retour, nouvel emprunt refusé
+    with pytest.raises(Exception):
+        conn.execute('SELECT 1')
+    assert pool.statistiques()["ouvertes"] == 0
+    with pytest.raises(RuntimeError, match="fermé"):
+        with pool.connexion():
+            pass
@@ -0,0 +1,104 @@
+"""
+Profilage : captures écrites et tournantes, verrou de cProfile rendu même
+si la requête lève, liste des captures fermée sans jeton configuré.
+"""
+
+import os
+
+import pytest
+
+from profilage import Profileur
+
+
+@pytest.fixture
+def profileur(tmp_path):
+    return Profileur(str(tmp_path / "captures"), jeton="secret", maximum=3)
+
+
+def test_jeton():
+    assert Profileur("x", jeton="secret").jeton_valide("secret")
+    assert not Profileur("x", jeton="secret").jeton_valide("autre")
+    assert not Profileur("x", jeton="secret").jeton_valide("sécret")
+    assert not Profileur("x").jeton_valide("")
+
+
+def test_requete_non_retenue_sans_jeton_ni_mode_actif(profileur):
+    assert profileur.demarrer(None) is None
+    assert profileur.demarrer("faux") is None
+
+
+def test_capture_ecrite_puis_rotation(profileur):
+    noms = []
+    for numero in range(5):
+        capture = profileur.demarrer("secret")
+        sum(range(1000 * (numero + 1)))
+        noms.append(profileur.terminer(capture, f"/api/route{numero}", "GET", 200))
+
+    fichiers = sorted(os.listdir(profileur.dossier))
+    assert fichiers == sorted(n + ext for n in noms[2:] for ext in ('.json', '.prof'))
+    captures = profileur.plus_lentes()
+    assert {c["nom"] for c in captures} == set(noms[2:])
+    durees = [c["duree_ms"] for c in captures]
+    assert durees == sorted(durees, reverse=True)
+    assert [c["route"] for c in profileur.plus_lentes(route="/api/route3")] == ["/api/route3"]
+
+
+def test_echantillons_quand_cprofile_est_occupe(profileur):
+    premiere = profileur.demarrer("secret")
+    seconde = profileur.demarrer("secret")
+    try:
+        assert (premiere.mode, seconde.mode) == ("cprofile", "echantillons")
+    finally:
+        nom = profileur.terminer(seconde, "/b", "GET", 200)
+        profileur.terminer(premiere, "/a", "GET", 200)
+    assert os.path.exists(os.path.join(profileur.dossier, nom + '.txt'))
+    # Le verrou est rendu : la requête suivante reprend cProfile
+    suivante = profileur.demarrer("secret")
+    assert suivante.mode == "cprofile"
+    profileur.terminer(suivante, "/c", "GET", 200)
+
+
+def test_mode_inconnu_refuse():
+    with pytest.raises(ValueError, match="Mode de profilage inconnu"):
+        Profileur("x", mode="perf")
+
+
+# ============ Routes ============
+
+@pytest.fixture
+def profileur_app(web_app, profileur, monkeypatch):
+    monkeypatch.setattr(web_app, "PROFILEUR", profileur)
+    return profileur
+
+
+def test_liste_introuvable_sans_jeton_configure(client, web_app, monkeypatch, tmp_path):
+    monkeypatch.setattr(web_app, "PROFILEUR", Profileur(str(tmp_path), actif=True, taux=1.0))
+    assert client.get('/api/profilage').status_code == 404
+    assert client.get('/api/profilage', headers={'X-Profilage': ''}).status_code == 404
+
+
+def test_requete_profilee_puis_listee(client, profileur_app):
+    reponse = client.get('/api/matieres', headers={'X-Profilage': 'secret'})
+    nom = reponse.headers['X-Profilage-Capture']
+
+    assert client.get('/api/profilage').status_code == 403
+    assert client.get('/api/profilage', headers={'X-Profilage': 'faux'}).status_code == 403
+    liste = client.get('/api/profilage', headers={'X-Profilage': 'secret'})
+    assert liste.status_code == 200
+    assert [(c["nom"], c["route"], c["statut"]) for c in liste.get_json()["captures"]] == [
+        (nom, "/api/matieres", 200)
+    ]
+
+
+def test_verrou_rendu_quand_la_requete_leve(client, web_app, profileur_app, monkeypatch):
+    def echec():
+        raise RuntimeError("échec volontaire")
+
+    monkeypatch.setitem(web_app.app.view_functions, 'get_matieres', echec)
+    monkeypatch.setitem(web_app.app.config, 'PROPAGATE_EXCEPTIONS', True)
+    with pytest.raises(RuntimeError):
+        client.get('/api/matieres', headers={'X-Profilage': 'secret'})
+
+    assert not profileur_app._cprofile_verrou.locked()
+    captures = profileur_app.plus_lentes()
+    assert [(c["route"], c["statut"]) for c in captures] == [("/api/matieres", 500)]
@@ -0,0 +1,225 @@
+"""
+Serveur asyncio : analyse des requêtes, en-têtes refusés ou ignorés,
+keep-alive, HEAD, erreurs de l'application et corps lus en flux.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+flask = pytest.importorskip("flask")
+
+from serveur_async import TAILLE_CORPS_TAMPON, RequeteInvalide, ServeurAsync, analyser_entete
+
+CALCUL = json.dumps({"matieres": [
+    {"nom": "Maths", "coefficient": 4, "note": 12, "selectionnee": True},
+]}).encode()
+
+
+def _requete(methode, cible, corps=b'', **entetes):
+    lignes = [f"{methode} {cible} HTTP/1.1", "Host: test"]
+    lignes += [f"{nom.replace('__', '-')}: {valeur}" for nom, valeur in entetes.items()]
+    if corps:
+        lignes.append(f"Content-Length: {len(corps)}")
+    return ('\r\n'.join(lignes) + '\r\n\r\n').encode('latin-1') + corps
+
+
+async def _lire_reponse(lecteur, head=False):
+    brut = await lecteur.readuntil(b'\r\n\r\n')
+    lignes = brut.decode('latin-1').split('\r\n')
+    statut = int(lignes[0].split(' ')[1])
+    entetes = {}
+    for ligne in lignes[1:]:
+        if ligne:
+            nom, _, valeur = ligne.partition(':')
+            entetes[nom.lower()] = valeur.strip()
+    corps = b''
+    if head:
+        pass
+    elif 'content-length' in entetes:
+        corps = await lecteur.readexactly(int(entetes['content-length']))
+    elif entetes.get('transfer-encoding') == 'chunked':
+        while True:
+            taille = int(await lecteur.readuntil(b'\r\n'), 16)
+            morceau = await lecteur.readexactly(taille + 2)
+            if not taille:
+                break
+            corps += morceau[:-2]
+    return statut, entetes, corps
+
+
+def _dialoguer(serveur, envoi, *heads, nombre=1):
+    """
+    Envoie `envoi` sur une seule connexion, lit `nombre` réponses et indique
+    si le serveur a ensuite fermé la connexion.
+    """
+    heads = heads or (False,) * nombre
+
+    async def principal():
+        ecoute = await serveur.demarrer('127.0.0.1', 0)
+        port = ecoute.sockets[0].getsockname()[1]
+        lecteur, ecrivain = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            ecrivain.write(envoi)
+            reponses = [await _lire_reponse(lecteur, head) for head in heads]
+            try:
+                fermee = await asyncio.wait_for(lecteur.read(1), 0.5) == b''
+            except asyncio.TimeoutError:
+                fermee = False
+            return reponses, fermee
+        finally:
+            ecrivain.close()
+            ecoute.close()
+            await ecoute.wait_closed()
+
+    return asyncio.run(principal())
+
+
+@pytest.fixture
+def serveur(web_app):
+    serveur = ServeurAsync(web_app.app, threads=2, threads_calcul=1)
+    yield serveur
+    serveur.fermer()
+
+
+# ============ Analyse ============
+
+def test_analyse_des_en_tetes():
+    requete = analyser_entete(b'GET /api/profils?x=1 HTTP/1.1\r\nHost: a\r\nX-Test:  valeur  ')
+    assert (requete.methode, requete.chemin, requete.version) == ('GET', '/api/profils', 'HTTP/1.1')
+    assert requete.entete('x-test') == 'valeur'
+    assert requete.garder_ouverte()
+    assert not analyser_entete(b'GET / HTTP/1.0').garder_ouverte()
+
+
+@pytest.mark.parametrize("brut, statut", [
+    (b'GET /', 400),
+    (b'GET  / HTTP/1.1', 400),
+    (b'GET / HTTP/2.0', 505),
+    (b'GET / HTTP/1.1\r\nSans deux-points', 400),
+    (b'GET / HTTP/1.1\r\n Host: a', 400),
+    (b'GET / HTTP/1.1\r\nContent Length: 5', 400),
+    (b'GET / HTTP/1.1\r\n: vide', 400),
+], ids=["incomplete", "espace_double", "version", "sans_separateur", "nom_indente",
+        "nom_avec_espace", "nom_vide"])
+def test_requete_mal_formee(brut, statut):
+    with pytest.raises(RequeteInvalide) as erreur:
+        analyser_entete(brut)
+    assert erreur.value.statut == statut
+
+
+class _Ecrivain:
+    def get_extra_info(self, nom):
+        return None
+
+
+def test_en_tetes_avec_soulignement_ignores(serveur):
+    requete = analyser_entete(
+        b'POST /api/calculer HTTP/1.1\r\nContent-Length: 2\r\nContent_Length: 99\r\n'
+        b'X_Profilage: usurpe\r\nX-Profilage: jeton\r\nX-Liste: a\r\nX-Liste: b'
+    )
+    environ = serveur._environ(requete, _Ecrivain())
+
+    assert environ['CONTENT_LENGTH'] == '2'
+    assert environ['HTTP_X_PROFILAGE'] == 'jeton'
+    assert environ['HTTP_X_LISTE'] == 'a,b'
+
+
+# ============ Connexion ============
+
+def test_keep_alive_puis_fermeture_demandee(serveur):
+    envoi = (_requete('GET', '/api/profils')
+             + _requete('POST', '/api/calculer', CALCUL, Content__Type='application/json')
+             + _requete('GET', '/api/stats/serveur', Connection='close'))
+    reponses, fermee = _dialoguer(serveur, envoi, nombre=3)
+
+    assert [statut for statut, _, _ in reponses] == [200, 200, 200]
+    assert [e['connection'] for _, e, _ in reponses] == ['keep-alive', 'keep-alive', 'close']
+    assert json.loads(reponses[1][2])["moyenne"] == 12.0
+    assert json.loads(reponses[2][2])["connexions_max"] == 1
+    assert fermee
+
+
+def test_http_1_0_ferme_par_defaut(serveur):
+    reponses, fermee = _dialoguer(serveur, b'GET /api/profils HTTP/1.0\r\n\r\n')
+    assert reponses[0][0] == 200
+    assert fermee
+
+
+@pytest.mark.parametrize("entetes, statut", [
+    ("Content-Length: 2\r\nContent-Length: 2", 400),
+    ("Content-Length: +2", 400),
+    ("Transfer-Encoding: chunked", 411),
+], ids=["longueur_repetee", "longueur_signee", "transfer_encoding"])
+def test_corps_mal_delimite_refuse_et_connexion_fermee(serveur, entetes, statut):
+    envoi = f"POST /api/calculer HTTP/1.1\r\n{entetes}\r\n\r\n{{}}".encode()
+    reponses, fermee = _dialoguer(serveur, envoi)
+    assert reponses[0][0] == statut
+    assert fermee
+
+
+def test_head_annonce_la_longueur_du_get(serveur):
+    envoi = _requete('HEAD', '/api/matieres') + _requete('GET', '/api/matieres')
+    (head, get), fermee = _dialoguer(serveur, envoi, True, False)
+
+    assert head[0] == get[0] == 200
+    assert int(head[1]['content-length']) == len(get[2]) > 0
+    # Aucun corps après le HEAD : la réponse suivante se lit normalement
+    assert json.loads(get[2])
+    assert not fermee
+
+
+def test_exception_de_l_application_en_500():
+    application = flask.Flask("test")
+    application.config['PROPAGATE_EXCEPTIONS'] = True
+
+    @application.route('/erreur')
+    def erreur():
+        raise RuntimeError("échec volontaire")
+
+    serveur = ServeurAsync(application, threads=1, threads_calcul=1)
+    try:
+        reponses, fermee = _dialoguer(serveur, _requete('GET', '/erreur') + _requete('GET', '/erreur'))
+    finally:
+        serveur.fermer()
+
+    assert reponses[0][0] == 500
+    assert reponses[0][1]['connection'] == 'close'
+    assert fermee
+    assert serveur.statistiques()["erreurs_application"] == 1
+
+
+# ============ Corps en flux ============
+
+def _ndjson(nombre):
+    lignes = [{"type": "entete", "format": "calculateur-moyenne/1"},
+              {"type": "profil", "id": 1, "nom": "Alice", "matieres": []}]
+    lignes += [{"type": "historique", "profil_id": 1, "moyenne": i % 20,
+                "date_calcul": "2024-03-01 08:00:00"} for i in range(nombre)]
+    return ''.join(json.dumps(l) + '\n' for l in lignes).encode()
+
+
+def test_import_volumineux_lu_en_flux(serveur):
+    corps = _ndjson(3000)
+    assert len(corps) > 2 * TAILLE_CORPS_TAMPON
+    envoi = (_requete('POST', '/api/import', corps, Content__Type='application/x-ndjson',
+                      Expect='100-continue')
+             + _requete('GET', '/api/historique/1?limite=1'))
+    (continuer, importe, historique), fermee = _dialoguer(serveur, envoi, nombre=3)
+
+    assert continuer[0] == 100
+    assert importe[0] == 200
+    assert json.loads(importe[2])["historique"] == 3000
+    assert historique[0] == 200
+    assert not fermee
+
+
+def test_corps_non_lu_ferme_la_connexion(serveur):
+    # La route n'accepte pas POST : le corps reste sur la connexion
+    corps = b'x' * (TAILLE_CORPS_TAMPON + 1)
+    reponses, fermee = _dialoguer(serveur, _requete('POST', '/api/matieres', corps)
+                                  + _requete('GET', '/api/matieres'))
+    assert reponses[0][0] == 405
+    assert reponses[0][1]['connection'] == 'close'
+    assert fermee
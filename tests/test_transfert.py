@@ -0,0 +1,108 @@
+"""
+Import NDJSON : une ligne invalide est comptée en erreur avec son numéro,
+sans interrompre l'import ni laisser en base une valeur que la pagination
+de l'historique ne saurait pas relire.
+"""
+
+import json
+
+import pytest
+
+from base_donnees import PoolSQLite, initialiser_schema, lire_page_historique
+from transfert import FORMAT, exporter_ndjson, importer_ndjson
+
+ENTETE = {"type": "entete", "format": FORMAT}
+PROFIL = {"type": "profil", "id": 1, "nom": "Alice", "matieres": []}
+
+
+def _historique(**champs):
+    return dict({"type": "historique", "profil_id": 1, "moyenne": 12.5,
+                 "date_calcul": "2024-03-01 08:00:00"}, **champs)
+
+
+def _importer(pool, *objets, **options):
+    lignes = [json.dumps(o) if isinstance(o, dict) else o for o in (ENTETE,) + objets]
+    return importer_ndjson(pool.connexion, lignes, **options)
+
+
+def _moyennes(pool):
+    with pool.connexion() as conn:
+        return [ligne[0] for ligne in conn.execute('SELECT moyenne FROM historique ORDER BY id')]
+
+
+@pytest.mark.parametrize("ligne", [
+    _historique(date_calcul={}),
+    _historique(date_calcul=7),
+    _historique(date_calcul="hier"),
+    _historique(moyenne=25),
+    _historique(moyenne=-1),
+    _historique(moyenne=10 ** 400),
+    _historique(moyenne="12"),
+    # json.dumps écrit Infinity et NaN, hors JSON standard
+    json.dumps(_historique(moyenne=float('inf'))),
+    json.dumps(_historique(moyenne=float('nan'))),
+], ids=["date_objet", "date_entier", "date_texte", "moyenne_trop_grande", "moyenne_negative",
+        "moyenne_entier_enorme", "moyenne_texte", "moyenne_infinie", "moyenne_nan"])
+def test_ligne_d_historique_invalide(pool, ligne):
+    bilan = _importer(pool, PROFIL, _historique(moyenne=10.0), ligne, _historique(moyenne=14.0))
+
+    assert bilan.erreurs == 1
+    assert bilan.messages[0].startswith("ligne 4:")
+    assert bilan.historique == 2
+    assert _moyennes(pool) == [10.0, 14.0]
+
+
+@pytest.mark.parametrize("champs", [
+    {"date_creation": []},
+    {"date_creation": 1700000000},
+    {"date_modification": "2024-13-45"},
+], ids=["creation_liste", "creation_entier", "modification_texte"])
+def test_profil_avec_date_invalide(pool, champs):
+    bilan = _importer(pool, dict(PROFIL, **champs), dict(PROFIL, id=2, nom="Bob"))
+
+    assert bilan.erreurs == 1
+    assert bilan.messages[0].startswith("ligne 2: profil invalide")
+    assert bilan.profils_crees == 1
+
+
+def test_dates_normalisees_et_curseur_relisible(pool):
+    bilan = _importer(
+        pool, PROFIL,
+        _historique(moyenne=10.0, date_calcul="2024-03-01T09:00:00+01:00"),
+        _historique(moyenne=11.0, date_calcul="2024-03-02"),
+        _historique(moyenne=12.0, date_calcul=None),
+    )
+    assert bilan.erreurs == 0
+
+    with pool.connexion() as conn:
+        premiere, curseur = lire_page_historique(conn, 1, limite=2)
+        seconde, fin = lire_page_historique(conn, 1, limite=2, curseur=curseur)
+
+    assert [e['moyenne'] for e in premiere] == [12.0, 11.0]
+    assert premiere[1]['date_calcul'] == "2024-03-02 00:00:00"
+    assert [(e['moyenne'], e['date_calcul']) for e in seconde] == [(10.0, "2024-03-01 08:00:00")]
+    assert fin is None
+
+
+def test_export_puis_import_a_l_identique(pool, tmp_path):
+    _importer(pool, dict(PROFIL, date_creation="2024-01-01 10:00:00"), _historique())
+    export = b''.join(exporter_ndjson(pool.connexion)).splitlines()
+
+    chemin = str(tmp_path / "copie.db")
+    initialiser_schema(chemin)
+    copie = PoolSQLite(chemin, taille=1)
+    try:
+        bilan = importer_ndjson(copie.connexion, export)
+        assert bilan.erreurs == 0
+        assert b''.join(exporter_ndjson(copie.connexion)).splitlines() == export
+    finally:
+        copie.fermer()
+
+
+def test_route_import_rejette_sans_erreur_serveur(client):
+    corps = '\n'.join(map(json.dumps, [ENTETE, PROFIL, _historique(date_calcul={})]))
+    reponse = client.post('/api/import', data=corps, content_type='application/x-ndjson')
+
+    assert reponse.status_code == 400
+    assert reponse.get_json()["erreurs"] == 1
+    assert reponse.get_json()["profils_crees"] == 1
@@ -0,0 +1,127 @@
+"""
+Validation des matières : toutes les erreurs d'une requête avec le chemin du
+champ fautif, virgule décimale acceptée, chemin rapide (colonnes) et reprise
+objet par objet donnant les mêmes valeurs.
+"""
+
+import random
+
+import pytest
+
+import validation
+from validation import SCHEMA_MATIERE, Champ, ErreurValidation, Schema, decoder_json, valider_matieres
+
+
+def _matiere(nom="Maths", coefficient=4, note=12, selectionnee=True):
+    return {"nom": nom, "coefficient": coefficient, "note": note, "selectionnee": selectionnee}
+
+
+def _valeurs(table):
+    return [(m.nom, m.coefficient, m.note) for m in table]
+
+
+def _erreurs(matieres):
+    with pytest.raises(ErreurValidation) as erreur:
+        valider_matieres(matieres)
+    return [(e["champ"], e["message"]) for e in erreur.value.erreurs]
+
+
+@pytest.mark.parametrize("note, attendue", [
+    ("12,5", 12.5), (" 8,25 ", 8.25), ("14.5", 14.5), ("20", 20.0), ("", 0.0), (None, 0.0), (7, 7.0),
+], ids=["virgule", "espaces", "point", "entier_texte", "vide", "null", "entier"])
+def test_notes_en_texte_et_virgule_decimale(note, attendue):
+    table = valider_matieres([_matiere(note=note), _matiere("SVT", "2,5", 10)])
+    assert _valeurs(table) == [("Maths", 4.0, attendue), ("SVT", 2.5, 10.0)]
+
+
+def test_toutes_les_erreurs_sont_listees():
+    erreurs = _erreurs([
+        _matiere(note="12,5"),
+        _matiere(note=25),
+        "pas un objet",
+        _matiere(coefficient=0, note="abc"),
+        {"nom": 3, "selectionnee": True},
+        _matiere(note=99, selectionnee=False),
+    ])
+    assert erreurs == [
+        ("matieres[1].note", "La note doit être entre 0 et 20, reçu: 25.0"),
+        ("matieres[2]", "Matière invalide"),
+        ("matieres[3].coefficient", "Le coefficient doit être positif, reçu: 0.0"),
+        ("matieres[3].note", "Nombre attendu, reçu: 'abc'"),
+        ("matieres[4].nom", "Texte attendu, reçu: 3"),
+        ("matieres[4].coefficient", "Champ requis"),
+        ("matieres[4].note", "Champ requis"),
+    ]
+
+
+@pytest.mark.parametrize("valeur, message", [
+    (True, "Nombre attendu, reçu: true"),
+    ([12], "Nombre attendu, reçu: [12]"),
+    ("nan", "Nombre fini attendu, reçu: nan"),
+    ("inf", "Nombre fini attendu, reçu: inf"),
+    (10 ** 400, "Nombre fini attendu, reçu: un entier trop grand"),
+    ("-0,5", "La note doit être entre 0 et 20, reçu: -0.5"),
+], ids=["booleen", "liste", "nan", "inf", "entier_geant", "negative"])
+def test_note_refusee(valeur, message):
+    assert _erreurs([_matiere(note=valeur)]) == [("matieres[0].note", message)]
+
+
+def test_nombre_d_erreurs_borne(monkeypatch):
+    monkeypatch.setattr(validation, "ERREURS_MAX", 5)
+    assert len(_erreurs([_matiere(note=30)] * 20)) == 5
+
+
+def test_liste_attendue():
+    assert _erreurs({"nom": "Maths"}) == [("matieres", "Une liste est attendue")]
+
+
+def test_somme_des_coefficients_trop_grande():
+    assert _erreurs([_matiere(coefficient=1e308), _matiere(coefficient=1e308)]) == [
+        ("matieres", "La somme des coefficients est trop grande")
+    ]
+
+
+def test_chemin_rapide_identique_a_la_reprise_par_objet():
+    rng = random.Random(17)
+    for _ in range(200):
+        matieres = [_matiere(f"M{i}", rng.choice([1, 2.5, "3", "1,5"]),
+                             rng.choice([rng.uniform(0, 20), rng.randint(0, 20), "12,5", "", None]),
+                             rng.random() < 0.8)
+                    for i in range(rng.randint(0, 8))]
+        erreurs = []
+        # Reprise objet par objet : celle qui détaille les erreurs
+        attendues = [SCHEMA_MATIERE.valider(m, "m", erreurs) for m in matieres if m["selectionnee"]]
+        assert not erreurs
+        assert _valeurs(valider_matieres(matieres)) == attendues
+
+
+def test_schema_type_inconnu():
+    with pytest.raises(ValueError, match="Type de champ inconnu"):
+        Schema({"date": Champ("date")})
+
+
+def test_json_invalide():
+    with pytest.raises(ErreurValidation, match="JSON invalide"):
+        decoder_json(b'{"matieres": [')
+
+
+# ============ Routes ============
+
+def test_calcul_avec_virgules(client):
+    reponse = client.post('/api/calculer', json={"matieres": [
+        _matiere(coefficient="2", note="12,5"), _matiere("SVT", 1, "15,5")
+    ]})
+    assert reponse.status_code == 200
+    assert reponse.get_json()["moyenne"] == 13.5
+
+
+def test_calcul_refuse_avec_toutes_les_erreurs(client):
+    reponse = client.post('/api/calculer', json={"matieres": [
+        _matiere(note=21), _matiere("SVT", -1, "douze")
+    ]})
+    assert reponse.status_code == 400
+    corps = reponse.get_json()
+    assert [e["champ"] for e in corps["erreurs"]] == [
+        "matieres[0].note", "matieres[1].coefficient", "matieres[1].note"
+    ]
+    assert corps["error"].startswith("matieres[0].note: La note doit être entre 0 et 20")
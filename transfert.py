@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Export et import en flux (NDJSON) des profils et de leur historique.
+
+Un export est une suite de lignes JSON : une ligne d'en-tête, puis une ligne
+par profil (avec ses matières), puis une ligne par entrée d'historique. Les
+lectures se font par lots de clés croissantes et les écritures par lots dans
+une transaction : la mémoire reste constante, quelle que soit la taille de la
+base (seule la correspondance des identifiants de profils est conservée).
+
+Exemples :
+    python transfert.py exporter -o sauvegarde.ndjson
+    python transfert.py importer sauvegarde.ndjson --base autre.db --conflit remplacer
+"""
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from base_donnees import (
+    PoolSQLite, ecrire_matieres_profil, incrementer_versions, initialiser_schema, ligne_vers_matiere
+)
+from classement import NOTE_MAX
+from validation import ErreurValidation, decoder_json
+
+FORMAT = "calculateur-moyenne/1"
+TAILLE_LOT_PAR_DEFAUT = 1000
+CONFLITS = ("ignorer", "remplacer", "erreur")
+# Au-delà, les messages d'erreur suivants ne sont plus conservés
+MESSAGES_MAX = 100
+
+
+def _ligne(objet: dict) -> str:
+    return json.dumps(objet, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def exporter_ndjson(connexion: Callable, historique: bool = True,
+                    taille_lot: int = TAILLE_LOT_PAR_DEFAUT) -> Iterator[bytes]:
+    """
+    Produit l'export NDJSON de la base, un morceau par lot.
+
+    Une connexion n'est empruntée que le temps de lire un lot : l'export d'une
+    grosse base ne bloque pas le pool pendant toute sa durée.
+
+    Args:
+        connexion: Fabrique de connexion (par exemple PoolSQLite.connexion)
+        historique: Exporter aussi l'historique
+        taille_lot: Nombre de lignes lues par requête
+    """
+    yield _ligne({"type": "entete", "format": FORMAT, "historique": historique}).encode('utf-8')
+
+    dernier = 0
+    while True:
+        with connexion() as conn:
+            profils = conn.execute(
+                'SELECT id, nom, date_creation, date_modification FROM profils '
+                'WHERE id > ? ORDER BY id LIMIT ?',
+                (dernier, taille_lot)
+            ).fetchall()
+            if not profils:
+                break
+            matieres: Dict[int, list] = {}
+            for ligne in conn.execute(
+                'SELECT profil_id, nom, coefficient, note, selectionnee, autres '
+                'FROM profil_matieres WHERE profil_id BETWEEN ? AND ? ORDER BY profil_id, position',
+                (profils[0]['id'], profils[-1]['id'])
+            ):
+                matieres.setdefault(ligne['profil_id'], []).append(ligne_vers_matiere(ligne))
+        yield ''.join(
+            _ligne({
+                "type": "profil",
+                "id": p['id'],
+                "nom": p['nom'],
+                "date_creation": p['date_creation'],
+                "date_modification": p['date_modification'],
+                "matieres": matieres.get(p['id'], []),
+            })
+            for p in profils
+        ).encode('utf-8')
+        dernier = profils[-1]['id']
+
+    if not historique:
+        return
+    dernier = 0
+    while True:
+        with connexion() as conn:
+            lignes = conn.execute(
+                'SELECT id, profil_id, moyenne, date_calcul FROM historique '
+                'WHERE id > ? ORDER BY id LIMIT ?',
+                (dernier, taille_lot)
+            ).fetchall()
+        if not lignes:
+            break
+        yield ''.join(
+            _ligne({
+                "type": "historique",
+                "profil_id": h['profil_id'],
+                "moyenne": h['moyenne'],
+                "date_calcul": h['date_calcul'],
+            })
+            for h in lignes
+        ).encode('utf-8')
+        dernier = lignes[-1]['id']
+
+
+@dataclass
+class BilanImport:
+    """Compteurs d'un import."""
+    lignes: int = 0
+    profils_crees: int = 0
+    profils_remplaces: int = 0
+    profils_ignores: int = 0
+    historique: int = 0
+    historique_ignore: int = 0
+    erreurs: int = 0
+    messages: List[str] = field(default_factory=list)
+    duree: float = 0.0
+
+    def erreur(self, numero: int, message: str):
+        self.erreurs += 1
+        if len(self.messages) < MESSAGES_MAX:
+            self.messages.append(f"ligne {numero}: {message}")
+
+    def vers_dict(self) -> dict:
+        return {
+            "lignes": self.lignes,
+            "profils_crees": self.profils_crees,
+            "profils_remplaces": self.profils_remplaces,
+            "profils_ignores": self.profils_ignores,
+            "historique": self.historique,
+            "historique_ignore": self.historique_ignore,
+            "erreurs": self.erreurs,
+            "messages": self.messages,
+            "duree_s": round(self.duree, 3),
+        }
+
+
+def moyenne_valide(moyenne) -> bool:
+    """Une moyenne d'historique est un nombre (pas un booléen) entre 0 et NOTE_MAX."""
+    # inf, NaN et les entiers démesurés échouent à la comparaison des bornes
+    return isinstance(moyenne, (int, float)) and not isinstance(moyenne, bool) \
+        and 0 <= moyenne <= NOTE_MAX
+
+
+def _lire_date(objet: dict, cle: str) -> Optional[str]:
+    """
+    Lit une date ISO 8601 et la met au format de CURRENT_TIMESTAMP (UTC,
+    « AAAA-MM-JJ HH:MM:SS ») : les dates importées se trient comme les autres,
+    ce qu'exige le curseur (date_calcul, id) de l'historique.
+
+    Returns:
+        La date normalisée, ou None si la clé est absente (date du jour)
+
+    Raises:
+        ValueError: Si la valeur n'est pas une date ISO 8601
+    """
+    valeur = objet.get(cle)
+    if valeur is None:
+        return None
+    try:
+        if not isinstance(valeur, str):
+            raise ValueError
+        date = datetime.fromisoformat(valeur)
+    except ValueError:
+        raise ValueError(f"{cle} invalide (date ISO 8601 attendue): {valeur!r:.80}") from None
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date.isoformat(sep=' ')
+
+
+def _importer_profil(conn, numero: int, objet: dict, conflit: str,
+                     correspondances: Dict[int, Optional[int]], bilan: BilanImport,
+                     etiquettes: Set[str]):
+    nom = objet.get('nom')
+    matieres = objet.get('matieres', [])
+    if not isinstance(nom, str) or not nom.strip() or not isinstance(matieres, list):
+        bilan.erreur(numero, "profil invalide (nom ou matières)")
+        return
+    nom = nom.strip()
+    try:
+        date_creation = _lire_date(objet, 'date_creation')
+        date_modification = _lire_date(objet, 'date_modification')
+    except ValueError as e:
+        bilan.erreur(numero, f"profil invalide, {e}")
+        return
+
+    existant = conn.execute('SELECT id FROM profils WHERE nom = ?', (nom,)).fetchone()
+    if existant is not None:
+        if conflit == "erreur":
+            bilan.erreur(numero, f"un profil nommé '{nom}' existe déjà")
+            correspondances[objet.get('id')] = None
+            return
+        if conflit == "ignorer":
+            # L'historique de ce profil est ignoré aussi : réimporter le même
+            # fichier ne crée pas de doublons
+            bilan.profils_ignores += 1
+            correspondances[objet.get('id')] = None
+            return
+        profil_id = existant[0]
+        conn.execute(
+            'UPDATE profils SET date_modification = COALESCE(?, CURRENT_TIMESTAMP) WHERE id = ?',
+            (date_modification, profil_id)
+        )
+        # L'historique importé remplace celui du profil
+        conn.execute('DELETE FROM historique WHERE profil_id = ?', (profil_id,))
+        etiquettes.add(f'historique:{profil_id}')
+        bilan.profils_remplaces += 1
+    else:
+        profil_id = conn.execute(
+            'INSERT INTO profils (nom, date_creation, date_modification) '
+            'VALUES (?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))',
+            (nom, date_creation, date_modification)
+        ).lastrowid
+        bilan.profils_crees += 1
+    ecrire_matieres_profil(conn, profil_id, matieres)
+    correspondances[objet.get('id')] = profil_id
+    etiquettes.update(('profils', f'profil:{profil_id}'))
+
+
+REQUETE_HISTORIQUE = (
+    'INSERT INTO historique (profil_id, moyenne, date_calcul) '
+    'VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))'
+)
+
+
+def _ecrire_lot(connexion: Callable, lot: list, conflit: str,
+                correspondances: Dict[int, Optional[int]], bilan: BilanImport):
+    with connexion() as conn:
+        try:
+            historique = []
+            # Étiquettes du cache des réponses dont la version est incrémentée
+            etiquettes: Set[str] = set()
+            for numero, objet in lot:
+                if objet['type'] == 'profil':
+                    # L'historique en attente peut viser un profil remplacé ici
+                    conn.executemany(REQUETE_HISTORIQUE, historique)
+                    bilan.historique += len(historique)
+                    historique = []
+                    _importer_profil(conn, numero, objet, conflit, correspondances, bilan, etiquettes)
+                    continue
+
+                source = objet.get('profil_id')
+                moyenne = objet.get('moyenne')
+                if source not in correspondances:
+                    bilan.erreur(numero, f"historique d'un profil absent de l'import: {source!r}")
+                elif correspondances[source] is None:
+                    bilan.historique_ignore += 1
+                elif not moyenne_valide(moyenne):
+                    bilan.erreur(numero, f"moyenne invalide: {moyenne!r:.80}")
+                else:
+                    try:
+                        date_calcul = _lire_date(objet, 'date_calcul')
+                    except ValueError as e:
+                        bilan.erreur(numero, str(e))
+                        continue
+                    historique.append((correspondances[source], moyenne, date_calcul))
+                    etiquettes.add(f'historique:{correspondances[source]}')
+            conn.executemany(REQUETE_HISTORIQUE, historique)
+            bilan.historique += len(historique)
+            incrementer_versions(conn, etiquettes)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def importer_ndjson(connexion: Callable, lignes: Iterable, conflit: str = "ignorer",
+                    taille_lot: int = TAILLE_LOT_PAR_DEFAUT,
+                    progression: Optional[Callable[[BilanImport], None]] = None) -> BilanImport:
+    """
+    Importe un export NDJSON, par lots validés chacun dans une transaction.
+
+    Args:
+        connexion: Fabrique de connexion (par exemple PoolSQLite.connexion)
+        lignes: Lignes de l'export (bytes ou str), lues une à une
+        conflit: Profil déjà présent (même nom) : "ignorer", "remplacer" ou "erreur"
+        taille_lot: Nombre de lignes par transaction
+        progression: Appelée avec le bilan après chaque lot
+
+    Raises:
+        ValueError: Si le mode de conflit est inconnu
+    """
+    if conflit not in CONFLITS:
+        raise ValueError(f"Conflit inconnu: {conflit!r} (attendu: {', '.join(CONFLITS)})")
+    debut = time.perf_counter()
+    bilan = BilanImport()
+    correspondances: Dict[int, Optional[int]] = {}
+    lot = []
+
+    for numero, ligne in enumerate(lignes, 1):
+        bilan.lignes = numero
+        if not ligne.strip():
+            continue
+        try:
+            objet = decoder_json(ligne)
+        except ErreurValidation as e:
+            bilan.erreur(numero, str(e))
+            continue
+        if not isinstance(objet, dict) or objet.get('type') not in ('entete', 'profil', 'historique'):
+            bilan.erreur(numero, "ligne de type inconnu")
+            continue
+        if objet['type'] == 'entete':
+            if objet.get('format') != FORMAT:
+                bilan.erreur(numero, f"format non pris en charge: {objet.get('format')!r}")
+            continue
+        lot.append((numero, objet))
+        if len(lot) >= taille_lot:
+            _ecrire_lot(connexion, lot, conflit, correspondances, bilan)
+            lot = []
+            bilan.duree = time.perf_counter() - debut
+            if progression is not None:
+                progression(bilan)
+
+    if lot:
+        _ecrire_lot(connexion, lot, conflit, correspondances, bilan)
+    bilan.duree = time.perf_counter() - debut
+    if progression is not None:
+        progression(bilan)
+    return bilan
+
+
+def _afficher_progression(bilan: BilanImport):
+    debit = bilan.lignes / bilan.duree if bilan.duree else 0.0
+    print(
+        f"{bilan.lignes} lignes, {bilan.profils_crees + bilan.profils_remplaces} profils, "
+        f"{bilan.historique} entrées d'historique, {bilan.erreurs} erreurs ({debit:,.0f} lignes/s)",
+        file=sys.stderr
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export et import NDJSON des profils et de l'historique.")
+    parser.add_argument('--base', default='profils.db', help="Fichier SQLite (profils.db par défaut)")
+    sous = parser.add_subparsers(dest='commande', required=True)
+
+    exporter = sous.add_parser('exporter', help="Écrire l'export NDJSON de la base")
+    exporter.add_argument('-o', '--sortie', default='-', help="Fichier de sortie (- pour la sortie standard)")
+    exporter.add_argument('--sans-historique', action='store_true', help="N'exporter que les profils")
+    exporter.add_argument('--taille-lot', type=int, default=TAILLE_LOT_PAR_DEFAUT, help="Lignes lues par requête")
+
+    importer = sous.add_parser('importer', help="Importer un export NDJSON dans la base")
+    importer.add_argument('entree', help="Fichier d'export (- pour l'entrée standard)")
+    importer.add_argument('--conflit', choices=CONFLITS, default='ignorer',
+                          help="Profil déjà présent : ignorer (défaut), remplacer ou erreur")
+    importer.add_argument('--taille-lot', type=int, default=TAILLE_LOT_PAR_DEFAUT,
+                          help="Lignes par transaction")
+    args = parser.parse_args(argv)
+
+    initialiser_schema(args.base)
+    pool = PoolSQLite(args.base, taille=1)
+    try:
+        if args.commande == 'exporter':
+            sortie = sys.stdout.buffer if args.sortie == '-' else open(args.sortie, 'wb')
+            try:
+                octets = 0
+                for morceau in exporter_ndjson(pool.connexion, not args.sans_historique, args.taille_lot):
+                    sortie.write(morceau)
+                    octets += len(morceau)
+                print(f"{octets:,} octets exportés", file=sys.stderr)
+            finally:
+                if sortie is not sys.stdout.buffer:
+                    sortie.close()
+            return 0
+
+        entree = sys.stdin.buffer if args.entree == '-' else open(args.entree, 'rb')
+        try:
+            bilan = importer_ndjson(pool.connexion, entree, args.conflit, args.taille_lot,
+                                    _afficher_progression)
+        finally:
+            if entree is not sys.stdin.buffer:
+                entree.close()
+        for message in bilan.messages:
+            print(message, file=sys.stderr)
+        return 1 if bilan.erreurs else 0
+    finally:
+        pool.fermer()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Validation des données reçues par l'API.
+
+Les schémas sont déclarés une fois (un Champ par clé) puis compilés en une
+suite de fonctions de conversion spécialisées : valider une requête ne fait
+plus qu'une passe sur les matières, sans exceptions imbriquées ni double
+contrôle. Toutes les erreurs d'une requête sont collectées et renvoyées
+ensemble, chacune avec le chemin du champ fautif (« matieres[2].note »).
+
+Les notes et coefficients peuvent être envoyés comme nombres ou comme
+textes, avec une virgule décimale (« 12,5 ») comme dans l'interface Tkinter.
+"""
+
+import json
+import math
+import sys
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Callable, Dict, List, Optional
+
+from calculs import MatiereTable
+
+try:
+    import orjson
+except ImportError:
+    # Décodage JSON plus rapide si orjson est installé
+    orjson = None
+
+# Au-delà, les erreurs suivantes ne sont plus détaillées
+ERREURS_MAX = 100
+
+
+class ErreurValidation(ValueError):
+    """Données invalides ; `erreurs` liste chaque champ fautif et son message."""
+
+    def __init__(self, erreurs: List[dict]):
+        self.erreurs = erreurs
+        super().__init__("; ".join(
+            f"{e['champ']}: {e['message']}" if e['champ'] else e['message'] for e in erreurs
+        ))
+
+
+class _Invalide(Exception):
+    """Levée par un convertisseur ; porte uniquement le message."""
+
+
+def decoder_json(corps: bytes):
+    """
+    Décode un corps de requête JSON, avec orjson s'il est disponible.
+
+    Raises:
+        ErreurValidation: Si le corps n'est pas du JSON valide
+    """
+    try:
+        if orjson is not None:
+            return orjson.loads(corps)
+        return json.loads(corps)
+    except ValueError as e:
+        raise ErreurValidation([{"champ": "", "message": f"JSON invalide: {e}"}]) from None
+
+
+@dataclass(frozen=True)
+class Champ:
+    """
+    Déclaration d'un champ de schéma.
+
+    Attributes:
+        type: "nombre", "texte" ou "booleen"
+        requis: La clé doit être présente
+        defaut: Valeur si la clé est absente (champ non requis)
+        vide: Valeur si la clé vaut None ou "" (sinon c'est une erreur)
+        minimum, maximum: Bornes incluses d'un nombre
+        strictement_positif: Le nombre doit être > 0
+        message_bornes: Message d'erreur hors bornes ({valeur} est substitué)
+    """
+    type: str
+    requis: bool = True
+    defaut: object = None
+    vide: object = None
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    strictement_positif: bool = False
+    message_bornes: str = "Valeur hors limites, reçu: {valeur}"
+
+
+def _compiler_nombre(champ: Champ) -> Callable:
+    # Bornes finies : inf et NaN échouent au même test que les valeurs hors limites
+    minimum = -sys.float_info.max if champ.minimum is None else float(champ.minimum)
+    maximum = sys.float_info.max if champ.maximum is None else float(champ.maximum)
+    positif = champ.strictement_positif
+    vide = champ.vide
+    message = champ.message_bornes
+
+    def convertir(valeur):
+        classe = valeur.__class__
+        if classe is float:
+            nombre = valeur
+        elif classe is int:
+            try:
+                nombre = float(valeur)
+            except OverflowError:
+                # Entier JSON trop grand pour un flottant (orjson le refuse dès le décodage)
+                raise _Invalide("Nombre fini attendu, reçu: un entier trop grand") from None
+        elif classe is str:
+            texte = valeur.strip()
+            if not texte:
+                if vide is None:
+                    raise _Invalide("Valeur requise")
+                return vide
+            try:
+                nombre = float(texte.replace(',', '.'))
+            except ValueError:
+                raise _Invalide(f"Nombre attendu, reçu: {texte!r}") from None
+        elif valeur is None and vide is not None:
+            return vide
+        else:
+            # Dont true et false : bool n'est pas int ici, même si float(True) vaut 1.0
+            raise _Invalide(f"Nombre attendu, reçu: {json.dumps(valeur)}")
+        if minimum <= nombre <= maximum and (nombre > 0 or not positif):
+            return nombre
+        if not math.isfinite(nombre):
+            raise _Invalide(f"Nombre fini attendu, reçu: {nombre}")
+        raise _Invalide(message.format(valeur=nombre))
+
+    return convertir
+
+
+def _compiler_texte(champ: Champ) -> Callable:
+    def convertir(valeur):
+        if type(valeur) is not str:
+            raise _Invalide(f"Texte attendu, reçu: {json.dumps(valeur)}")
+        return valeur
+
+    return convertir
+
+
+def _compiler_booleen(champ: Champ) -> Callable:
+    # Même règle que l'interface : toute valeur « vraie » sélectionne
+    return bool
+
+
+def _controle_nombres(champ: Champ) -> Callable:
+    minimum = -sys.float_info.max if champ.minimum is None else float(champ.minimum)
+    maximum = sys.float_info.max if champ.maximum is None else float(champ.maximum)
+    positif = champ.strictement_positif
+
+    def controler(valeurs: list) -> Optional[list]:
+        """
+        La colonne convertie si toutes les valeurs sont des nombres valides ;
+        None s'il faut reprendre valeur par valeur (textes, absents, erreurs).
+        """
+        types = set(map(type, valeurs))
+        if types == {float}:
+            nombres = valeurs
+        elif types <= {float, int} and valeurs:
+            try:
+                nombres = list(map(float, valeurs))
+            except OverflowError:
+                return None
+        else:
+            return None
+        plus_petit = min(nombres)
+        # max() peut ignorer un NaN ; la somme le propage
+        if (minimum <= plus_petit and max(nombres) <= maximum
+                and (plus_petit > 0 or not positif) and not math.isnan(sum(nombres))):
+            return nombres
+        return None
+
+    return controler
+
+
+def _controle_textes(champ: Champ) -> Callable:
+    def controler(valeurs: list) -> Optional[list]:
+        return valeurs if set(map(type, valeurs)) <= {str} else None
+
+    return controler
+
+
+# Type de champ -> fabrique du contrôle en bloc d'une colonne
+_CONTROLES_COLONNE = {
+    "nombre": _controle_nombres,
+    "texte": _controle_textes,
+}
+
+
+_COMPILATEURS = {
+    "nombre": _compiler_nombre,
+    "texte": _compiler_texte,
+    "booleen": _compiler_booleen,
+}
+
+
+_ABSENT = object()
+
+
+class Schema:
+    """
+    Schéma d'objet compilé.
+
+    Chaque champ devient une fonction de conversion. Une liste est d'abord
+    convertie colonne par colonne sans collecte d'erreurs ; au premier écart,
+    elle est reprise objet par objet pour détailler toutes les erreurs.
+    """
+
+    def __init__(self, champs: Dict[str, Champ]):
+        """
+        Raises:
+            ValueError: Si un champ a un type inconnu
+        """
+        self.champs = dict(champs)
+        etapes = []
+        for nom, champ in self.champs.items():
+            if champ.type not in _COMPILATEURS:
+                raise ValueError(f"Type de champ inconnu pour {nom!r}: {champ.type!r}")
+            etapes.append((nom, _COMPILATEURS[champ.type](champ), champ.requis, champ.defaut))
+        self._etapes = tuple(etapes)
+        self._lecteurs = tuple(map(itemgetter, self.champs))
+        # Contrôle en bloc d'une colonne, pour les types qui en ont un
+        self._controles = tuple(
+            _CONTROLES_COLONNE[champ.type](champ) if champ.type in _CONTROLES_COLONNE else None
+            for champ in self.champs.values()
+        )
+
+    def _colonnes(self, liste: list, filtre: Optional[str]) -> tuple:
+        """
+        Cas courant : convertit la liste colonne par colonne, sans détailler
+        les erreurs. Une colonne déjà du bon type est contrôlée en bloc (min,
+        max et somme en C, comme MatiereTable._valider) ; sinon chaque valeur
+        passe par son convertisseur.
+
+        Raises:
+            _Invalide: Au premier objet ou champ invalide
+        """
+        if not set(map(type, liste)) <= {dict}:
+            raise _Invalide("Objet invalide")
+        if filtre is not None:
+            try:
+                liste = list(filter(itemgetter(filtre), liste))
+            except KeyError:
+                liste = [objet for objet in liste if objet.get(filtre)]
+        colonnes = []
+        for (nom, convertir, requis, defaut), lire, controler in zip(
+                self._etapes, self._lecteurs, self._controles):
+            try:
+                valeurs = list(map(lire, liste))
+            except KeyError:
+                if requis:
+                    raise _Invalide("Champ requis") from None
+                valeurs = [objet.get(nom, _ABSENT) for objet in liste]
+            colonne = controler(valeurs) if controler is not None else None
+            if colonne is None:
+                colonne = [defaut if valeur is _ABSENT else convertir(valeur) for valeur in valeurs]
+            colonnes.append(colonne)
+        return tuple(colonnes)
+
+    def valider(self, objet: dict, chemin: str, erreurs: List[dict]) -> Optional[tuple]:
+        """
+        Convertit un objet selon le schéma.
+
+        Returns:
+            Les valeurs converties, dans l'ordre des champs ; None en cas
+            d'erreur (les erreurs sont alors ajoutées à `erreurs`)
+        """
+        valeurs = []
+        valide = True
+        for nom, convertir, requis, defaut in self._etapes:
+            if nom in objet:
+                try:
+                    valeurs.append(convertir(objet[nom]))
+                    continue
+                except _Invalide as e:
+                    message = str(e)
+            elif not requis:
+                valeurs.append(defaut)
+                continue
+            else:
+                message = "Champ requis"
+            valide = False
+            if len(erreurs) < ERREURS_MAX:
+                erreurs.append({"champ": f"{chemin}.{nom}", "message": message})
+        return tuple(valeurs) if valide else None
+
+    def valider_liste(self, liste, chemin: str, filtre: Optional[str] = None,
+                      libelle: str = "Objet invalide") -> tuple:
+        """
+        Valide une liste d'objets en une passe.
+
+        Args:
+            liste: La liste reçue
+            chemin: Chemin de la liste, pour les messages (« matieres »)
+            filtre: Clé booléenne ; les objets où elle est fausse sont ignorés
+            libelle: Message pour un élément qui n'est pas un objet
+
+        Returns:
+            Une colonne (liste) de valeurs par champ, dans l'ordre du schéma
+
+        Raises:
+            ErreurValidation: Avec toutes les erreurs trouvées
+        """
+        if type(liste) is not list:
+            raise ErreurValidation([{"champ": chemin, "message": "Une liste est attendue"}])
+        try:
+            return self._colonnes(liste, filtre)
+        except _Invalide:
+            pass
+
+        erreurs = []
+        lignes = []
+        for index, objet in enumerate(liste):
+            if type(objet) is not dict:
+                if len(erreurs) < ERREURS_MAX:
+                    erreurs.append({"champ": f"{chemin}[{index}]", "message": libelle})
+                continue
+            if filtre is not None and not objet.get(filtre):
+                continue
+            valeurs = self.valider(objet, f"{chemin}[{index}]", erreurs)
+            if valeurs is not None:
+                lignes.append(valeurs)
+        if erreurs:
+            raise ErreurValidation(erreurs)
+        if not lignes:
+            return tuple([] for _ in self._etapes)
+        return tuple(map(list, zip(*lignes)))
+
+
+SCHEMA_MATIERE = Schema({
+    "nom": Champ("texte"),
+    "coefficient": Champ(
+        "nombre", strictement_positif=True,
+        message_bornes="Le coefficient doit être positif, reçu: {valeur}"
+    ),
+    "note": Champ(
+        "nombre", vide=0.0, minimum=0, maximum=20,
+        message_bornes="La note doit être entre 0 et 20, reçu: {valeur}"
+    ),
+})
+
+
+def valider_matieres(matieres_data, chemin: str = "matieres") -> MatiereTable:
+    """
+    Valide en une passe la liste des matières d'une requête et construit la
+    table des matières sélectionnées (les autres ne sont pas contrôlées).
+
+    Raises:
+        ErreurValidation: Avec toutes les erreurs trouvées
+    """
+    noms, coefficients, notes = SCHEMA_MATIERE.valider_liste(
+        matieres_data, chemin, filtre='selectionnee', libelle="Matière invalide"
+    )
+    if not math.isfinite(sum(coefficients)):
+        # Chaque coefficient est fini mais la moyenne pondérée déborderait
+        raise ErreurValidation([{"champ": chemin, "message": "La somme des coefficients est trop grande"}])
+    return MatiereTable.depuis_colonnes_validees(noms, coefficients, notes)
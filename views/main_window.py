@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import ttk
 from typing import List, Callable
 from models.matiere import Matiere
+from baremes import obtenir_bareme
 
 class MainWindow:
     """
@@ -125,9 +126,14 @@ class MainWindow:
         self.resultat_var.set(texte)
         
         style = ttk.Style()
-        if moyenne < 10:
-            style.configure('Resultat.TLabel', foreground='red')
-        elif moyenne < 12:
-            style.configure('Resultat.TLabel', foreground='orange')
-        else:
-            style.configure('Resultat.TLabel', foreground='green')
+        style.configure('Resultat.TLabel', foreground=obtenir_bareme().classer(moyenne).couleur)
+    
+    def afficher_erreur(self, message: str):
+        """
+        Affiche un message d'erreur à la place du résultat.
+        
+        Args:
+            message: Le message à afficher
+        """
+        self.resultat_var.set(message)
+        ttk.Style().configure('Resultat.TLabel', foreground='red')
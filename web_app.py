@@ -6,17 +6,72 @@ Version Web du Calculateur de Moyenne avec Flask et SQLite
 Accessible depuis : http://localhost:5000
 """
 
-from flask import Flask, render_template, request, jsonify
-from calculs import Matiere, calculer_moyenne, obtenir_appreciation, valider_note
-import sqlite3
+import time
+
+# Début du chargement du module, pour mesurer le démarrage à froid
+_DEBUT_IMPORT = time.perf_counter()
+
+from flask import Flask, Response, abort, g, render_template, request, jsonify, url_for
+from flask.json.provider import DefaultJSONProvider
+import assets
+from baremes import BAREME_PAR_DEFAUT, obtenir_bareme
+from cache_reponses import CacheReponses, EntreeCache, etag_correspond
+from catalogue_matieres import (
+    ETABLISSEMENTS_MAX, CatalogueMatieres, ErreurCatalogue, normaliser_etablissement
+)
+from ecriture_historique import EcrivainHistorique
+from metriques import Metriques
+from profilage import Profileur
+from registre_classements import RegistreClassements
+from base_donnees import (
+    PoolSQLite, analyser_historique, ecrire_matieres_profil, incrementer_versions, initialiser_schema,
+    lire_matieres_profil, lire_page_historique, lire_versions
+)
+from validation import ErreurValidation, decoder_json, valider_matieres
+from transfert import CONFLITS, exporter_ndjson, importer_ndjson, moyenne_valide
+from calculs import (
+    Classement, calculer_moyenne, calculer_moyennes_tables, obtenir_appreciation,
+    valider_note
+)
+import functools
+import io
 import json
+import sqlite3
 import os
+import sys
+import threading
 from datetime import datetime
+from contextlib import contextmanager
 
 app = Flask(__name__)
-DB_FILE = 'profils.db'
 
-# Matières par défaut
+# Métriques Prometheus (/metrics) ; METRIQUES=0 pour les désactiver
+METRIQUES = Metriques(actif=os.environ.get('METRIQUES', '1') != '0')
+
+
+class _JSONChronometre(DefaultJSONProvider):
+    """jsonify et request.json, chronométrés comme phases serialize et decode."""
+
+    def dumps(self, obj, **kwargs):
+        with METRIQUES.mesurer('serialize'):
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        with METRIQUES.mesurer('decode'):
+            return super().loads(s, **kwargs)
+
+
+app.json = _JSONChronometre(app)
+
+# Profilage à la demande des requêtes (voir profilage.py)
+PROFILEUR = Profileur.depuis_environnement(
+    '/tmp/profilage' if os.environ.get('VERCEL') else 'profilage'
+)
+# Sur Vercel, seul /tmp est accessible en écriture
+DB_FILE = os.environ.get('DB_FILE') or ('/tmp/profils.db' if os.environ.get('VERCEL') else 'profils.db')
+
+# Matières par défaut, catalogue initial de chaque établissement
+# (voir obtenir_catalogue)
 MATIERES_PAR_DEFAUT = [
     {"nom": "Anglais", "coefficient": 2},
     {"nom": "Français", "coefficient": 2},
@@ -27,95 +82,469 @@ MATIERES_PAR_DEFAUT = [
     {"nom": "SVT", "coefficient": 5},
 ]
 
+# Pagination de l'historique
+HISTORIQUE_LIMITE_PAR_DEFAUT = 50
+HISTORIQUE_LIMITE_MAX = 500
+
+# Analyse des tendances de l'historique
+ANALYSE_FENETRE_PAR_DEFAUT = 5
+ANALYSE_FENETRE_MAX = 100
+ANALYSE_POINTS_PAR_DEFAUT = 100
+ANALYSE_POINTS_MAX = 1000
+
+# Pool de connexions SQLite (voir obtenir_pool)
+_pool = None
+_pool_verrou = threading.Lock()
+
+# Schéma créé ou vérifié une fois par processus (voir init_db)
+_schema_pret = False
+_schema_verrou = threading.Lock()
+
+# Phases du démarrage à froid de ce processus, en millisecondes
+# (voir /api/stats/demarrage)
+DEMARRAGE = {
+    "import_ms": None,
+    "init_db_ms": None,
+    "attente_premiere_requete_ms": None,
+    "premiere_requete_ms": None,
+}
+_premiere_requete_vue = False
+_demarrage_verrou = threading.Lock()
+
+# Écriture par lots de l'historique (voir obtenir_ecrivain_historique)
+_ecrivain_historique = None
+
+# Catalogues des matières par établissement (voir obtenir_catalogue)
+_catalogue = None
+
+# Ressources statiques minifiées et précompressées (voir obtenir_ressources)
+_ressources = None
+_ressources_verrou = threading.Lock()
+# Une ressource publiée ne change jamais : le navigateur la garde un an
+CACHE_IMMUABLE = 'public, max-age=31536000, immutable'
+
+
+def _lire_versions_cache(etiquettes) -> tuple:
+    """Versions en base des étiquettes du cache (écritures de tous les workers)."""
+    with get_db() as conn:
+        return lire_versions(conn, etiquettes)
+
+
+# Réponses des routes de lecture, avec ETag (voir en_cache) ; les écritures
+# des autres workers sont vues au plus tard après CACHE_VERIFICATION_MS
+CACHE_REPONSES = CacheReponses(
+    capacite=int(os.environ.get('CACHE_REPONSES_TAILLE', 256)),
+    lire_versions=_lire_versions_cache,
+    intervalle=float(os.environ.get('CACHE_VERIFICATION_MS', 1000)) / 1000
+)
+
+# Classements des classes, en base et partagés par les workers (voir obtenir_classements)
+_classements = None
+
 
 def init_db():
-    """Initialiser la base de données."""
-    if os.path.exists(DB_FILE):
+    """
+    Initialiser la base de données et appliquer les migrations.
+
+    Idempotent : seul le premier appel du processus touche la base. Il
+    est fait à la création du pool, donc à la première requête qui lit ou
+    écrit ; aucune configuration de démarrage n'est nécessaire (Vercel
+    n'exécute pas le bloc __main__).
+    """
+    global _schema_pret
+    if _schema_pret:
         return
-    
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
-    # Table pour les profils
-    c.execute('''
-        CREATE TABLE profils (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT UNIQUE NOT NULL,
-            donnees TEXT NOT NULL,
-            date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            date_modification TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Table pour l'historique
-    c.execute('''
-        CREATE TABLE historique (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            profil_id INTEGER,
-            moyenne REAL,
-            date_calcul TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(profil_id) REFERENCES profils(id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    with _schema_verrou:
+        if not _schema_pret:
+            debut = time.perf_counter()
+            initialiser_schema(DB_FILE)
+            DEMARRAGE["init_db_ms"] = round((time.perf_counter() - debut) * 1000, 2)
+            _schema_pret = True
+
+
+def obtenir_pool() -> PoolSQLite:
+    """Retourne le pool de connexions, créé (avec le schéma) au premier appel."""
+    global _pool
+    if _pool is None:
+        init_db()
+        with _pool_verrou:
+            if _pool is None:
+                _pool = PoolSQLite(DB_FILE, taille=int(os.environ.get('DB_POOL_TAILLE', 8)))
+    return _pool
+
+
+def obtenir_ecrivain_historique() -> EcrivainHistorique:
+    """Retourne l'écrivain différé de l'historique, créé au premier appel."""
+    global _ecrivain_historique
+    if _ecrivain_historique is None:
+        pool = obtenir_pool()
+        with _pool_verrou:
+            if _ecrivain_historique is None:
+                _ecrivain_historique = EcrivainHistorique(
+                    pool,
+                    durabilite=os.environ.get('HISTORIQUE_DURABILITE', 'groupee'),
+                    taille_lot=int(os.environ.get('HISTORIQUE_TAILLE_LOT', 200)),
+                    delai_max=float(os.environ.get('HISTORIQUE_DELAI_MS', 50)) / 1000
+                )
+    return _ecrivain_historique
+
+
+def obtenir_catalogue() -> CatalogueMatieres:
+    """Retourne le catalogue des matières, créé au premier appel."""
+    global _catalogue
+    if _catalogue is None:
+        obtenir_pool()
+        with _pool_verrou:
+            if _catalogue is None:
+                _catalogue = CatalogueMatieres(
+                    get_db, MATIERES_PAR_DEFAUT,
+                    intervalle=float(os.environ.get('CATALOGUE_VERIFICATION_MS', 1000)) / 1000,
+                    capacite=int(os.environ.get('CATALOGUE_ETABLISSEMENTS_MAX', ETABLISSEMENTS_MAX))
+                )
+    return _catalogue
+
 
+def obtenir_classements() -> RegistreClassements:
+    """Retourne le registre des classements des classes, créé au premier appel."""
+    global _classements
+    if _classements is None:
+        obtenir_pool()
+        with _pool_verrou:
+            if _classements is None:
+                _classements = RegistreClassements(get_db)
+    return _classements
 
+
+def obtenir_ressources() -> dict:
+    """
+    Retourne les ressources statiques préparées, par nom source et par nom
+    publié. Préparées au premier appel ; en mode debug, à chaque appel, pour
+    que les modifications des sources soient servies sans redémarrer.
+    """
+    global _ressources
+    if _ressources is None or app.debug:
+        with _ressources_verrou:
+            if _ressources is None or app.debug:
+                par_source = assets.charger()
+                par_publie = {r.nom_publie: r for r in par_source.values()}
+                _ressources = {"source": par_source, "publie": par_publie}
+    return _ressources
+
+
+@app.template_global()
+def ressource(nom: str) -> str:
+    """URL publiée (avec empreinte) d'une ressource de static/, pour les gabarits."""
+    preparee = obtenir_ressources()["source"].get(nom)
+    if preparee is None:
+        return url_for('static', filename=nom)
+    return url_for('servir_ressource', nom=preparee.nom_publie)
+
+
+def _etablissement() -> str:
+    """
+    Établissement (ou classe) de la requête : paramètre ?etablissement=
+    ou en-tête X-Etablissement, sinon l'établissement par défaut.
+
+    Raises:
+        ErreurCatalogue: Si l'identifiant est invalide
+    """
+    return normaliser_etablissement(
+        request.args.get('etablissement') or request.headers.get('X-Etablissement')
+    )
+
+
+@contextmanager
 def get_db():
-    """Obtenir une connexion à la base de données."""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """
+    Emprunter une connexion au pool, à utiliser avec `with` :
+    la connexion est rendue au pool à la sortie du bloc. Le temps passé
+    dans le bloc compte dans la phase sqlite des métriques.
+    """
+    with METRIQUES.mesurer('sqlite'), obtenir_pool().connexion() as conn:
+        yield conn
+
+
+# Déclaré avant les autres hooks : le profil couvre toute la requête
+@app.before_request
+def _debut_profilage():
+    # La liste des captures présente le jeton mais n'est pas elle-même profilée
+    if request.endpoint != 'lister_profilage':
+        g.capture_profilage = PROFILEUR.demarrer(request.headers.get('X-Profilage'))
+
+
+def _terminer_profilage(capture, statut: int):
+    regle = request.url_rule
+    return PROFILEUR.terminer(
+        capture, regle.rule if regle is not None else request.path, request.method, statut
+    )
+
+
+@app.after_request
+def _fin_profilage(reponse):
+    capture = g.pop('capture_profilage', None)
+    if capture is not None:
+        reponse.headers['X-Profilage-Capture'] = _terminer_profilage(capture, reponse.status_code)
+    return reponse
+
+
+@app.teardown_request
+def _abandon_profilage(exc):
+    # Exception propagée (PROPAGATE_EXCEPTIONS) ou levée par un autre hook :
+    # after_request n'a pas tourné, le profil doit quand même être arrêté
+    # pour rendre le verrou de cProfile
+    capture = g.pop('capture_profilage', None)
+    if capture is not None:
+        _terminer_profilage(capture, 500)
+
+
+@app.before_request
+def _debut_metriques():
+    METRIQUES.debut_requete()
+
+
+@app.after_request
+def _fin_metriques(reponse):
+    # Route déclarée (« /api/profils/<int:profil_id> ») : une série par
+    # route, pas par identifiant
+    regle = request.url_rule
+    METRIQUES.fin_requete(
+        regle.rule if regle is not None else 'inconnue', request.method, reponse.status_code
+    )
+    return reponse
+
+
+@app.before_request
+def _debut_premiere_requete():
+    global _premiere_requete_vue
+    if _premiere_requete_vue:
+        return
+    with _demarrage_verrou:
+        if _premiere_requete_vue:
+            return
+        _premiere_requete_vue = True
+    g.debut_premiere_requete = time.perf_counter()
+
+
+@app.after_request
+def _rapporter_demarrage(reponse):
+    """
+    À la fin de la première requête du processus, publie les phases du
+    démarrage à froid : en-tête Server-Timing et une ligne sur stderr
+    (journaux de la plateforme).
+    """
+    debut = g.pop('debut_premiere_requete', None)
+    if debut is None:
+        return reponse
+    DEMARRAGE["attente_premiere_requete_ms"] = round((debut - _FIN_IMPORT) * 1000, 2)
+    DEMARRAGE["premiere_requete_ms"] = round((time.perf_counter() - debut) * 1000, 2)
+    phases = [(nom[:-3], duree) for nom, duree in DEMARRAGE.items()
+              if duree is not None and nom != "attente_premiere_requete_ms"]
+    reponse.headers['Server-Timing'] = ', '.join(f"{nom};dur={duree}" for nom, duree in phases)
+    print(f"demarrage_a_froid {json.dumps(DEMARRAGE)} route={request.path}", file=sys.stderr)
+    return reponse
+
+
+def _reponse_conditionnelle(entree: EntreeCache):
+    """Sert une entrée du cache, ou un 304 si le client a déjà cette version."""
+    if etag_correspond(request.headers.get('If-None-Match'), entree.etag):
+        CACHE_REPONSES.compter_304()
+        reponse = app.response_class(status=304)
+    else:
+        reponse = app.response_class(entree.corps, mimetype=entree.mimetype)
+    reponse.headers['ETag'] = entree.etag
+    # Le client garde la réponse mais la revalide à chaque lecture
+    reponse.headers['Cache-Control'] = 'no-cache'
+    return reponse
+
+
+def en_cache(*etiquettes: str):
+    """
+    Met en cache la réponse JSON d'une route de lecture.
+    
+    Args:
+        etiquettes: Étiquettes d'invalidation ; les paramètres de la route
+            sont substitués (par exemple 'profil:{profil_id}'). Une écriture
+            doit incrémenter leur version en base (incrementer_versions) pour
+            être vue des autres workers.
+    """
+    def decorateur(vue):
+        @functools.wraps(vue)
+        def enveloppe(**kwargs):
+            cle = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True)))
+            )
+            entree = CACHE_REPONSES.lire(cle)
+            if entree is None:
+                etiquettes_reponse = [e.format(**kwargs) for e in etiquettes]
+                generation = CACHE_REPONSES.generation(etiquettes_reponse)
+                reponse = app.make_response(vue(**kwargs))
+                # Les erreurs ne sont pas mises en cache
+                if reponse.status_code != 200:
+                    return reponse
+                entree = CACHE_REPONSES.stocker(
+                    cle, reponse.get_data(), reponse.mimetype, etiquettes_reponse, generation
+                )
+            return _reponse_conditionnelle(entree)
+        return enveloppe
+    return decorateur
 
 
 @app.route('/')
 def index():
-    """Page d'accueil."""
-    return render_template('index.html', matieres=MATIERES_PAR_DEFAUT)
+    """
+    Page d'accueil.
+
+    La page est statique (les matières sont chargées par l'API) : elle est
+    rendue une fois par processus, puis servie depuis le cache (avec ETag).
+    """
+    if app.debug:
+        # Gabarit relu à chaque requête en développement
+        return render_template('index.html')
+
+    entree = CACHE_REPONSES.lire(('index',))
+    if entree is None:
+        generation = CACHE_REPONSES.generation()
+        page = render_template('index.html')
+        entree = CACHE_REPONSES.stocker(('index',), page.encode('utf-8'), 'text/html', (), generation)
+    return _reponse_conditionnelle(entree)
+
+
+@app.route('/assets/<nom>')
+def servir_ressource(nom):
+    """
+    Sert une ressource statique publiée (nom avec empreinte), dans la variante
+    précompressée acceptée par le client (brotli, gzip ou brute).
+    """
+    preparee = obtenir_ressources()["publie"].get(nom)
+    if preparee is None:
+        abort(404)
+    encodage = assets.choisir_encodage(request.headers.get('Accept-Encoding'), preparee.variantes)
+    etag = preparee.etag(encodage)
+    if etag_correspond(request.headers.get('If-None-Match'), etag):
+        reponse = app.response_class(status=304)
+    else:
+        reponse = app.response_class(preparee.variantes[encodage], mimetype=preparee.mimetype)
+        if encodage != 'identity':
+            reponse.headers['Content-Encoding'] = encodage
+    reponse.headers['ETag'] = etag
+    reponse.headers['Vary'] = 'Accept-Encoding'
+    reponse.headers['Cache-Control'] = CACHE_IMMUABLE
+    return reponse
+
+
+def traiter_calcul(donnees) -> tuple:
+    """
+    Calcule la réponse de /api/calculer à partir du JSON décodé.
+    
+    Returns:
+        (corps JSON, code HTTP)
+    """
+    if not isinstance(donnees, dict) or 'matieres' not in donnees:
+        return {"error": "Données invalides"}, 400
+    
+    try:
+        with METRIQUES.mesurer('validate'):
+            matieres_selectionnees = valider_matieres(donnees['matieres'])
+    except ErreurValidation as e:
+        # Toutes les erreurs de la requête, pas seulement la première
+        return {"error": str(e), "erreurs": e.erreurs}, 400
+    
+    if not matieres_selectionnees:
+        return {"error": "Veuillez sélectionner au moins une matière"}, 400
+    
+    # Calculer la moyenne
+    with METRIQUES.mesurer('compute'):
+        moyenne = calculer_moyenne(matieres_selectionnees)
+        appreciation = obtenir_appreciation(moyenne)
+    
+    return {
+        "moyenne": round(moyenne, 2),
+        "appreciation": appreciation['texte'],
+        "couleur": appreciation['couleur'],
+        "matieres": matieres_selectionnees.vers_dicts()
+    }, 200
 
 
 @app.route('/api/calculer', methods=['POST'])
 def calculer():
     """API pour calculer la moyenne."""
     try:
-        donnees = request.json
+        try:
+            with METRIQUES.mesurer('decode'):
+                donnees = decoder_json(request.get_data())
+        except ErreurValidation as e:
+            return jsonify({"error": str(e), "erreurs": e.erreurs}), 400
+        corps, statut = traiter_calcul(donnees)
+        return jsonify(corps), statut
+    
+    except Exception as e:
+        return jsonify({"error": f"Erreur serveur: {str(e)}"}), 500
+
+
+@app.route('/api/calculer/batch', methods=['POST'])
+def calculer_batch():
+    """API pour calculer les moyennes de plusieurs élèves en une requête."""
+    try:
+        debut = time.perf_counter()
+        try:
+            with METRIQUES.mesurer('decode'):
+                donnees = decoder_json(request.get_data())
+        except ErreurValidation as e:
+            return jsonify({"error": str(e), "erreurs": e.erreurs}), 400
         
-        if not donnees or 'matieres' not in donnees:
+        if not isinstance(donnees, dict) or not isinstance(donnees.get('eleves'), list):
             return jsonify({"error": "Données invalides"}), 400
+        try:
+            bareme = obtenir_bareme(donnees.get('bareme', BAREME_PAR_DEFAUT))
+        except KeyError as e:
+            return jsonify({"error": str(e.args[0])}), 400
         
-        matieres_selectionnees = []
-        for m in donnees['matieres']:
-            if m['selectionnee']:
-                try:
-                    note = float(m['note']) if m['note'] else 0.0
-                    if not (0 <= note <= 20):
-                        return jsonify({"error": f"Note invalide pour {m['nom']}"}), 400
-                    
-                    matiere = Matiere(nom=m['nom'], coefficient=m['coefficient'], note=note)
-                    matieres_selectionnees.append(matiere)
-                except (ValueError, KeyError) as e:
-                    return jsonify({"error": f"Erreur pour {m['nom']}: {str(e)}"}), 400
-        
-        if not matieres_selectionnees:
-            return jsonify({"error": "Veuillez sélectionner au moins une matière"}), 400
-        
-        # Calculer la moyenne
-        moyenne = calculer_moyenne(matieres_selectionnees)
-        appreciation = obtenir_appreciation(moyenne)
+        resultats = []
+        tables = []
+        for index, eleve in enumerate(donnees['eleves']):
+            identifiant = eleve.get('id', index) if isinstance(eleve, dict) else index
+            resultat = {"id": identifiant}
+            resultats.append(resultat)
+            try:
+                if not isinstance(eleve, dict) or not isinstance(eleve.get('matieres'), list):
+                    raise ValueError("Données invalides")
+                with METRIQUES.mesurer('validate'):
+                    table = valider_matieres(eleve['matieres'], f"eleves[{index}].matieres")
+                if not table:
+                    raise ValueError("Veuillez sélectionner au moins une matière")
+            except ErreurValidation as e:
+                resultat["error"] = str(e)
+                resultat["erreurs"] = e.erreurs
+                continue
+            except ValueError as e:
+                resultat["error"] = str(e)
+                continue
+            tables.append((resultat, table))
+        
+        # Toutes les moyennes valides sont calculées et classées en une seule passe
+        with METRIQUES.mesurer('compute'):
+            moyennes = calculer_moyennes_tables([table for _, table in tables])
+            indices = bareme.indices_lot(moyennes)
+        for (resultat, _), moyenne, indice in zip(tables, moyennes, indices):
+            mention = bareme.mentions[indice]
+            resultat.update({
+                "moyenne": round(moyenne, 2),
+                "appreciation": mention.texte,
+                "couleur": mention.couleur,
+            })
         
+        duree = time.perf_counter() - debut
         return jsonify({
-            "moyenne": round(moyenne, 2),
-            "appreciation": appreciation['texte'],
-            "couleur": appreciation['couleur'],
-            "matieres": [
-                {
-                    "nom": m.nom,
-                    "note": m.note,
-                    "coefficient": m.coefficient
-                }
-                for m in matieres_selectionnees
-            ]
+            "resultats": resultats,
+            "meta": {
+                "eleves": len(resultats),
+                "calcules": len(tables),
+                "erreurs": len(resultats) - len(tables),
+                "duree_ms": round(duree * 1000, 3),
+                "eleves_par_seconde": round(len(resultats) / duree, 1) if duree > 0 else None,
+            }
         })
     
     except Exception as e:
@@ -124,8 +553,17 @@ def calculer():
 
 @app.route('/api/matieres', methods=['GET'])
 def get_matieres():
-    """Récupère la liste des matières par défaut."""
-    return jsonify(MATIERES_PAR_DEFAUT)
+    """
+    Récupère le catalogue des matières de l'établissement.
+
+    Servi depuis la version en mémoire du catalogue, dont l'ETag change à
+    chaque modification, y compris par un autre worker.
+    """
+    try:
+        catalogue = obtenir_catalogue().lire(_etablissement())
+    except ErreurCatalogue as e:
+        return jsonify({"error": str(e)}), 400
+    return _reponse_conditionnelle(catalogue.reponse)
 
 
 @app.route('/api/ajouter-matiere', methods=['POST'])
@@ -135,38 +573,122 @@ def ajouter_matiere():
         donnees = request.json
         
         nom = donnees.get('nom', '').strip()
-        coefficient = float(donnees.get('coefficient', 1))
+        try:
+            coefficient = float(donnees.get('coefficient', 1))
+        except (TypeError, ValueError, OverflowError):
+            return jsonify({"error": "Le coefficient doit être un nombre"}), 400
         
         if not nom:
             return jsonify({"error": "Le nom est requis"}), 400
         if coefficient <= 0:
             return jsonify({"error": "Le coefficient doit être > 0"}), 400
         
-        if any(m['nom'].lower() == nom.lower() for m in MATIERES_PAR_DEFAUT):
-            return jsonify({"error": "Cette matière existe déjà"}), 400
-        
-        MATIERES_PAR_DEFAUT.append({"nom": nom, "coefficient": coefficient})
+        try:
+            catalogue = obtenir_catalogue().ajouter(_etablissement(), nom, coefficient)
+        except ErreurCatalogue as e:
+            return jsonify({"error": str(e)}), 400
         
         return jsonify({
             "success": True,
-            "matiere": {"nom": nom, "coefficient": coefficient}
+            "matiere": {"nom": nom, "coefficient": coefficient},
+            "version": catalogue.version
         })
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# ============ ENDPOINTS DE CLASSEMENT ============
+
+def _position_eleve(classement: Classement, eleve: str) -> dict:
+    """Décrit la position d'un élève dans un classement."""
+    return {
+        "eleve": eleve,
+        "moyenne": round(classement.moyenne(eleve), 2),
+        "rang": classement.rang(eleve),
+        "percentile": round(classement.percentile(eleve), 1),
+        "effectif": len(classement)
+    }
+
+
+@app.route('/api/classements/<classe>', methods=['GET'])
+def obtenir_classement(classe):
+    """Retourne les k meilleurs élèves d'une classe (paramètre ?k=, 10 par défaut)."""
+    k = request.args.get('k', 10, type=int)
+    resultat = obtenir_classements().consulter(
+        classe, lambda classement: (classement.meilleurs(max(k, 0)), len(classement))
+    )
+    if resultat is None:
+        return jsonify({"error": "Classement non trouvé"}), 404
+    meilleurs, effectif = resultat
+    
+    return jsonify({
+        "classe": classe,
+        "effectif": effectif,
+        "meilleurs": [
+            {"eleve": eleve, "moyenne": round(moyenne, 2), "rang": rang}
+            for eleve, moyenne, rang in meilleurs
+        ]
+    })
+
+
+@app.route('/api/classements/<classe>/eleves/<eleve>', methods=['PUT'])
+def classer_eleve(classe, eleve):
+    """Ajoute ou met à jour la moyenne d'un élève (directe ou à partir de ses matières)."""
+    try:
+        donnees = request.json or {}
+        if 'matieres' in donnees:
+            with METRIQUES.mesurer('validate'):
+                table = valider_matieres(donnees['matieres'])
+            if not table:
+                return jsonify({"error": "Veuillez sélectionner au moins une matière"}), 400
+            with METRIQUES.mesurer('compute'):
+                moyenne = calculer_moyenne(table)
+        elif 'moyenne' in donnees:
+            moyenne = float(donnees['moyenne'])
+        else:
+            return jsonify({"error": "Données invalides"}), 400
+        
+        return jsonify(obtenir_classements().mettre_a_jour(
+            classe, eleve, moyenne, lambda classement: _position_eleve(classement, eleve)
+        ))
+    
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Erreur serveur: {str(e)}"}), 500
+
+
+@app.route('/api/classements/<classe>/eleves/<eleve>', methods=['GET'])
+def position_eleve(classe, eleve):
+    """Retourne le rang et le percentile d'un élève."""
+    position = obtenir_classements().consulter(
+        classe, lambda classement: _position_eleve(classement, eleve) if eleve in classement else None
+    )
+    if position is None:
+        return jsonify({"error": "Élève non classé"}), 404
+    return jsonify(position)
+
+
+@app.route('/api/classements/<classe>/eleves/<eleve>', methods=['DELETE'])
+def retirer_eleve(classe, eleve):
+    """Retire un élève d'un classement."""
+    if not obtenir_classements().retirer(classe, eleve):
+        return jsonify({"error": "Élève non classé"}), 404
+    return jsonify({"success": True})
+
+
 # ============ ENDPOINTS DE SAUVEGARDE ============
 
 @app.route('/api/profils', methods=['GET'])
+@en_cache('profils')
 def lister_profils():
     """Lister tous les profils sauvegardés."""
     try:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute('SELECT id, nom, date_modification FROM profils ORDER BY date_modification DESC')
-        profils = [dict(row) for row in c.fetchall()]
-        conn.close()
+        with get_db() as conn:
+            c = conn.cursor()
+            c.execute('SELECT id, nom, date_modification FROM profils ORDER BY date_modification DESC')
+            profils = [dict(row) for row in c.fetchall()]
         return jsonify(profils)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -183,48 +705,54 @@ def creer_profil():
         if not nom:
             return jsonify({"error": "Le nom du profil est requis"}), 400
         
-        conn = get_db()
-        c = conn.cursor()
+        if not isinstance(matieres_data, list):
+            return jsonify({"error": "Les matières doivent être une liste"}), 400
         
-        try:
-            c.execute(
-                'INSERT INTO profils (nom, donnees) VALUES (?, ?)',
-                (nom, json.dumps(matieres_data))
-            )
-            conn.commit()
+        with get_db() as conn:
+            c = conn.cursor()
+            try:
+                c.execute('INSERT INTO profils (nom) VALUES (?)', (nom,))
+            except sqlite3.IntegrityError:
+                return jsonify({"error": f"Un profil nommé '{nom}' existe déjà"}), 400
             profil_id = c.lastrowid
-            
-            return jsonify({
-                "success": True,
-                "id": profil_id,
-                "nom": nom
-            })
-        except sqlite3.IntegrityError:
-            return jsonify({"error": f"Un profil nommé '{nom}' existe déjà"}), 400
-        finally:
-            conn.close()
+            ecrire_matieres_profil(conn, profil_id, matieres_data)
+            incrementer_versions(conn, ['profils'])
+            conn.commit()
+        CACHE_REPONSES.invalider('profils')
+        
+        return jsonify({
+            "success": True,
+            "id": profil_id,
+            "nom": nom
+        })
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/profils/<int:profil_id>', methods=['GET'])
+@en_cache('profil:{profil_id}')
 def charger_profil(profil_id):
-    """Charger un profil existant."""
+    """Charger un profil existant (?champs=nom,note pour ne charger que ces colonnes)."""
     try:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute('SELECT id, nom, donnees FROM profils WHERE id = ?', (profil_id,))
-        row = c.fetchone()
-        conn.close()
+        champs = request.args.get('champs')
+        champs = [c.strip() for c in champs.split(',') if c.strip()] if champs else None
         
-        if not row:
-            return jsonify({"error": "Profil non trouvé"}), 404
+        with get_db() as conn:
+            c = conn.cursor()
+            c.execute('SELECT id, nom FROM profils WHERE id = ?', (profil_id,))
+            row = c.fetchone()
+            if not row:
+                return jsonify({"error": "Profil non trouvé"}), 404
+            try:
+                matieres = lire_matieres_profil(conn, profil_id, champs)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
         
         return jsonify({
             "id": row['id'],
             "nom": row['nom'],
-            "matieres": json.loads(row['donnees'])
+            "matieres": matieres
         })
     
     except Exception as e:
@@ -238,18 +766,25 @@ def mettre_a_jour_profil(profil_id):
         donnees = request.json
         matieres_data = donnees.get('matieres', [])
         
-        conn = get_db()
-        c = conn.cursor()
-        c.execute(
-            'UPDATE profils SET donnees = ?, date_modification = CURRENT_TIMESTAMP WHERE id = ?',
-            (json.dumps(matieres_data), profil_id)
-        )
-        conn.commit()
+        if not isinstance(matieres_data, list):
+            return jsonify({"error": "Les matières doivent être une liste"}), 400
         
-        if c.rowcount == 0:
-            return jsonify({"error": "Profil non trouvé"}), 404
-        
-        conn.close()
+        with get_db() as conn:
+            c = conn.cursor()
+            c.execute(
+                'UPDATE profils SET date_modification = CURRENT_TIMESTAMP WHERE id = ?',
+                (profil_id,)
+            )
+            if c.rowcount == 0:
+                return jsonify({"error": "Profil non trouvé"}), 404
+            
+            # Seules les matières modifiées sont réécrites
+            ecrire_matieres_profil(conn, profil_id, matieres_data)
+            # date_modification change aussi l'ordre de la liste des profils
+            etiquettes = ('profils', f'profil:{profil_id}')
+            incrementer_versions(conn, etiquettes)
+            conn.commit()
+        CACHE_REPONSES.invalider(*etiquettes)
         
         return jsonify({"success": True, "id": profil_id})
     
@@ -261,20 +796,27 @@ def mettre_a_jour_profil(profil_id):
 def supprimer_profil(profil_id):
     """Supprimer un profil."""
     try:
-        conn = get_db()
-        c = conn.cursor()
+        # Écrire l'historique en file avant de le supprimer
+        obtenir_ecrivain_historique().vider()
         
-        # Supprimer d'abord l'historique
-        c.execute('DELETE FROM historique WHERE profil_id = ?', (profil_id,))
-        
-        # Puis le profil
-        c.execute('DELETE FROM profils WHERE id = ?', (profil_id,))
-        conn.commit()
+        with get_db() as conn:
+            c = conn.cursor()
+            
+            # Supprimer d'abord l'historique et les matières
+            c.execute('DELETE FROM historique WHERE profil_id = ?', (profil_id,))
+            c.execute('DELETE FROM profil_matieres WHERE profil_id = ?', (profil_id,))
+            
+            # Puis le profil
+            c.execute('DELETE FROM profils WHERE id = ?', (profil_id,))
+            supprime = c.rowcount > 0
+            etiquettes = ('profils', f'profil:{profil_id}', f'historique:{profil_id}')
+            incrementer_versions(conn, etiquettes)
+            conn.commit()
         
-        if c.rowcount == 0:
+        if not supprime:
             return jsonify({"error": "Profil non trouvé"}), 404
         
-        conn.close()
+        CACHE_REPONSES.invalider(*etiquettes)
         
         return jsonify({"success": True})
     
@@ -284,21 +826,73 @@ def supprimer_profil(profil_id):
 
 @app.route('/api/historique/<int:profil_id>', methods=['GET'])
 def obtenir_historique(profil_id):
-    """Obtenir l'historique des calculs pour un profil."""
+    """
+    Obtenir l'historique des calculs pour un profil, du plus récent au plus ancien.
+    
+    Paramètres : ?limite= (50 par défaut, 500 au plus) et ?apres=<curseur>.
+    Le curseur de la page suivante est renvoyé dans l'en-tête X-Curseur-Suivant.
+    """
+    try:
+        limite = request.args.get('limite', HISTORIQUE_LIMITE_PAR_DEFAUT, type=int)
+        limite = max(1, min(limite, HISTORIQUE_LIMITE_MAX))
+        curseur = request.args.get('apres')
+        
+        # Les entrées encore en file doivent être visibles
+        obtenir_ecrivain_historique().vider()
+        
+        with get_db() as conn:
+            try:
+                historique, suivant = lire_page_historique(conn, profil_id, limite, curseur)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        
+        reponse = jsonify(historique)
+        if suivant:
+            reponse.headers['X-Curseur-Suivant'] = suivant
+            reponse.headers['Link'] = (
+                f'<{request.base_url}?limite={limite}&apres={suivant}>; rel="next"'
+            )
+        return reponse
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/historique/<int:profil_id>/analyse', methods=['GET'])
+@en_cache('historique:{profil_id}')
+def analyser_historique_profil(profil_id):
+    """
+    Tendances de l'historique d'un profil, calculées par SQLite.
+    
+    Paramètres : ?fenetre= (moyenne mobile, 5 entrées par défaut),
+    ?points= (entrées récentes de la série, 100 par défaut) et ?bareme=.
+    Le résultat est mis en cache jusqu'au prochain ajout à l'historique du
+    profil, fait par ce worker, par un autre ou par un import.
+    """
     try:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute('''
-            SELECT id, moyenne, date_calcul 
-            FROM historique 
-            WHERE profil_id = ? 
-            ORDER BY date_calcul DESC 
-            LIMIT 50
-        ''', (profil_id,))
-        historique = [dict(row) for row in c.fetchall()]
-        conn.close()
-        
-        return jsonify(historique)
+        fenetre = request.args.get('fenetre', ANALYSE_FENETRE_PAR_DEFAUT, type=int)
+        fenetre = max(1, min(fenetre, ANALYSE_FENETRE_MAX))
+        points = request.args.get('points', ANALYSE_POINTS_PAR_DEFAUT, type=int)
+        points = max(1, min(points, ANALYSE_POINTS_MAX))
+        try:
+            bareme = obtenir_bareme(request.args.get('bareme', BAREME_PAR_DEFAUT))
+        except KeyError as e:
+            return jsonify({"error": str(e.args[0])}), 400
+        
+        # Les entrées encore en file doivent être comptées
+        obtenir_ecrivain_historique().vider()
+        
+        with get_db() as conn:
+            analyse = analyser_historique(conn, profil_id, bareme.seuils, fenetre, points)
+        
+        # Les bandes calculées en SQL sont des indices de mention du barème
+        if analyse["nombre"]:
+            analyse["appreciation_actuelle"] = bareme.mentions[analyse.pop("bande_actuelle")].vers_dict()
+        for entree in analyse["serie"]:
+            entree["appreciation"] = bareme.mentions[entree.pop("bande")].texte
+        
+        analyse.update({"profil_id": profil_id, "bareme": bareme.nom, "fenetre": fenetre})
+        return jsonify(analyse)
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -314,15 +908,16 @@ def ajouter_historique():
         
         if profil_id is None or moyenne is None:
             return jsonify({"error": "Données invalides"}), 400
+        try:
+            profil_id = int(profil_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Données invalides"}), 400
+        # Même contrôle que l'import (transfert)
+        if not moyenne_valide(moyenne):
+            return jsonify({"error": f"Moyenne invalide: {moyenne!r}"[:200]}), 400
         
-        conn = get_db()
-        c = conn.cursor()
-        c.execute(
-            'INSERT INTO historique (profil_id, moyenne) VALUES (?, ?)',
-            (profil_id, moyenne)
-        )
-        conn.commit()
-        conn.close()
+        obtenir_ecrivain_historique().ajouter(profil_id, moyenne)
+        CACHE_REPONSES.invalider(f'historique:{profil_id}')
         
         return jsonify({"success": True})
     
@@ -330,6 +925,130 @@ def ajouter_historique():
         return jsonify({"error": str(e)}), 500
 
 
+# ============ EXPORT / IMPORT ============
+
+@app.route('/api/export', methods=['GET'])
+def exporter():
+    """
+    Export NDJSON en flux des profils et de l'historique (?historique=0 pour
+    les profils seuls). La réponse est envoyée par morceaux, lot par lot.
+    """
+    historique = request.args.get('historique', '1') not in ('0', 'false', 'non')
+    # L'historique encore en file fait partie de l'export
+    obtenir_ecrivain_historique().vider()
+    
+    flux = exporter_ndjson(obtenir_pool().connexion, historique)
+    nom_fichier = f"profils-{datetime.now():%Y%m%d-%H%M%S}.ndjson"
+    return Response(flux, mimetype='application/x-ndjson', headers={
+        'Content-Disposition': f'attachment; filename="{nom_fichier}"'
+    })
+
+
+@app.route('/api/import', methods=['POST'])
+def importer():
+    """
+    Import d'un export NDJSON, lu en flux et validé par lots.
+    
+    Paramètres : ?conflit= (ignorer, remplacer ou erreur) et ?taille_lot=.
+    """
+    try:
+        conflit = request.args.get('conflit', 'ignorer')
+        if conflit not in CONFLITS:
+            return jsonify({"error": f"Conflit inconnu: {conflit} (attendu: {', '.join(CONFLITS)})"}), 400
+        taille_lot = max(1, request.args.get('taille_lot', 1000, type=int))
+        
+        def progression(bilan):
+            app.logger.info("Import : %d lignes, %d profils, %d entrées d'historique",
+                            bilan.lignes, bilan.profils_crees + bilan.profils_remplaces,
+                            bilan.historique)
+        
+        obtenir_ecrivain_historique().vider()
+        try:
+            # Lecture tamponnée : request.stream lit sinon ligne à ligne par petits blocs
+            lignes = io.BufferedReader(request.stream, buffer_size=1 << 16)
+            bilan = importer_ndjson(get_db, lignes, conflit,
+                                    taille_lot, progression)
+        finally:
+            # Les lots déjà validés restent en base, même si l'import échoue
+            CACHE_REPONSES.vider()
+        
+        return jsonify(bilan.vers_dict()), 400 if bilan.erreurs else 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/profilage', methods=['GET'])
+def lister_profilage():
+    """
+    Liste les requêtes profilées les plus lentes (?limite=, ?route=).
+    Le jeton PROFILAGE_JETON doit être présenté dans X-Profilage ; sans
+    jeton configuré, la route n'existe pas (404).
+    """
+    if not PROFILEUR.jeton:
+        return jsonify({"error": "Profilage non configuré (PROFILAGE_JETON)"}), 404
+    if not PROFILEUR.jeton_valide(request.headers.get('X-Profilage')):
+        return jsonify({"error": "Jeton de profilage requis"}), 403
+    try:
+        limite = int(request.args.get('limite', 20))
+    except ValueError:
+        return jsonify({"error": "Paramètre limite invalide"}), 400
+    return jsonify({
+        "actif": PROFILEUR.actif,
+        "mode": PROFILEUR.mode,
+        "taux": PROFILEUR.taux,
+        "dossier": PROFILEUR.dossier,
+        "captures": PROFILEUR.plus_lentes(max(1, min(limite, 100)), request.args.get('route')),
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def metriques():
+    """Métriques au format texte de Prometheus."""
+    return Response(METRIQUES.exposer(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/stats/db', methods=['GET'])
+def statistiques_db():
+    """Statistiques du pool de connexions SQLite."""
+    return jsonify(obtenir_pool().statistiques())
+
+
+@app.route('/api/stats/historique', methods=['GET'])
+def statistiques_historique():
+    """Statistiques de l'écriture par lots de l'historique."""
+    return jsonify(obtenir_ecrivain_historique().statistiques())
+
+
+@app.route('/api/stats/cache', methods=['GET'])
+def statistiques_cache():
+    """Statistiques du cache des réponses (taux de succès, évictions...)."""
+    return jsonify(CACHE_REPONSES.statistiques())
+
+
+@app.route('/api/stats/catalogue', methods=['GET'])
+def statistiques_catalogue():
+    """Statistiques du catalogue des matières (lectures en mémoire, rechargements)."""
+    return jsonify(obtenir_catalogue().statistiques())
+
+
+@app.route('/api/stats/classements', methods=['GET'])
+def statistiques_classements():
+    """Statistiques des classements (consultations, reconstructions depuis la base)."""
+    return jsonify(obtenir_classements().statistiques())
+
+
+@app.route('/api/stats/demarrage', methods=['GET'])
+def statistiques_demarrage():
+    """Phases du démarrage à froid de ce processus (import, base, 1re requête)."""
+    return jsonify({**DEMARRAGE, "age_processus_s": round(time.perf_counter() - _DEBUT_IMPORT, 1)})
+
+
+# Fin du chargement du module (les routes sont déclarées)
+_FIN_IMPORT = time.perf_counter()
+DEMARRAGE["import_ms"] = round((_FIN_IMPORT - _DEBUT_IMPORT) * 1000, 2)
+
+
 if __name__ == '__main__':
     init_db()
     app.run(debug=True, host='0.0.0.0', port=5000)